@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Compare json.load + flatten_companyfacts against stream_companyfacts.
+
+Reports wall time and tracemalloc peak (Python heap) per file. Run from the
+project root:
+
+    python scripts/bench_companyfacts_parse.py ../real_data/final_docs
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.ingestion.json_parser import load_json, flatten_companyfacts, stream_companyfacts  # noqa: E402
+
+
+def measure(fn, path: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = fn(path)
+    secs = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(df), secs, peak / (1024 * 1024)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark companyfacts parsing (eager vs streaming)")
+    parser.add_argument("paths", nargs="+", help="companyfacts JSON files or directories")
+    args = parser.parse_args()
+
+    files = []
+    for p in args.paths:
+        files.extend(sorted(glob.glob(os.path.join(p, "*.json"))) if os.path.isdir(p) else [p])
+
+    print(f"{'file':<40} {'MB':>6} {'facts':>8} {'eager s':>8} {'eager MB':>9} {'stream s':>9} {'stream MB':>10}")
+    for path in files:
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        n, eager_s, eager_mb = measure(lambda p: flatten_companyfacts(load_json(p)), path)
+        _, stream_s, stream_mb = measure(lambda p: stream_companyfacts(p)[1], path)
+        print(f"{os.path.basename(path):<40} {size_mb:6.1f} {n:8d} {eager_s:8.2f} {eager_mb:9.1f} {stream_s:9.2f} {stream_mb:10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""What near-duplicate detection at ingest (``DEDUP_THRESHOLD``) saves, and what it costs.
+
+Indexes the chunks of ``real_data/final_docs`` (as /init builds them) plus simulated
+web enrichment: ``--stories`` news items per company, each syndicated ``--copies``
+times, as /init re-runs and news searches return the same story from several outlets
+with a different byline and link. Each threshold gets a fresh collection and the
+hash stand-in embeddings of ``standins.py``, whose counters stand for the embedding
+API traffic. Reported per threshold: chunks stored and indexed, texts and calls sent
+to the embeddings, on-disk index size (vector and keyword files, then the chunk
+store), ingest time, and recall@k / MRR of the golden questions of
+``eval_retrieval.py`` and of one question per story (a hit is any copy of the
+story, through the ``duplicates`` of the chunk returned). Run from the project root:
+
+    python scripts/bench_dedup.py --thresholds 0,0.7,0.9
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config import config  # noqa: E402
+from eval_retrieval import DATA_DIR, build_index, evaluate, golden_questions, load_documents, overrides  # noqa: E402
+
+OUTLETS = ["Reuters", "Bloomberg", "MarketWatch", "Yahoo Finance", "CNBC", "Barron's", "Seeking Alpha",
+           "The Motley Fool", "Investing.com", "Benzinga"]
+TOPICS = [
+    ("quarterly earnings", "reported quarterly earnings of {a} per share on revenue of {b} billion dollars, ahead of"
+     " the consensus estimate, and management raised its outlook for the full fiscal year citing steady demand"),
+    ("share buyback", "announced a new share repurchase program of {b} billion dollars and lifted its quarterly"
+     " dividend to {a} per share, saying cash generation remained strong across its core businesses"),
+    ("guidance cut", "lowered its full year guidance to {a} per share after a slowdown in orders, and said it would"
+     " reduce operating costs by {b} percent while continuing to invest in its largest growth programs"),
+    ("regulatory probe", "disclosed in a filing that regulators opened an inquiry into its sales practices covering"
+     " {b} markets, adding that it is cooperating fully and does not expect a material impact before {a}"),
+]
+_ENTITY = re.compile(r"^(.+?) (?:19|20)\d\d [A-Za-z]+: ", re.M)
+
+
+def news_documents(docs: List[Dict], stories: int, copies: int, seed: int = 0):
+    """Syndicated enrichment documents (one chunk each) and one question per story."""
+    rng = random.Random(seed)
+    entities = sorted({m for doc in docs for m in _ENTITY.findall(doc["text"])})
+    news, questions = [], []
+    for entity in entities:
+        for s in range(stories):
+            topic, body = TOPICS[s % len(TOPICS)]
+            story = f"{entity} {body.format(a=round(rng.uniform(0.5, 9.5), 2), b=rng.randint(2, 90))}."
+            questions.append({"question": f"What was the news about {entity} {topic}?", "line": story})
+            for outlet in rng.sample(OUTLETS, copies):
+                slug = re.sub(r"\W+", "-", f"{entity} {topic}".lower())
+                news.append({"document_id": f"web_{len(news)}", "entity": entity,
+                             "text": f"Web search enrichment for {entity}:\n- {outlet}: {story}"
+                                     f" ({outlet.lower().replace(' ', '')}.com/{slug})",
+                             "source_doc": f"web_search_{entity}.md", "source_path": f"ddg:latest {entity} {topic}"})
+    return news, questions
+
+
+def disk_bytes(directory: str) -> Dict[str, int]:
+    sizes = {"index": 0, "chunks": 0}
+    for root, _, files in os.walk(directory):
+        for fn in files:
+            sizes["chunks" if fn.startswith("chunks.sqlite3") else "index"] += os.path.getsize(os.path.join(root, fn))
+    return sizes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Near-duplicate detection savings and retrieval quality")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--thresholds", default="0,0.6,0.7,0.8,0.9", help="DEDUP_THRESHOLD values (0: off)")
+    parser.add_argument("--stories", type=int, default=8, help="news stories per company")
+    parser.add_argument("--copies", type=int, default=6, help="outlets syndicating each story")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    from standins import HashEmbeddings
+
+    # The vector stores still construct their OpenAI client
+    config.OPENAI_API_KEY = config.OPENAI_API_KEY or "unused"
+    docs = load_documents(args.data_dir, with_csv=True)
+    golden = golden_questions(docs)
+    news, stories = news_documents(docs, args.stories, args.copies)
+    print(f"{len(docs)} documents and {len(news)} enrichment results ({len(stories)} stories x {args.copies}"
+          f" outlets), {len(golden)} golden questions")
+    print(f"{'threshold':>9} {'indexed':>8} {'embedded':>9} {'calls':>6} {'index MB':>9} {'store MB':>9}"
+          f" {'ingest s':>9} {'golden R@k':>11} {'MRR':>6} {'news R@k':>9} {'MRR':>6}")
+    workdir = tempfile.mkdtemp(prefix="bench_dedup_")
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        embeddings = HashEmbeddings()
+        with overrides({"DEDUP_THRESHOLD": threshold}):
+            collection, chunks, seconds = build_index(docs + news, {}, embeddings, workdir)
+        # Before the evaluation's query embeddings
+        embedded, calls = embeddings.texts, embeddings.calls
+        indexed = int(collection.chunks.live_rows().size)
+        sizes = disk_bytes(os.path.dirname(collection.chunks.path))
+        quality = evaluate(collection, chunks, golden, args.k, {})
+        news_quality = evaluate(collection, chunks, stories, args.k, {})
+        print(f"{threshold:>9.2f} {indexed:>8} {embedded:>9} {calls:>6}"
+              f" {sizes['index'] / 2**20:>9.2f} {sizes['chunks'] / 2**20:>9.2f} {seconds:>9.2f}"
+              f" {quality['recall']:>11.3f} {quality['mrr']:>6.3f} {news_quality['recall']:>9.3f}"
+              f" {news_quality['mrr']:>6.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Throughput and retrieval quality of the embedding providers.
+
+Embeds the chunks of ``real_data/final_docs`` (as /init builds them) with each
+provider: ``local`` at a few dimensions (``EMBEDDING_MODEL=local``), the hash stand-in
+of ``standins.py``, and the configured OpenAI model when OPENAI_API_KEY is set.
+Throughput is chunks/s for batches of ``--batch`` (over the corpus repeated to at
+least ``--min-texts`` chunks) and the latency of one query. Quality is measured on
+the golden questions of ``eval_retrieval.py``: recall@k and MRR of vector search
+alone (no entity routing, no keyword search), then of the hybrid /query retrieval.
+Run from the project root:
+
+    python scripts/bench_embeddings.py --dims 256,384,768
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config import config  # noqa: E402
+from eval_retrieval import DATA_DIR, build_index, evaluate, golden_questions, load_documents, overrides  # noqa: E402
+
+
+def throughput(embeddings, texts: List[str], batch: int, min_texts: int) -> Dict:
+    corpus = texts * max(1, -(-min_texts // len(texts)))
+    # Warm-up: the first pass pages in the provider's tables
+    embeddings.embed_documents(texts)
+    start = time.perf_counter()
+    for i in range(0, len(corpus), batch):
+        embeddings.embed_documents(corpus[i:i + batch])
+    seconds = time.perf_counter() - start
+    latencies = []
+    for q in texts[:50]:
+        start = time.perf_counter()
+        embeddings.embed_query(q[:200])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"chunks_per_s": len(corpus) / seconds, "mb_per_s": sum(map(len, corpus)) / seconds / 2**20,
+            "query_ms": float(np.median(latencies))}
+
+
+def vector_quality(collection, chunks: List[Dict], questions: List[Dict], k: int) -> Dict:
+    from src.retrieval.vector_search import vector_search
+    hits, reciprocal = [], []
+    for q in questions:
+        source = {c["chunk_id"] for c in chunks if q["line"] in c["text"]}
+        if not source:
+            continue
+        ranks = [i for i, ch in enumerate(vector_search(q["question"], k, collection=collection), 1)
+                 if ch["chunk_id"] in source]
+        hits.append(bool(ranks))
+        reciprocal.append(1.0 / ranks[0] if ranks else 0.0)
+    return {"recall": float(np.mean(hits)), "mrr": float(np.mean(reciprocal))}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Embedding provider throughput and retrieval quality")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--dims", default="256,384,768", help="LOCAL_EMBEDDING_DIM values to compare")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=config.INGEST_BATCH_SIZE)
+    parser.add_argument("--min-texts", type=int, default=5000, help="chunks embedded for throughput")
+    args = parser.parse_args()
+
+    from standins import HashEmbeddings
+    from src.ingestion.chunker import segment_chunks
+    from src.retrieval.backends import embeddings as providers
+
+    have_key = bool(config.OPENAI_API_KEY)
+    # The stores construct an OpenAI client unless EMBEDDING_MODEL is local
+    config.OPENAI_API_KEY = config.OPENAI_API_KEY or "unused"
+    docs = load_documents(args.data_dir, with_csv=True)
+    questions = golden_questions(docs)
+    texts = [c["text"] for c in segment_chunks(docs)]
+    candidates = [(f"local dim={d}", "local", {"LOCAL_EMBEDDING_DIM": int(d)}) for d in args.dims.split(",")]
+    candidates.append(("hash stand-in dim=256", None, {}))
+    if have_key:
+        candidates.append((f"openai {config.EMBEDDING_MODEL}", config.EMBEDDING_MODEL, {}))
+    print(f"{len(texts)} chunks, {len(questions)} golden questions, batch {args.batch}"
+          + ("" if have_key else "; OPENAI_API_KEY is not set, the OpenAI model is skipped"))
+    print(f"{'provider':<24} {'chunks/s':>9} {'MB/s':>6} {'query ms':>9} {'vector R@k':>11} {'MRR':>6}"
+          f" {'hybrid R@k':>11} {'MRR':>6}")
+    workdir = tempfile.mkdtemp(prefix="bench_embeddings_")
+    for name, model, params in candidates:
+        with overrides({**params, "EMBEDDING_MODEL": model or config.EMBEDDING_MODEL}):
+            embeddings = providers.create(model) if model else HashEmbeddings()
+            speed = throughput(embeddings, texts, args.batch, args.min_texts)
+            collection, chunks, _ = build_index(docs, {}, None if model else embeddings, workdir)
+            vector = vector_quality(collection, chunks, questions, args.k)
+            hybrid = evaluate(collection, chunks, questions, args.k, {})
+        print(f"{name:<24} {speed['chunks_per_s']:>9.0f} {speed['mb_per_s']:>6.2f} {speed['query_ms']:>9.2f}"
+              f" {vector['recall']:>11.3f} {vector['mrr']:>6.3f} {hybrid['recall']:>11.3f} {hybrid['mrr']:>6.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Compare fusion strategies: how many relevant chunks reach the prompt, and at what k.
+
+Builds a synthetic corpus in a scratch directory and indexes it with the real
+FaissStore and BM25Store. Chunks belong to a topic and one of its facets. Text
+holds common filler words, topic words, facet words and, in some chunks, stray
+facet words of other topics. Vectors sit near their topic and, less so, near
+their facet. The two retrievers therefore err differently: vectors blur facets,
+and BM25 is misled by the stray words. A chunk is relevant to a query when its
+topic and facet match. Each strategy fuses candidate lists of
+``candidate_depth(k)`` per retriever. ``legacy`` is the previous behavior: 0.5 x raw
+score from five candidates each, up to ten chunks whatever k is. Run from the
+project root:
+
+    python scripts/bench_fusion.py --n 20000 --queries 300
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# Nothing here calls the embeddings API
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+from src.config import config  # noqa: E402
+from src.retrieval.backends.bm25_store import BM25Store  # noqa: E402
+from src.retrieval.backends.chunk_store import ChunkStore  # noqa: E402
+from src.retrieval.backends.faiss_store import FaissStore  # noqa: E402
+from src.retrieval.backends.index_marker import GenerationMarker  # noqa: E402
+from src.retrieval.backends.vector_backend import hydrate  # noqa: E402
+from src.retrieval.merger import FUSIONS, candidate_depth, merge_results  # noqa: E402
+
+KS = (3, 5, 8, 10, 20)
+
+
+def corpus(n: int, topics: int, facets: int, dim: int, rng: np.random.Generator):
+    filler = [f"w{i}" for i in range(3000)]
+    zipf = 1.0 / np.arange(1, len(filler) + 1)
+    zipf /= zipf.sum()
+    topic_words = [[f"t{t}x{i}" for i in range(12)] for t in range(topics)]
+    facet_words = [[[f"t{t}f{f}x{i}" for i in range(3)] for f in range(facets)] for t in range(topics)]
+    centroids = rng.standard_normal((topics, dim))
+    facet_dirs = rng.standard_normal((topics, facets, dim))
+    labels = np.stack([rng.integers(0, topics, n), rng.integers(0, facets, n)], axis=1)
+    texts = []
+    for t, f in labels:
+        words = list(rng.choice(filler, rng.integers(40, 90), p=zipf))
+        words += list(rng.choice(topic_words[t], rng.integers(2, 6)))
+        words += list(rng.choice(facet_words[t][f], rng.integers(1, 3)))
+        if rng.random() < 0.3:
+            # Stray facet words of other topics: keyword matches that are not relevant
+            ot, of = rng.integers(0, topics), rng.integers(0, facets)
+            words += list(rng.choice(facet_words[ot][of], rng.integers(2, 5)))
+        rng.shuffle(words)
+        texts.append(" ".join(words))
+    vectors = centroids[labels[:, 0]] + 0.35 * facet_dirs[labels[:, 0], labels[:, 1]] + 0.9 * rng.standard_normal((n, dim))
+    return texts, vectors, labels, topic_words, facet_words, centroids, facet_dirs
+
+
+def legacy_merge(vector_chunks, keyword_chunks, top_k):
+    return merge_results(vector_chunks[:5], keyword_chunks[:5], top_k, method="weighted", weights=(0.5, 0.5))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Evaluate fusion strategies on a synthetic labeled corpus")
+    parser.add_argument("--n", type=int, default=20000, help="chunks")
+    parser.add_argument("--topics", type=int, default=400)
+    parser.add_argument("--facets", type=int, default=4)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    texts, vectors, labels, topic_words, facet_words, centroids, facet_dirs = corpus(
+        args.n, args.topics, args.facets, args.dim, rng)
+    tmp = tempfile.mkdtemp(prefix="bench_fusion_")
+    chunks = ChunkStore(os.path.join(tmp, "chunks.sqlite3"), GenerationMarker(os.path.join(tmp, "generation")))
+    vector = FaissStore(os.path.join(tmp, "vector.faiss"), chunks, codec="flat")
+    keyword = BM25Store(os.path.join(tmp, "bm25"), chunks)
+    x = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype("float32")
+    for start in range(0, args.n, 5000):
+        end = min(args.n, start + 5000)
+        rows = chunks.add([{"document_id": f"doc{i}", "chunk_id": f"c{i}", "text": texts[i], "source_doc": "synthetic.txt"}
+                           for i in range(start, end)])
+        vector.add(rows, x[start:end])
+        keyword.add(rows, texts[start:end])
+
+    # Queries name a facet word and a topic word; their vectors sit near topic and facet
+    qlabels = np.stack([rng.integers(0, args.topics, args.queries), rng.integers(0, args.facets, args.queries)], axis=1)
+    questions = [f"{rng.choice(topic_words[t])} {rng.choice(facet_words[t][f])}" for t, f in qlabels]
+    qv = centroids[qlabels[:, 0]] + 0.35 * facet_dirs[qlabels[:, 0], qlabels[:, 1]] + 0.9 * rng.standard_normal((args.queries, args.dim))
+    qv = (qv / np.linalg.norm(qv, axis=1, keepdims=True)).astype("float32")
+    relevant = [set(np.flatnonzero((labels[:, 0] == t) & (labels[:, 1] == f))) for t, f in qlabels]
+
+    depth = candidate_depth(max(KS))
+    vector_hits = hydrate(chunks, vector.search_vectors(qv, depth))
+    keyword_hits = [keyword.search(q, depth) for q in questions]
+    # A query without indexed terms has no keyword hits, so fusion keeps the vector ranking
+    unmatched = keyword.search("nosuchterm", depth)
+    fused = merge_results(vector_hits[0], unmatched, max(KS), method="rrf")
+    assert not unmatched and [ch["chunk_id"] for ch in fused] == [ch["chunk_id"] for ch in vector_hits[0][:max(KS)]]
+    print(f"n={args.n} queries={args.queries} relevant/query={np.mean([len(r) for r in relevant]):.1f} "
+          f"candidate depth={config.FUSION_CANDIDATE_FACTOR} x k, RRF_K={config.RRF_K}")
+
+    def evaluate(fuse, k):
+        hits, rr, used, secs = [], [], [], 0.0
+        for vh, kh, rel in zip(vector_hits, keyword_hits, relevant):
+            d = candidate_depth(k)
+            start = time.perf_counter()
+            fused = fuse(vh[:d], kh[:d], k)
+            secs += time.perf_counter() - start
+            found = [int(ch["chunk_id"][1:]) in rel for ch in fused]
+            hits.append(sum(found))
+            used.append(len(fused))
+            rr.append(1.0 / (found.index(True) + 1) if True in found else 0.0)
+        return np.mean(hits), np.mean(rr), np.mean(used), secs * 1e6 / len(relevant)
+
+    print(f"{'fusion':<10} {'k':>3} {'chunks':>7} {'relevant':>9} {'precision':>10} {'MRR':>6} {'us/query':>9}")
+    rows_out = {}
+    for name in ("legacy",) + FUSIONS:
+        fuse = legacy_merge if name == "legacy" else (lambda v, kw, k, m=name: merge_results(v, kw, k, method=m))
+        for k in KS:
+            hits, mrr, used, us = evaluate(fuse, k)
+            rows_out[name, k] = (hits, used)
+            print(f"{name:<10} {k:>3} {used:7.1f} {hits:9.2f} {hits / max(used, 1e-9):10.3f} {mrr:6.3f} {us:9.1f}")
+    target, target_used = rows_out["legacy", 20]
+    print(f"legacy at max_chunks=20: {target:.2f} relevant in {target_used:.1f} chunks")
+    for name in FUSIONS:
+        fuse = lambda v, kw, k, m=name: merge_results(v, kw, k, method=m)
+        k = next((k for k in range(1, max(KS) + 1) if evaluate(fuse, k)[0] >= target), None)
+        print(f"  {name:<8} matches it with " + (f"k={k}" if k else f"no k up to {max(KS)}"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Measure how long importing the API takes, and fail if it regresses.
+
+Imports ``src.api.main`` in fresh interpreters under ``-X importtime`` and reports
+the median wall time and the top-level packages that cost the most. Exits 1 if the
+median exceeds ``--budget-ms`` or if any module in ``--heavy`` was imported: those
+are meant to load on first use (indexes in the background warm-up, parsers with the
+first ingestion, the LLM client with the first query). ``--warmup`` also times the
+warm-up that opens the configured indexes. Run from the project root:
+
+    python scripts/bench_import_time.py --runs 5 --warmup
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEAVY = ["faiss", "langchain_openai", "openai", "qdrant_client", "pandas", "matplotlib",
+         "pypdf", "docx", "duckduckgo_search"]
+
+_IMPORT = """
+import json, time
+start = time.perf_counter()
+import src.api.main
+print(json.dumps({"ms": (time.perf_counter() - start) * 1000}))
+"""
+
+_WARMUP = """
+import json, time
+start = time.perf_counter()
+from src.api import warmup
+imported = time.perf_counter()
+warmup.run()
+print(json.dumps({"import_ms": (imported - start) * 1000, **warmup.state()}))
+"""
+
+
+def run(code: str, importtime: bool = False) -> Tuple[Dict, str]:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode:
+        raise SystemExit(f"import failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Cumulative microseconds of each module, first (outermost) import only."""
+    cumulative: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        cumulative.setdefault(name.strip(), int(cum))
+    return cumulative
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark and guard the API import time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="fail above this median import time")
+    parser.add_argument("--heavy", nargs="*", default=HEAVY, help="packages that must not load at import")
+    parser.add_argument("--top", type=int, default=8, help="packages to list")
+    parser.add_argument("--warmup", action="store_true", help="also time the index warm-up")
+    args = parser.parse_args()
+
+    times: List[float] = []
+    modules: Dict[str, int] = {}
+    for _ in range(args.runs):
+        result, stderr = run(_IMPORT, importtime=True)
+        times.append(result["ms"])
+        modules = parse_importtime(stderr)
+    median = statistics.median(times)
+    print(f"import src.api.main: median {median:.0f} ms, min {min(times):.0f} ms over {args.runs} runs")
+
+    top_level = {name: us for name, us in modules.items() if "." not in name and name != "src"}
+    print("slowest packages (cumulative ms):",
+          ", ".join(f"{name} {us / 1000:.0f}" for name, us in sorted(top_level.items(), key=lambda kv: -kv[1])[:args.top]))
+    heavy = sorted(name for name in args.heavy if name in modules)
+    print("heavy packages imported:", ", ".join(heavy) or "none")
+
+    if args.warmup:
+        result, _ = run(_WARMUP)
+        print(f"warm-up: {result['status']} in {result['seconds']} s (epoch {result['epoch']})"
+              + (f": {result['error']}" if result["error"] else ""))
+
+    failed = bool(heavy) or median > args.budget_ms
+    if median > args.budget_ms:
+        print(f"FAIL: median import {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if heavy:
+        print("FAIL: imported at startup, should load on first use:", ", ".join(heavy))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Compare the keyword backends: BM25Store (memory-mapped blocks) and FtsStore (SQLite FTS5).
+
+Indexes the same synthetic chunks (Zipf-distributed lowercase words, so both
+tokenizers see the same tokens) into both stores over one chunk store, then
+reports indexing time, size on disk, load time and Python heap after a reopen,
+query latency and top-k overlap. Run from the project root:
+
+    python scripts/bench_keyword_backends.py --n 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# Keep the default collection's stores, should anything open them, in a scratch directory
+_tmp = tempfile.mkdtemp(prefix="bench_keyword_backends_")
+os.environ["CHUNK_STORE_PATH"] = os.path.join(_tmp, "chunks.sqlite3")
+os.environ["BM25_INDEX_DIR"] = os.path.join(_tmp, "bm25")
+os.environ["FTS_INDEX_PATH"] = os.path.join(_tmp, "keyword.fts.sqlite3")
+
+from src.retrieval.backends.bm25_store import BM25Store  # noqa: E402
+from src.retrieval.backends.chunk_store import ChunkStore  # noqa: E402
+from src.retrieval.backends.fts_store import FtsStore  # noqa: E402
+from src.retrieval.backends.index_marker import GenerationMarker  # noqa: E402
+
+
+def disk_bytes(path: str) -> int:
+    if os.path.isfile(path):
+        return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def reopen(factory):
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = factory()
+    secs = time.perf_counter() - start
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, secs, heap
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark BM25Store against FtsStore")
+    parser.add_argument("--n", type=int, default=50000, help="chunks")
+    parser.add_argument("--words", type=int, default=60, help="words per chunk")
+    parser.add_argument("--vocab", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=1000, help="chunks per add (one ingestion batch)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_keyword_backends_")
+    rng = np.random.default_rng(0)
+    vocab = np.array([f"w{i}" for i in range(args.vocab)])
+    # Letters only: unicode61 and whitespace splitting tokenize these the same
+    vocab = np.char.translate(vocab, str.maketrans("0123456789", "abcdefghij"))
+    probs = 1.0 / np.arange(1, args.vocab + 1)
+    probs /= probs.sum()
+
+    chunks = ChunkStore(os.path.join(tmp, "chunks.sqlite3"), GenerationMarker(os.path.join(tmp, "generation")))
+    bm25_path, fts_path = os.path.join(tmp, "bm25"), os.path.join(tmp, "keyword.fts.sqlite3")
+    bm25, fts = BM25Store(bm25_path, chunks), FtsStore(fts_path, chunks)
+    index_s = [0.0, 0.0]
+    for start in range(0, args.n, args.batch):
+        end = min(args.n, start + args.batch)
+        texts = [" ".join(vocab[rng.choice(args.vocab, args.words, p=probs)]) for _ in range(start, end)]
+        rows = chunks.add([{"document_id": f"doc{i // 100}", "chunk_id": f"c{i}", "text": t}
+                           for i, t in zip(range(start, end), texts)])
+        for i, store in enumerate((bm25, fts)):
+            t0 = time.perf_counter()
+            store.add(rows, texts)
+            index_s[i] += time.perf_counter() - t0
+    del bm25, fts
+
+    (bm25, load_bm25, heap_bm25), (fts, load_fts, heap_fts) = (reopen(lambda: BM25Store(bm25_path, chunks)),
+                                                              reopen(lambda: FtsStore(fts_path, chunks)))
+    # Mid-frequency words, as in real questions
+    queries = [" ".join(vocab[rng.integers(20, 5000, 4)]) for _ in range(args.queries)]
+    results, ms = [], []
+    for store in (bm25, fts):
+        t0 = time.perf_counter()
+        results.append([[c["chunk_id"] for c in store.search(q, args.k)] for q in queries])
+        ms.append((time.perf_counter() - t0) * 1000 / args.queries)
+    overlap = np.mean([len(set(a) & set(b)) / max(1, len(a)) for a, b in zip(*results)])
+
+    print(f"n={args.n} words/chunk={args.words} vocab={args.vocab} k={args.k} queries={args.queries}")
+    print(f"{'':<12} {'index s':>8} {'disk MiB':>9} {'load s':>7} {'heap MiB':>9} {'ms/query':>9}")
+    for name, secs, path, load, heap, q_ms in (("bm25", index_s[0], bm25_path, load_bm25, heap_bm25, ms[0]),
+                                               ("fts5", index_s[1], fts_path, load_fts, heap_fts, ms[1])):
+        print(f"{name:<12} {secs:8.2f} {disk_bytes(path) / 2**20:9.1f} {load:7.2f} {heap / 2**20:9.1f} {q_ms:9.2f}")
+    print(f"top-{args.k} overlap {overlap:.3f} (FTS5 ranks with k1=1.2 and plain idf)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
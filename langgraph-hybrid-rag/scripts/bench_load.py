@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""Ingestion and query throughput at synthetic scale, without the OpenAI API.
+
+Generates chunks shaped like the /init documents: companyfacts FY summaries
+("<Entity> <year> <metric>: <value> <unit>" lines under an "Entity:" header) and CSV
+market samples ("Sample (50 rows):" blocks). It indexes them into a named collection
+with ``index_chunks`` in ``--batch``-chunk batches, then times ``vector_search``,
+``keyword_search``, ``merge_results`` and the whole POST /query in-process through
+FastAPI's TestClient. Questions ask for an FY value of a random entity. Embeddings
+and the LLM are the deterministic stand-ins of ``standins.py``, slowed by
+``--embed-latency-ms`` (per embedding call) and ``--llm-latency-ms`` (per
+completion, three per /query). Each scale runs in its own process under a scratch
+COLLECTIONS_DIR, so RSS is that scale's alone. Reports chunks/s, QPS and p50/p99
+latency per stage, RSS and index size on disk. ``--json`` writes the results with
+the git commit, and ``--compare`` prints the change from an earlier such file. Run
+from the project root:
+
+    python scripts/bench_load.py --scales 10k,100k --json load.json
+    python scripts/bench_load.py --scales 10k,100k --compare load.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+COLLECTION = "bench"
+METRICS = [("EarningsPerShareDiluted", "diluted earnings per share", "USD/shares"),
+           ("EarningsPerShareBasic", "basic earnings per share", "USD/shares"),
+           ("NetIncomeLoss", "net income", "USD"), ("Revenues", "revenue", "USD")]
+YEARS = list(range(2014, 2026))
+STAGES = ("vector", "keyword", "merge", "query")
+
+
+def parse_scale(text: str) -> int:
+    text = text.strip().lower()
+    unit = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if unit > 1 else text) * unit)
+
+
+def entity(i: int) -> str:
+    return f"Entity{i:05d} Corporation"
+
+
+def chunk(i: int, entities: int) -> Dict:
+    """Synthetic chunk ``i``; the same ``i`` gives the same chunk, so questions can name it."""
+    rng = np.random.default_rng(i)
+    e = int(rng.integers(entities))
+    if i % 2:
+        # A companyfacts document: a header and four years of FY summaries
+        first = int(rng.integers(len(YEARS) - 4))
+        lines = [f"Source: sec_companyfacts_CIK{e:010d}.json", f"Entity: {entity(e)}", "Columns: metric, unit, end, val, fy, fp, form",
+                 f"FY Summaries ({YEARS[first]}-{YEARS[first + 3]}):"]
+        for year in YEARS[first:first + 4]:
+            for metric, _, unit in METRICS:
+                value = rng.normal(5, 3) if unit == "USD/shares" else rng.lognormal(22, 1.5)
+                lines.append(f"{entity(e)} {year} {metric}: {value:.2f} {unit}")
+        return {"document_id": f"doc_cf_{e}", "chunk_id": f"bench_{i}", "chunk_index": i // 2 % 8,
+                "text": "\n".join(lines), "source_doc": f"sec_companyfacts_CIK{e:010d}.json", "entity": entity(e)}
+    # A CSV market sample
+    close = float(rng.lognormal(4, 1))
+    rows = []
+    for day in range(int(rng.integers(16, 24))):
+        close *= float(np.exp(rng.normal(0, 0.02)))
+        rows.append(f"20{int(rng.integers(10, 25))}-{int(rng.integers(1, 13)):02d}-{day + 1:02d},{close * 0.99:.4f},"
+                    f"{close * 1.01:.4f},{close * 0.98:.4f},{close:.4f},{int(rng.integers(1e5, 1e8))}")
+    lines = [f"Source: market_T{e:05d}.csv", "Columns: Date, Open, High, Low, Close, Volume", "Sample (50 rows):"] + rows
+    return {"document_id": f"doc_mk_{e}", "chunk_id": f"bench_{i}", "chunk_index": i // 2 % 8,
+            "text": "\n".join(lines), "source_doc": f"market_T{e:05d}.csv"}
+
+
+def batches(n: int, size: int, entities: int) -> Iterator[List[Dict]]:
+    for start in range(0, n, size):
+        yield [chunk(i, entities) for i in range(start, min(n, start + size))]
+
+
+def questions(n: int, count: int, entities: int) -> List[str]:
+    rng = np.random.default_rng(n)
+    out = []
+    for i in rng.integers(n // 2, size=count) * 2 + 1:
+        line = chunk(int(i), entities)["text"].split("\n")[int(rng.integers(4, 20))]
+        name, year, metric = line.split(":")[0].rsplit(" ", 2)
+        out.append(f"What was {name}'s {dict((m, p) for m, p, _ in METRICS)[metric]} in {year}?")
+    return out
+
+
+def rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        return None
+
+
+def disk_mb(path: str) -> float:
+    return round(sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files) / 2**20, 1)
+
+
+def timed_calls(fn: Callable, inputs: List, threads: int) -> Dict:
+    """Calls ``fn`` once per input on ``threads`` threads: throughput and latency percentiles."""
+    def call(x):
+        start = time.perf_counter()
+        fn(x)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(threads) as pool:
+            latencies = list(pool.map(call, inputs))
+    else:
+        latencies = [call(x) for x in inputs]
+    wall = time.perf_counter() - start
+    ms = np.array(latencies) * 1000
+    return {"calls": len(inputs), "qps": round(len(inputs) / wall, 1), "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3), "mean_ms": round(float(ms.mean()), 3)}
+
+
+def run_scale(args) -> Dict:
+    """One scale, in this process: index, then time each stage."""
+    from fastapi.testclient import TestClient
+    from standins import EchoLLM, HashEmbeddings
+    from src.agent import nodes
+    from src.api import warmup
+    from src.api.main import app
+    from src.config import config
+    from src.ingestion.indexer import index_chunks
+    from src.retrieval.collection import registry
+    from src.retrieval.merger import candidate_depth, merge_results
+    from src.retrieval.text_search import keyword_search
+    from src.retrieval.vector_search import vector_search
+
+    n, k = args.scale, args.k
+    # The stand-ins answer instead; a key makes the workflow take its LLM path
+    config.OPENAI_API_KEY = "unused"
+    embeddings = HashEmbeddings(dim=args.dim, latency_ms=args.embed_latency_ms)
+    llm = EchoLLM(latency_ms=args.llm_latency_ms)
+    nodes._llm = lambda api_key: llm
+    result: Dict = {"chunks": n, "rss_start_mb": rss_mb()}
+    # Held for the whole run: an evicted collection would reopen with OpenAI embeddings
+    with registry.using(COLLECTION, create=True) as collection:
+        collection.vector.embeddings = embeddings
+        index = 0.0
+        for batch in batches(n, args.batch, args.entities):
+            # Generating the chunks is not timed
+            start = time.perf_counter()
+            index_chunks(batch, collection=collection)
+            index += time.perf_counter() - start
+        result["ingest"] = {"seconds": round(index, 2), "chunks_per_s": round(n / index, 1), "batch": args.batch,
+                            "embedding_calls": embeddings.calls, "embedding_seconds": round(embeddings.seconds, 2)}
+        result["rss_indexed_mb"] = rss_mb()
+        result["disk_mb"] = disk_mb(os.path.join(config.COLLECTIONS_DIR, COLLECTION))
+
+        asked = questions(n, args.queries, args.entities)
+        depth = max(config.VECTOR_TOP_K, config.KEYWORD_TOP_K, candidate_depth(k))
+        client = TestClient(app)
+        # TestClient runs no lifespan; /query answers 503 until the indexes are warm
+        warmup.run()
+        for q in asked[:5]:
+            vector_search(q, depth, collection=collection)
+            keyword_search(q, depth, collection=collection)
+        result["vector"] = timed_calls(lambda q: vector_search(q, depth, collection=collection), asked, args.threads)
+        result["keyword"] = timed_calls(lambda q: keyword_search(q, depth, collection=collection), asked, args.threads)
+        pairs = [(vector_search(q, depth, collection=collection), keyword_search(q, depth, collection=collection))
+                 for q in asked]
+        result["merge"] = timed_calls(lambda p: merge_results(p[0], p[1], top_k=k), pairs, args.threads)
+
+        def query(q):
+            r = client.post("/query", json={"question": q, "max_chunks": k, "collection": COLLECTION})
+            if r.status_code != 200 or not r.json()["success"]:
+                raise RuntimeError(f"/query failed: {r.status_code} {r.text[:200]}")
+
+        result["query"] = timed_calls(query, asked[: args.query_calls], args.threads)
+        result["llm_calls"] = llm.calls
+    result["rss_mb"] = rss_mb()
+    from src.telemetry import peak_rss_mb
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def child_argv(args, n: int, out: str) -> List[str]:
+    return [sys.executable, os.path.abspath(__file__), "--scale", str(n), "--result", out, "--k", str(args.k),
+            "--batch", str(args.batch), "--dim", str(args.dim), "--entities", str(args.entities),
+            "--queries", str(args.queries), "--query-calls", str(args.query_calls), "--threads", str(args.threads),
+            "--embed-latency-ms", str(args.embed_latency_ms), "--llm-latency-ms", str(args.llm_latency_ms)]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: Dict[str, Dict]):
+    print(f"{'chunks':>8} {'ingest/s':>9} {'embed s':>8} {'disk MB':>8} {'RSS MB':>7} {'peak MB':>8}  "
+          + "  ".join(f"{s + ' qps':>11} {'p50':>7} {'p99':>7}" for s in STAGES))
+    for r in results.values():
+        print(f"{r['chunks']:>8} {r['ingest']['chunks_per_s']:>9.0f} {r['ingest']['embedding_seconds']:>8.1f} {r['disk_mb']:>8.1f} {r['rss_mb'] or 0:>7.0f}"
+              f" {r['peak_rss_mb'] or 0:>8.0f}  "
+              + "  ".join(f"{r[s]['qps']:>11.1f} {r[s]['p50_ms']:>7.2f} {r[s]['p99_ms']:>7.2f}" for s in STAGES))
+    print("latencies in ms; RSS after the queries, peak over the whole scale")
+
+
+def print_comparison(old: Dict, new: Dict):
+    print(f"change from {old.get('commit') or 'earlier run'} to {new.get('commit') or 'this run'}:")
+    metrics = [("ingest chunks/s", ("ingest", "chunks_per_s"))] + [
+        (f"{s} {m}", (s, m)) for s in STAGES for m in ("qps", "p50_ms", "p99_ms")] + [("peak RSS MB", ("peak_rss_mb",))]
+    for scale, r in new["results"].items():
+        before = old["results"].get(scale)
+        if before is None:
+            continue
+        print(f"  {scale} chunks")
+        for label, path in metrics:
+            a, b = before, r
+            for key in path:
+                a, b = (a or {}).get(key) if isinstance(a, dict) else None, (b or {}).get(key) if isinstance(b, dict) else None
+            if a and b is not None:
+                print(f"    {label:<18} {a:>12.2f} -> {b:>12.2f} ({(b - a) / a:+.1%})")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Synthetic-scale ingestion and query throughput")
+    parser.add_argument("--scales", default="10k,100k,1m", help="comma-separated chunk counts, e.g. 10k,100k,1m")
+    parser.add_argument("--k", type=int, default=8, help="max_chunks per query")
+    parser.add_argument("--batch", type=int, default=int(os.getenv("INGEST_BATCH_SIZE", 64)),
+                        help="chunks per index_chunks call (default: INGEST_BATCH_SIZE)")
+    parser.add_argument("--dim", type=int, default=256, help="stand-in embedding dimension")
+    parser.add_argument("--entities", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500, help="questions per search stage")
+    parser.add_argument("--query-calls", type=int, default=200, help="of which sent to /query")
+    parser.add_argument("--threads", type=int, default=1, help="concurrent callers per stage")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare with")
+    parser.add_argument("--scale", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scale:
+        # A child run: one scale, results to --result
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(run_scale(args), f)
+        return 0
+
+    results: Dict[str, Dict] = {}
+    for n in [parse_scale(s) for s in args.scales.split(",") if s.strip()]:
+        scratch = tempfile.mkdtemp(prefix=f"bench_load_{n}_")
+        out = os.path.join(scratch, "result.json")
+        env = {**os.environ, "COLLECTIONS_DIR": os.path.join(scratch, "collections"),
+               "COLLECTION_MEMORY_MB": "0", "OPENAI_API_KEY": "unused"}
+        print(f"{n} chunks ...", flush=True)
+        try:
+            # Logs of the child (one line per step) are not the results
+            subprocess.run(child_argv(args, n, out), env=env, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+            with open(out, "r", encoding="utf-8") as f:
+                results[str(n)] = json.load(f)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+    print_results(results)
+
+    report = {"commit": git_commit(), "params": {k: v for k, v in vars(args).items()
+                                                 if k not in ("json", "compare", "scale", "result")},
+              "results": results}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(json.load(f), report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Serialization cost of a /query response, before and after the single-pass encoder.
+
+Builds the workflow result /query gets back (``--k`` chunks of ``real_data/final_docs``
+with their scores, two citations, an answer) and times turning it into the HTTP body:
+
+    before        the previous handler: each citation and chunk validated, dumped,
+                  validated again inside QueryData and dumped again, then FastAPI's
+                  response_model validation, ``jsonable_encoder`` and ``json.dumps``
+    after         ``query.query_data`` (one validation per item) and ``query.render``
+    no text       the same with ``include_text=false``
+    ids+scores    the same with ``fields=["score", "fused_score"]``
+    orjson        one validation, ``model_dump`` and ``orjson.dumps``, for comparison
+
+Reports microseconds per response (median of ``--repeat`` rounds) and body size.
+Run from the project root:
+
+    python scripts/bench_query_response.py --k 8,20,50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from eval_retrieval import DATA_DIR, load_documents  # noqa: E402
+
+
+def workflow_result(chunks: List[Dict], k: int) -> Dict:
+    used = [{**ch, "score": 0.8 - i / 100, "fused_score": 1.0 / (60 + i), "retrieval": "vector"}
+            for i, ch in enumerate(chunks[:k])]
+    return {
+        "answer": " ".join(ch["text"].split("\n")[0] for ch in used[:3]),
+        "citations": [{"claim": ch["text"][:80], "source_chunk_id": ch["chunk_id"], "quote": ch["text"][:180],
+                       "confidence": 0.8} for ch in used[:2]],
+        "chunks_retrieved": {"vector": 2 * k, "keyword": 2 * k, "merged": k},
+        "chunks_used": used,
+        "reasoning_summary": "Chunks: " + ", ".join(ch["chunk_id"] for ch in used[:2]),
+    }
+
+
+@lru_cache(maxsize=1)
+def _legacy_route():
+    """The previous response model and the response field FastAPI built from it."""
+    from fastapi.utils import create_response_field
+    from pydantic import BaseModel
+
+    class QueryResponse(BaseModel):
+        success: bool
+        data: Dict | None = None
+        error: str | None = None
+
+    return QueryResponse, create_response_field(name="Response_query", type_=QueryResponse), asyncio.new_event_loop()
+
+
+def before(result: Dict) -> bytes:
+    """The handler as it was, through FastAPI's response handling."""
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from src.schemas import Citation as CitationModel, Chunk as ChunkModel, QueryData as QueryDataModel
+
+    QueryResponse, field, loop = _legacy_route()
+    norm_citations = []
+    for c in result.get("citations", []) or []:
+        norm_citations.append(CitationModel(
+            claim=c.get("claim"), quote=c.get("quote"), source_doc=c.get("source_doc"),
+            chunk_id=c.get("chunk_id") or c.get("source_chunk_id"), page_number=c.get("page_number"),
+            confidence=float(c.get("confidence", 0.5)),
+        ).model_dump())
+    norm_chunks = []
+    for ch in result.get("chunks_used", []) or []:
+        norm_chunks.append(ChunkModel(
+            document_id=ch.get("document_id") or "", chunk_id=ch.get("chunk_id") or "", text=ch.get("text") or "",
+            chunk_index=int(ch.get("chunk_index") or 0), page_number=ch.get("page_number"), score=ch.get("score"),
+            fused_score=ch.get("fused_score"), retrieval=ch.get("retrieval"), source_doc=ch.get("source_doc"),
+            source_path=ch.get("source_path"), row_range=ch.get("row_range"), char_start=ch.get("char_start"),
+            char_end=ch.get("char_end"), line_start=ch.get("line_start"), line_end=ch.get("line_end"),
+            graph_paths=ch.get("graph_paths"), duplicates=ch.get("duplicates"),
+        ).model_dump())
+    data_model = QueryDataModel(
+        answer=result.get("answer", ""),
+        citations=[CitationModel(**c) for c in norm_citations],
+        chunks_retrieved=result.get("chunks_retrieved", {}),
+        chunks_used=[ChunkModel(**c) for c in norm_chunks],
+        reasoning_summary=result.get("reasoning_summary"),
+        filters=None,
+        collection="default",
+    )
+    response = QueryResponse(success=True, data=data_model.model_dump())
+    content = loop.run_until_complete(serialize_response(field=field, response_content=response))
+    return JSONResponse(content).body
+
+
+def timed(fn: Callable[[], bytes], repeat: int, number: int) -> float:
+    fn()
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number * 1e6)
+    return statistics.median(rounds)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="/query response serialization cost")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--k", default="8,20,50", help="chunks_used per response")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--number", type=int, default=200, help="responses per round")
+    args = parser.parse_args()
+
+    from src.api.query import chunk_exclude, query_data, render
+    from src.ingestion.chunker import segment_chunks
+
+    chunks = segment_chunks(load_documents(args.data_dir, with_csv=True))
+    modes = {
+        "before": lambda r: before(r),
+        "after": lambda r: render(query_data(r, None, "default")),
+        "no text": lambda r: render(query_data(r, None, "default"), chunk_exclude(None, include_text=False)),
+        "ids+scores": lambda r: render(query_data(r, None, "default"), chunk_exclude(["score", "fused_score"])),
+    }
+    try:
+        import orjson
+        modes["orjson"] = lambda r: orjson.dumps({"success": True, "data": query_data(r, None, "default").model_dump(),
+                                                  "error": None})
+    except ImportError:
+        print("orjson is not installed; its row is skipped")
+    print(f"{'k':>4} {'mode':<11} {'us/response':>12} {'vs before':>10} {'body KB':>8}")
+    for k in (int(k) for k in args.k.split(",")):
+        result = workflow_result(chunks, k)
+        # Same document either way
+        assert json.loads(modes["before"](result)) == json.loads(modes["after"](result))
+        base = None
+        for name, fn in modes.items():
+            us = timed(lambda: fn(result), args.repeat, args.number)
+            base = base or us
+            print(f"{k:>4} {name:<11} {us:>12.1f} {base / us:>9.1f}x {len(fn(result)) / 1024:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Parity and speed of the Qdrant vector backend against FaissStore.
+
+Indexes the same synthetic chunks and unit vectors into a flat FaissStore and a
+QdrantStore (embedded in a temporary directory unless --qdrant names a server or
+directory), then compares top-k overlap, unfiltered and with an entity filter,
+and reports ingest, single-query and batch-query times. The embedded mode is
+meant for tests: it evaluates payload filters in Python, so time a server. Run
+from the project root:
+
+    python scripts/bench_vector_backends.py --n 5000
+    python scripts/bench_vector_backends.py --qdrant http://localhost:6333
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# Keep anything that opens the default collection off any real server
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+os.environ.setdefault("QDRANT_URL", ":memory:")
+
+from src.retrieval import filters as search_filters  # noqa: E402
+from src.retrieval.backends.chunk_store import ChunkStore  # noqa: E402
+from src.retrieval.backends.faiss_store import FaissStore  # noqa: E402
+from src.retrieval.backends.index_marker import GenerationMarker  # noqa: E402
+from src.retrieval.backends.qdrant_store import QdrantStore  # noqa: E402
+from src.retrieval.entities import ENTITY_ALIASES  # noqa: E402
+
+
+def overlap(a, b) -> float:
+    return float(np.mean([len({r for _, r in x} & {r for _, r in y}) / max(1, len(x)) for x, y in zip(a, b)]))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare QdrantStore with FaissStore on synthetic vectors")
+    parser.add_argument("--n", type=int, default=5000, help="chunks")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=1000, help="chunks per add (one ingestion batch)")
+    parser.add_argument("--qdrant", default=None, help="server URL or directory (default: temporary embedded store)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_vector_backends_")
+    chunks = ChunkStore(os.path.join(tmp, "chunks.sqlite3"), GenerationMarker(os.path.join(tmp, "generation")))
+    faiss_store = FaissStore(os.path.join(tmp, "vector.faiss"), chunks, codec="flat")
+    qdrant_store = QdrantStore(args.qdrant or os.path.join(tmp, "qdrant"), f"bench_{os.getpid()}", chunks)
+
+    rng = np.random.default_rng(0)
+    names = list(ENTITY_ALIASES)
+    x = rng.standard_normal((args.n, args.dim)).astype("float32")
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    faiss_s = qdrant_s = 0.0
+    for start in range(0, args.n, args.batch):
+        end = min(args.n, start + args.batch)
+        rows = chunks.add([{"document_id": f"doc{i // 100}", "chunk_id": f"c{i}", "text": f"chunk {i}",
+                            "source_doc": f"{names[(i // 100) % len(names)]}.txt"} for i in range(start, end)])
+        faiss_s += timed(lambda: faiss_store.add(rows, x[start:end]))[1]
+        qdrant_s += timed(lambda: qdrant_store.add(rows, x[start:end]))[1]
+
+    q = rng.standard_normal((args.queries, args.dim)).astype("float32")
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    print(f"n={args.n} dim={args.dim} k={args.k} queries={args.queries} qdrant={qdrant_store.location}")
+    print(f"{'':<18} {'faiss':>10} {'qdrant':>10}")
+    print(f"{'ingest s':<18} {faiss_s:10.2f} {qdrant_s:10.2f}")
+
+    single = []
+    for store in (faiss_store, qdrant_store):
+        hits, secs = timed(lambda: [store.search_vectors(v[None, :], args.k)[0] for v in q])
+        single.append((hits, secs))
+    print(f"{'ms/query':<18} {single[0][1] * 1000 / args.queries:10.2f} {single[1][1] * 1000 / args.queries:10.2f}")
+    batch = [timed(lambda: store.search_vectors(q, args.k))[1] for store in (faiss_store, qdrant_store)]
+    print(f"{'ms/query (batch)':<18} {batch[0] * 1000 / args.queries:10.2f} {batch[1] * 1000 / args.queries:10.2f}")
+
+    filters = {"entity": [names[0]]}
+    rows = search_filters.tag_values("entity", filters["entity"])
+    allowed = np.unique(np.concatenate([chunks.tag_rows(t) for t in rows]))
+    f_faiss = faiss_store.search_vectors(q, args.k, rows=allowed)
+    f_qdrant = qdrant_store.search_vectors(q, args.k, filters=filters)
+    score_diff = max(abs(a[0] - b[0]) for x_, y_ in zip(single[0][0], single[1][0]) for a, b in zip(x_, y_))
+    print(f"top-{args.k} overlap {overlap(single[0][0], single[1][0]):.3f}, filtered {overlap(f_faiss, f_qdrant):.3f}, "
+          f"max score diff {score_diff:.2e}")
+    print("faiss ", faiss_store.stats())
+    print("qdrant", qdrant_store.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
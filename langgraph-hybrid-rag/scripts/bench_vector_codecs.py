@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Compare FAISS vector codecs: memory per vector, recall@k and query time.
+
+Builds one segment per codec over synthetic unit vectors and searches it as
+FaissStore does, with and without exact re-ranking from the float32 copy. Like
+real text embeddings, the vectors are clustered and concentrated in a low-rank
+subspace (``--rank``) plus isotropic noise. Run from the project root:
+
+    python scripts/bench_vector_codecs.py --n 100000 --dim 1536
+"""
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# Nothing here calls the embeddings API
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+from src.retrieval.backends.faiss_store import CODECS, FaissView, Segment, new_index  # noqa: E402
+
+
+def synthetic(n: int, dim: int, rank: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    basis = rng.standard_normal((rank, dim)).astype("float32")
+    centers = rng.standard_normal((clusters, rank)).astype("float32")
+    latent = centers[rng.integers(0, clusters, n)] + 0.7 * rng.standard_normal((n, rank)).astype("float32")
+    x = latent @ basis + 0.1 * np.sqrt(rank) * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(x)
+    return x
+
+
+def run(view: FaissView, queries: np.ndarray, truth: np.ndarray, k: int):
+    hits, start = 0, time.perf_counter()
+    for q, t in zip(queries, truth):
+        got = [row for _, row in view.search(q[None, :], k)]
+        hits += len(set(got) & set(t.tolist()))
+    return hits / truth.size, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark FAISS vector codecs with and without re-ranking")
+    parser.add_argument("--n", type=int, default=50000, help="vectors")
+    parser.add_argument("--dim", type=int, default=1536, help="dimension (text-embedding-3-small: 1536)")
+    parser.add_argument("--rank", type=int, default=128, help="dimension of the subspace the vectors concentrate in")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=4, help="candidates per result (VECTOR_RERANK_FACTOR)")
+    parser.add_argument("--codecs", nargs="+", default=list(CODECS), choices=CODECS)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    x = synthetic(args.n + args.queries, args.dim, args.rank, max(1, args.n // 100), rng)
+    # Held-out points from the same distribution
+    x, queries = x[:args.n], x[args.n:]
+    truth = np.argsort(-(queries @ x.T), axis=1)[:, :args.k]
+    ids = np.arange(args.n, dtype="int64")
+    live = np.ones(args.n, dtype=bool)
+
+    print(f"n={args.n} dim={args.dim} k={args.k} rerank={args.rerank}x")
+    print(f"{'codec':<6} {'B/vec':>7} {'GB/1M':>7} {'build s':>8} {'recall':>7} {'ms/q':>6} {'rerank recall':>14} {'ms/q':>6}")
+    for codec in args.codecs:
+        start = time.perf_counter()
+        index = new_index(x, ids, codec)
+        build = time.perf_counter() - start
+        per_vec = faiss.serialize_index(index).size / args.n
+        seg = (Segment("bench", index),)
+        recall, ms = run(FaissView(0, seg, live, args.n, None), queries, truth, args.k)
+        line = f"{codec:<6} {per_vec:7.0f} {per_vec * 1e6 / 2**30:7.2f} {build:8.1f} {recall:7.3f} {ms:6.1f}"
+        if codec != "flat":
+            # Re-ranking reads candidates from the float32 copy; it stays on disk, not in RAM
+            rr_recall, rr_ms = run(FaissView(0, seg, live, args.n, None, x, args.rerank), queries, truth, args.k)
+            line += f" {rr_recall:14.3f} {rr_ms:6.1f}"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Measure retrieval quality and latency together, per configuration.
+
+Indexes ``real_data/final_docs`` the way /init does (companyfacts and CSV documents,
+no web enrichment) and asks a golden question per FY summary line of the
+companyfacts documents, e.g. "What was Apple Inc.'s net income in 2023?". The
+chunks containing that line are its sources. Each configuration runs the /query
+retrieval in-process (``hybrid.retrieve``: routing, both searches, fusion) and
+reports recall@k (questions with a source chunk in the top k), MRR and latency
+percentiles per stage. Configurations are comma-separated ``key=value`` lists:
+
+    k            chunks returned (max_chunks)
+    fusion       FUSION: rrf, minmax, zscore, weighted
+    depth        FUSION_CANDIDATE_FACTOR
+    rrf_k        RRF_K
+    routing      ENTITY_ROUTING: on, off
+    chunk_size   CHUNK_SIZE (rebuilds the index)
+    codec        VECTOR_CODEC (rebuilds the index)
+    keyword      KEYWORD_BACKEND (rebuilds the index)
+
+Embeddings come from the configured OpenAI model, with ``--embeddings local`` from the
+local provider (``EMBEDDING_MODEL=local``), or with ``--embeddings hash`` from a
+feature-hashing stand-in; the last two run offline. Run from the project root:
+
+    python scripts/eval_retrieval.py --embeddings hash --config fusion=rrf,k=5 --config fusion=weighted,k=5
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config import config  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATA_DIR = os.path.join(ROOT, "..", "real_data", "final_docs")
+METRICS = {
+    "EarningsPerShareDiluted": "diluted earnings per share",
+    "EarningsPerShareBasic": "basic earnings per share",
+    "NetIncomeLoss": "net income",
+    "Revenues": "revenue",
+    "SalesRevenueNet": "net sales",
+}
+_FY_LINE = re.compile(r"^(?P<entity>.+) (?P<year>(?:19|20)\d\d) (?P<metric>[A-Za-z]+): .+$")
+DEFAULT_CONFIGS = [
+    "fusion=rrf,k=5", "fusion=minmax,k=5", "fusion=zscore,k=5", "fusion=weighted,k=5",
+    "fusion=rrf,k=3", "fusion=rrf,k=10", "fusion=rrf,k=5,depth=4", "fusion=rrf,k=5,routing=off",
+    "fusion=rrf,k=5,chunk_size=200", "fusion=rrf,k=5,chunk_size=800",
+    "fusion=rrf,k=5,codec=sq8", "fusion=rrf,k=5,keyword=fts5",
+]
+# key -> (config attribute, parser); build keys need their own index
+_BOOL = lambda v: v.lower() in ("1", "on", "true", "yes")  # noqa: E731
+BUILD_KEYS = {"chunk_size": ("CHUNK_SIZE", int), "codec": ("VECTOR_CODEC", str), "keyword": ("KEYWORD_BACKEND", str)}
+QUERY_KEYS = {"fusion": ("FUSION", str), "depth": ("FUSION_CANDIDATE_FACTOR", float), "rrf_k": ("RRF_K", int),
+              "routing": ("ENTITY_ROUTING", _BOOL)}
+STAGES = ("filter", "vector", "keyword", "fusion", "total")
+
+
+def parse_config(spec: str) -> Tuple[Dict, Dict, int]:
+    build, query, k = {}, {}, config.MERGED_TOP_K
+    for item in filter(None, spec.split(",")):
+        key, _, value = item.partition("=")
+        key = key.strip()
+        if key == "k":
+            k = int(value)
+        elif key in BUILD_KEYS:
+            build[BUILD_KEYS[key][0]] = BUILD_KEYS[key][1](value)
+        elif key in QUERY_KEYS:
+            query[QUERY_KEYS[key][0]] = QUERY_KEYS[key][1](value)
+        else:
+            raise SystemExit(f"unknown configuration key {key!r} in {spec!r}")
+    return build, query, k
+
+
+@contextmanager
+def overrides(values: Dict) -> Iterator[None]:
+    saved = {name: getattr(config, name) for name in values}
+    for name, value in values.items():
+        setattr(config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+
+def load_documents(data_dir: str, with_csv: bool) -> List[Dict]:
+    """The documents /init generates for ``data_dir``, before chunking."""
+    from src.ingestion.corpus_builder import build_from_companyfacts, build_from_csv
+    from src.ingestion.json_parser import stream_companyfacts
+    docs: List[Dict] = []
+    for fn in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, fn)
+        if fn.endswith(".json"):
+            data, facts = stream_companyfacts(path)
+            docs.extend(build_from_companyfacts(path, data, df=facts))
+        elif fn.endswith(".csv") and with_csv:
+            docs.extend(build_from_csv(path))
+    return docs
+
+
+def golden_questions(docs: List[Dict]) -> List[Dict]:
+    questions = []
+    for doc in docs:
+        for line in doc["text"].split("\n"):
+            m = _FY_LINE.match(line)
+            if m and m["metric"] in METRICS:
+                questions.append({"question": f"What was {m['entity']}'s {METRICS[m['metric']]} in {m['year']}?",
+                                  "line": line})
+    return questions
+
+
+def build_index(docs: List[Dict], params: Dict, embeddings, workdir: str):
+    from src.ingestion.chunker import segment_chunks
+    from src.ingestion.indexer import index_chunks
+    from src.ingestion.jobs import batched
+    from src.retrieval.collection import Collection
+    with overrides(params):
+        chunks = segment_chunks(docs)
+        collection = Collection.open("eval", directory=tempfile.mkdtemp(prefix="index-", dir=workdir))
+        if embeddings is not None:
+            collection.vector.embeddings = embeddings
+        start = time.perf_counter()
+        for batch in batched(chunks, config.INGEST_BATCH_SIZE):
+            index_chunks(batch, collection=collection)
+        seconds = time.perf_counter() - start
+    return collection, chunks, seconds
+
+
+def evaluate(collection, chunks: List[Dict], questions: List[Dict], k: int, params: Dict) -> Dict:
+    from src.retrieval.hybrid import retrieve
+    sources = [{c["chunk_id"] for c in chunks if q["line"] in c["text"]} for q in questions]
+    asked = [(q, s) for q, s in zip(questions, sources) if s]
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    hits, reciprocal = [], []
+    with overrides(params):
+        retrieve(asked[0][0]["question"], k, collection=collection)
+        for q, source in asked:
+            stages: Dict[str, float] = {}
+            start = time.perf_counter()
+            found = retrieve(q["question"], k, collection=collection, timings=stages)
+            stages["total"] = time.perf_counter() - start
+            for stage in STAGES:
+                timings[stage].append(stages[stage] * 1000)
+            # A chunk also answers for the near-duplicates indexed as it
+            ranks = [i for i, ch in enumerate(found.merged_chunks, 1)
+                     if ch["chunk_id"] in source or any(d["chunk_id"] in source for d in ch.get("duplicates") or ())]
+            hits.append(bool(ranks))
+            reciprocal.append(1.0 / ranks[0] if ranks else 0.0)
+    return {
+        "questions": len(asked),
+        "recall": float(np.mean(hits)),
+        "mrr": float(np.mean(reciprocal)),
+        "latency_ms": {stage: {p: float(np.percentile(v, int(p[1:]))) for p in ("p50", "p95", "p99")}
+                       for stage, v in timings.items()},
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Retrieval recall, MRR and latency per configuration")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--config", action="append", help="key=value,... (repeatable; default: a standard grid)")
+    parser.add_argument("--questions", type=int, default=0, help="sample this many golden questions (0: all)")
+    parser.add_argument("--no-csv", action="store_true", help="index only the companyfacts documents")
+    parser.add_argument("--embeddings", choices=("openai", "local", "hash"), default="openai")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    if args.embeddings == "openai" and not config.OPENAI_API_KEY:
+        parser.error("OPENAI_API_KEY is not set; use --embeddings local or hash to run offline")
+    embeddings = None
+    if args.embeddings == "local":
+        config.EMBEDDING_MODEL = "local"
+    elif args.embeddings == "hash":
+        from standins import HashEmbeddings
+        embeddings = HashEmbeddings()
+        # The vector stores still construct their OpenAI client
+        config.OPENAI_API_KEY = config.OPENAI_API_KEY or "unused"
+    configs = [(spec, *parse_config(spec)) for spec in (args.config or DEFAULT_CONFIGS)]
+
+    docs = load_documents(args.data_dir, with_csv=not args.no_csv)
+    questions = golden_questions(docs)
+    if args.questions and args.questions < len(questions):
+        questions = random.Random(0).sample(questions, args.questions)
+    print(f"{len(docs)} documents, {len(questions)} golden questions, embeddings: {args.embeddings}")
+
+    workdir = tempfile.mkdtemp(prefix="eval_retrieval_")
+    indexes: Dict[Tuple, Tuple] = {}
+    results = []
+    header = (f"{'configuration':<34} {'chunks':>6} {'recall':>7} {'MRR':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}"
+              f" {'vector':>7} {'keyword':>7} {'fusion':>7}")
+    print(header)
+    for spec, build, query, k in configs:
+        key = tuple(sorted(build.items()))
+        if key not in indexes:
+            indexes[key] = build_index(docs, build, embeddings, workdir)
+        collection, chunks, index_s = indexes[key]
+        result = {"config": spec, "k": k, "chunks": len(chunks), "index_seconds": round(index_s, 2),
+                  **evaluate(collection, chunks, questions, k, query)}
+        results.append(result)
+        lat = result["latency_ms"]
+        print(f"{spec:<34} {len(chunks):>6} {result['recall']:7.3f} {result['mrr']:6.3f} {lat['total']['p50']:7.2f}"
+              f" {lat['total']['p95']:7.2f} {lat['total']['p99']:7.2f} {lat['vector']['p50']:7.2f}"
+              f" {lat['keyword']['p50']:7.2f} {lat['fusion']['p50']:7.2f}")
+    print("latency columns after p99 are stage p50s; recall@k counts questions with a source chunk in the top k")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"embeddings": args.embeddings, "questions": len(questions), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,84 @@
+"""Deterministic local stand-ins for the OpenAI clients, for benchmarks and evaluations
+that must run offline. Assign the embeddings to a store's ``embeddings`` attribute
+and return the LLM from ``src.agent.nodes._llm``."""
+import json
+import re
+import time
+import zlib
+from typing import List
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+
+class HashEmbeddings:
+    """Signed feature hashing of lowercase words and word bigrams into ``dim`` floats.
+
+    Texts sharing words get similar vectors, so it ranks like a weak lexical model,
+    not a semantic one: use it to measure the pipeline, not embedding quality.
+    ``latency_ms`` is slept per call to stand in for the API round-trip."""
+
+    def __init__(self, dim: int = 256, latency_ms: float = 0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        # What the API would have been asked for
+        self.calls = 0
+        self.texts = 0
+        self.seconds = 0.0
+
+    def _vector(self, text: str) -> np.ndarray:
+        words = _TOKEN.findall(text.lower())
+        features = words + [a + " " + b for a, b in zip(words, words[1:])]
+        v = np.zeros(self.dim, dtype="float32")
+        if features:
+            # Not cached: numbers make most features unique, and a cache would outgrow the indexes
+            h = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+            np.add.at(v, (h % self.dim).astype(np.intp), np.where(h >> 31, 1.0, -1.0).astype("float32"))
+        return v
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        self.calls += 1
+        self.texts += len(texts)
+        start = time.perf_counter()
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        vectors = np.stack([self._vector(t) for t in texts]) if texts else np.zeros((0, self.dim), dtype="float32")
+        self.seconds += time.perf_counter() - start
+        return vectors
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed_documents([text])[0]
+
+
+_CHUNK_ID = re.compile(r"chunk_id=(\S+)\n([^\n]*)")
+
+
+class _Message:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class EchoLLM:
+    """Answers any prompt of ``src.prompts`` from the chunks in it, without a model.
+
+    The answer quotes the first chunk, the citations are the first two chunks as the
+    JSON array the citation prompt asks for, and the reasoning summary names them.
+    ``latency_ms`` is slept per call to stand in for the completion round-trip."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def invoke(self, prompt: str) -> _Message:
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        chunks = _CHUNK_ID.findall(prompt)
+        if '"source_chunk_id"' in prompt:
+            return _Message(json.dumps([{"claim": line[:80], "source_chunk_id": chunk_id, "quote": line[:180],
+                                         "confidence": 0.8} for chunk_id, line in chunks[:2]]))
+        if not chunks:
+            return _Message("Derived from the highest-ranked chunks.")
+        chunk_id, line = chunks[0]
+        return _Message(f"{line[:200]} (chunk_id={chunk_id})")
@@ -1,5 +1,6 @@
 import requests
 import os
+import time
 
 BASE_URL = os.environ.get("BASE_URL", "http://localhost:8000")
 
@@ -10,9 +11,17 @@ def test_rag_pipeline():
     path = os.path.join(os.path.dirname(__file__), "../test_documents/aws_well_architected_framework.pdf")
     path = os.path.abspath(path)
     with open(path, "rb") as f:
-        response = requests.post(f"{BASE_URL}/ingest", files={"file": f})
+        # replace: a re-run re-indexes the file instead of reporting it unchanged with 0 chunks
+        response = requests.post(f"{BASE_URL}/ingest", files={"file": f}, data={"replace": "true"})
     response.raise_for_status()
-    chunks = response.json()["data"]["chunks_created"]
+    job_id = response.json()["data"]["job_id"]
+    while True:
+        job = requests.get(f"{BASE_URL}/ingest/jobs/{job_id}").json()["data"]
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.5)
+    assert job["status"] == "done", job["error"]
+    chunks = job["result"]["chunks_created"]
     assert chunks >= 100, f"Unexpected chunks: {chunks}"
 
     # 2. Test keyword query
@@ -1,23 +1,22 @@
 from typing import Dict, List, Tuple, Optional
 from ..retrieval.vector_search import vector_search
 from ..retrieval.text_search import keyword_search
-from ..retrieval.merger import merge_results
+from ..retrieval.merger import merge_results, candidate_depth
 from ..config import config
 from ..prompts import ANSWER_PROMPT, CITATION_PROMPT, REASONING_SUMMARY_PROMPT
-from langchain_openai import ChatOpenAI
 from ..telemetry import log_step
 import re
 
 
 def retrieve_vector(state: Dict) -> Dict:
     return {
-        "vector_chunks": vector_search(state["question"], top_k=config.VECTOR_TOP_K)
+        "vector_chunks": vector_search(state["question"], top_k=max(config.VECTOR_TOP_K, candidate_depth(config.MERGED_TOP_K)))
     }
 
 
 def retrieve_keyword(state: Dict) -> Dict:
     return {
-        "keyword_chunks": keyword_search(state["question"], top_k=config.KEYWORD_TOP_K)
+        "keyword_chunks": keyword_search(state["question"], top_k=max(config.KEYWORD_TOP_K, candidate_depth(config.MERGED_TOP_K)))
     }
 
 
@@ -35,7 +34,7 @@ def generate_answer(state: Dict) -> Dict:
         top_texts = "\n\n".join([c.get("text", "")[:300] for c in merged[:2]])
         answer = (top_texts[:800] or "No chunks available.").strip()
         return {"answer": answer}
-    llm = ChatOpenAI(model=config.LLM_MODEL, api_key=api_key, temperature=0)
+    llm = _llm(api_key)
     # Limit context size roughly
     joined = []
     total = 0
@@ -75,7 +74,7 @@ def extract_citations(state: Dict) -> Dict:
                 "confidence": float(c.get("fused_score", 0.5))
             })
         return {"citations": citations}
-    llm = ChatOpenAI(model=config.LLM_MODEL, api_key=api_key, temperature=0)
+    llm = _llm(api_key)
     joined = []
     total = 0
     for c in merged:
@@ -97,8 +96,14 @@ def extract_citations(state: Dict) -> Dict:
         citations = json.loads(result.content)
     except Exception:
         citations = []
+    by_id = {c.get("chunk_id"): c for c in merged}
     for c in citations:
         c.setdefault("confidence", 0.5)
+        # Page and source come from the cited chunk, not the LLM
+        src = by_id.get(c.get("chunk_id") or c.get("source_chunk_id"))
+        if src:
+            c.setdefault("source_doc", src.get("source_doc"))
+            c.setdefault("page_number", src.get("page_number"))
     return {"citations": citations}
 
 
@@ -107,7 +112,7 @@ def summarize_reasoning(state: Dict) -> Dict:
     merged = state.get("merged_chunks", [])
     if not api_key:
         return {"reasoning_summary": f"Answer derived from {', '.join([c['chunk_id'] for c in merged[:3]])}."}
-    llm = ChatOpenAI(model=config.LLM_MODEL, api_key=api_key, temperature=0)
+    llm = _llm(api_key)
     chunks_formatted = ", ".join([c['chunk_id'] for c in merged])
     prompt = REASONING_SUMMARY_PROMPT.format(question=state["question"], answer=state.get("answer",""), chunks=chunks_formatted)
     result = llm.invoke(prompt)
@@ -116,6 +121,12 @@ def summarize_reasoning(state: Dict) -> Dict:
 
 # --- Helpers ---
 
+def _llm(api_key: str):
+    # langchain_openai takes about a second to import; only the LLM path needs it
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=config.LLM_MODEL, api_key=api_key, temperature=0)
+
+
 def _compute_basic_comparison_block(question: str, chunks: List[Dict]) -> Optional[str]:
     """Extract simple EPS/NetIncome/Revenue numbers for two entities from retrieved chunks.
     Returns a small facts text block grounded in chunk_ids for the answer prompt.
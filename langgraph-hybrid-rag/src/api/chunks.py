@@ -1,12 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from typing import Dict, List
+from itertools import islice
 import os
-import numpy as np
 
-from ..retrieval.backends.faiss_store import store as faiss_store
+from ..config import config
+from ..retrieval.collection import registry as collections
 
 
 router = APIRouter(prefix="/chunk", tags=["chunks"])
+batch_router = APIRouter(prefix="/chunks", tags=["chunks"])
 
 
 class ChunkDetailResponse(BaseModel):
@@ -15,28 +18,65 @@ class ChunkDetailResponse(BaseModel):
     error: str | None = None
 
 
+class ChunkBatchRequest(BaseModel):
+    chunk_ids: List[str]
+    collection: str | None = None
+
+
 @router.get("/{chunk_id}")
-async def get_chunk_detail(chunk_id: str) -> ChunkDetailResponse:
+def get_chunk_detail(chunk_id: str, collection: str | None = None) -> ChunkDetailResponse:
     try:
-        # Try to find in FAISS metadata
-        meta_list = faiss_store.metadata or []
-        for ch in meta_list:
-            if ch.get("chunk_id") == chunk_id:
-                # Build response
-                doc_info = {
-                    "filename": ch.get("source_doc", "unknown"),
-                    "indexed_at": ch.get("indexed_at", "unknown")
-                }
-                source_lines = ch.get("source_lines") or []
-                return ChunkDetailResponse(success=True, data={
-                    "chunk": ch,
-                    "document": doc_info,
-                    "source_lines": source_lines
-                })
+        if not collections.exists(collection):
+            return ChunkDetailResponse(success=False, error="Collection not found")
+        with collections.using(collection) as coll:
+            ch = coll.chunks.find(chunk_id)
+        if ch is not None:
+            return ChunkDetailResponse(success=True, data=_detail(ch))
         return ChunkDetailResponse(success=False, error="Chunk not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@batch_router.post("")
+def get_chunks(req: ChunkBatchRequest) -> ChunkDetailResponse:
+    try:
+        if len(req.chunk_ids) > config.MAX_CHUNK_BATCH:
+            return ChunkDetailResponse(success=False, error=f"At most {config.MAX_CHUNK_BATCH} chunk_ids per request")
+        if not collections.exists(req.collection):
+            return ChunkDetailResponse(success=False, error="Collection not found")
+        with collections.using(req.collection) as coll:
+            found = coll.chunks.find_many(req.chunk_ids)
+        return ChunkDetailResponse(success=True, data={
+            "chunks": [_detail(found[cid]) for cid in dict.fromkeys(req.chunk_ids) if cid in found],
+            "missing": [cid for cid in dict.fromkeys(req.chunk_ids) if cid not in found]
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _detail(ch: Dict) -> Dict:
+    doc_info = {
+        "filename": ch.get("source_doc", "unknown"),
+        "indexed_at": ch.get("indexed_at", "unknown")
+    }
+    return {
+        "chunk": ch,
+        "document": doc_info,
+        "source_lines": ch.get("source_lines") or _source_lines(ch)
+    }
 
 
+def _source_lines(ch: Dict) -> List[Dict]:
+    """Numbered source lines for a chunk. Plain-text sources are re-read by line range;
+    generated descriptions (CSV/JSON profiles) and extracted PDF/DOCX text fall back
+    to the chunk text, which is a verbatim slice of that source."""
+    start, end = ch.get("line_start"), ch.get("line_end")
+    if not start or not end:
+        return []
+    path = ch.get("source_path") or ""
+    if os.path.splitext(path)[1].lower() in {".txt", ".md"} and os.path.exists(path):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            lines = [line.rstrip("\n") for line in islice(f, start - 1, end)]
+    else:
+        lines = ch.get("text", "").split("\n")
+    return [{"line_number": start + i, "text": line} for i, line in enumerate(lines)]
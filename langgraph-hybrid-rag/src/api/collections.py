@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from ..retrieval.collection import registry
+
+
+router = APIRouter(prefix="/collections", tags=["collections"])
+
+
+class CollectionsResponse(BaseModel):
+    success: bool
+    data: dict | None = None
+    error: str | None = None
+
+
+@router.get("")
+async def list_collections() -> CollectionsResponse:
+    try:
+        return CollectionsResponse(success=True, data={"collections": registry.stats()})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import os
-import json
+from ..ingestion.indexer import remove_documents
+from ..retrieval.collection import registry as collections
 
 
 router = APIRouter(prefix="/documents", tags=["documents"])
@@ -14,26 +14,40 @@ class DocumentsResponse(BaseModel):
 
 
 @router.get("")
-async def list_documents() -> DocumentsResponse:
+def list_documents(collection: str | None = None) -> DocumentsResponse:
     try:
-        meta_path_legacy = os.path.join("data", "indices", "documents.json")
-        meta_path = os.path.join("data", "generated_indices", "documents.json")
-        path = meta_path if os.path.exists(meta_path) else meta_path_legacy
-        documents = []
-        total_chunks = 0
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                documents = data.get("documents", [])
-                total_chunks = sum(d.get("chunks", 0) for d in documents)
+        if not collections.exists(collection):
+            return DocumentsResponse(success=False, error="Collection not found")
+        with collections.using(collection) as coll:
+            documents = coll.chunks.documents()
+            # Stored, but indexed only as the chunk they duplicate
+            duplicate_chunks = coll.chunks.duplicate_count()
+        total_chunks = sum(d["chunks"] for d in documents)
         return DocumentsResponse(success=True, data={
             "documents": documents,
             "total_documents": len(documents),
-            "total_chunks": total_chunks
+            "total_chunks": total_chunks,
+            "duplicate_chunks": duplicate_chunks
         })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-
-
+# A plain def, run in the thread pool: removal waits for the collection's writer (an
+# ingest job or compaction) and re-embeds promoted duplicates while it holds it
+@router.delete("/{document_id}")
+def delete_document(document_id: str, collection: str | None = None) -> DocumentsResponse:
+    try:
+        if not collections.exists(collection):
+            return DocumentsResponse(success=False, error="Collection not found")
+        with collections.using(collection) as coll:
+            chunks_removed = remove_documents([document_id], coll)
+        if not chunks_removed:
+            return DocumentsResponse(success=False, error="Document not found")
+        return DocumentsResponse(success=True, data={
+            "document_id": document_id,
+            "chunks_removed": chunks_removed,
+            "status": "deleted"
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
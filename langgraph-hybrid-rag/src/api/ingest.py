@@ -1,11 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from pydantic import BaseModel
+from typing import Dict, Iterator, Tuple
+import asyncio
+import contextlib
+import hashlib
 import os
 import uuid
 from ..config import config
-from ..ingestion.loader import load_file_to_text
-from ..ingestion.chunker import chunk_text
-from ..ingestion.indexer import index_chunks
+from ..ingestion.loader import iter_pages
+from ..ingestion.chunker import iter_document_chunks
+from ..ingestion.indexer import index_chunks, remove_documents, documents_for_source, is_indexed
+from ..ingestion.manifest import document_id_for
+from ..ingestion.jobs import Job, queue, batched
+from ..retrieval.collection import registry as collections, valid_name
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
 
@@ -16,22 +23,89 @@ class IngestResponse(BaseModel):
     error: str | None = None
 
 
+def _counted_pages(job: Job, path: str) -> Iterator[Tuple[int | None, str]]:
+    for record in iter_pages(path):
+        job.advance("pages")
+        yield record
+
+
+def run_ingest(job: Job, saved_path: str, filename: str, digest: str, replace: bool,
+               collection: str | None = None) -> Dict:
+    with collections.using(collection, create=True) as coll:
+        return _ingest(job, saved_path, filename, digest, replace, coll)
+
+
+def _ingest(job: Job, saved_path: str, filename: str, digest: str, replace: bool, coll) -> Dict:
+    # The digest of the bytes received, not of whatever is at saved_path by now
+    document_id = document_id_for(filename, digest)
+    chunks_removed = 0
+    if replace:
+        # Drop every earlier version of this filename, including an identical re-upload
+        chunks_removed = remove_documents(documents_for_source(filename, coll) + [document_id], coll)
+    elif is_indexed(document_id, coll):
+        return {"document_id": document_id, "collection": coll.name, "chunks_created": 0, "status": "unchanged"}
+    chunks_indexed = 0
+    try:
+        # Pages -> chunks -> embed/index batches; the document is never held whole as chunks
+        for batch in batched(iter_document_chunks(_counted_pages(job, saved_path), doc_id=document_id), config.INGEST_BATCH_SIZE):
+            for ch in batch:
+                ch["source_doc"] = filename
+                ch["source_path"] = saved_path
+            job.advance("chunks_created", len(batch))
+            chunks_indexed += index_chunks(batch, on_progress=job.advance, collection=coll)
+    except BaseException:
+        # Each batch is committed as it goes: drop the partial document, or a retry would
+        # find it indexed and report it unchanged. The job is marked failed by the queue.
+        remove_documents([document_id], coll)
+        raise
+    return {
+        "collection": coll.name,
+        "document_id": document_id,
+        "chunks_created": chunks_indexed,
+        "chunks_removed": chunks_removed,
+        "status": "replaced" if chunks_removed else "indexed"
+    }
+
+
 @router.post("")
-async def ingest(file: UploadFile = File(...)) -> IngestResponse:
+async def ingest(file: UploadFile = File(...), replace: bool = Form(False), wait: bool = Form(False),
+                 collection: str | None = Form(None)) -> IngestResponse:
+    if not valid_name(collection):
+        raise HTTPException(status_code=400, detail="Invalid collection name")
     try:
-        os.makedirs("data/documents", exist_ok=True)
-        saved_path = os.path.join("data/documents", file.filename)
-        with open(saved_path, "wb") as f:
-            f.write(await file.read())
-
-        document_id = f"doc_{uuid.uuid4().hex[:8]}"
-        text = load_file_to_text(saved_path)
-        chunks = chunk_text(text, doc_id=document_id)
-        chunks_indexed = index_chunks(chunks)
-        return IngestResponse(success=True, data={
-            "document_id": document_id,
-            "chunks_created": chunks_indexed,
-            "status": "indexed"
-        })
+        # Uploads of the same filename to different collections must not overwrite each other
+        upload_dir = os.path.join("data/documents", collection) if collection else "data/documents"
+        os.makedirs(upload_dir, exist_ok=True)
+        filename = os.path.basename(file.filename or "upload")
+        # Copy the upload in blocks, hashing as it goes; concurrent uploads write their own part file
+        part_path = os.path.join(upload_dir, f"{filename}.{uuid.uuid4().hex}.part")
+        h = hashlib.sha256()
+        try:
+            with open(part_path, "wb") as f:
+                while block := await file.read(config.UPLOAD_CHUNK_BYTES):
+                    h.update(block)
+                    f.write(block)
+            digest = h.hexdigest()
+            # Named by content: a later upload of the same name cannot replace it before it is parsed
+            saved_path = os.path.join(upload_dir, f"{digest[:16]}-{filename}")
+            os.replace(part_path, saved_path)
+        except BaseException:
+            # Client gone or disk full mid-copy: no partial upload is left behind
+            with contextlib.suppress(OSError):
+                os.unlink(part_path)
+            raise
+
+        job = queue.submit("ingest", run_ingest, saved_path, filename, digest, replace, collection)
+        if wait:
+            return IngestResponse(success=True, data=await asyncio.wrap_future(job.future))
+        return IngestResponse(success=True, data={"job_id": job.id, "status": job.status})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> IngestResponse:
+    job = queue.get(job_id)
+    if job is None:
+        return IngestResponse(success=False, error="Job not found")
+    return IngestResponse(success=True, data=job.to_dict())
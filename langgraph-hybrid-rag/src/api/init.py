@@ -1,22 +1,29 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from typing import List, Dict
+import asyncio
 import os
 import glob
-from ..ingestion.csv_parser import load_csv, profile_csv
-from ..ingestion.json_parser import load_json
-from ..ingestion.corpus_builder import build_from_csv, build_from_companyfacts
-from ..ingestion.graph_generator import save_timeseries_plot
-from ..ingestion.indexer import index_chunks
-from ..ingestion.chunker import chunk_text
-from ..telemetry import log_step
+import threading
+from ..ingestion.indexer import index_chunks, remove_documents, indexed_document_ids
+from ..ingestion.chunker import segment_chunks
+from ..ingestion.manifest import Manifest, stable_id
+from ..ingestion.jobs import Job, queue
+from ..telemetry import log_step, rss_delta_mb, rss_mb
+from ..retrieval.collection import Collection, registry as collections, valid_name
 from ..ingestion.web_search import web_search_news
 
 
 router = APIRouter(prefix="/init", tags=["init"])
+# One directory scan at a time: scans share the manifest
+_init_lock = threading.Lock()
 
 
 class InitRequest(BaseModel):
     data_dir: str
+    force: bool = False
+    wait: bool = False
+    collection: str | None = None
 
 
 class InitResponse(BaseModel):
@@ -25,73 +32,114 @@ class InitResponse(BaseModel):
     error: str | None = None
 
 
+def _web_enrichment(entity_name: str) -> Dict | None:
+    news = web_search_news(f"latest {entity_name} earnings 2023 site:investor.apple.com OR site:ir.tesla.com OR site:sec.gov", max_results=5)
+    if not news:
+        return None
+    lines = []
+    for n in news:
+        title = n.get("title") or n.get("source") or ""
+        body = n.get("body") or n.get("snippet") or ""
+        url = n.get("link") or n.get("url") or ""
+        lines.append(f"- {title}: {body} ({url})")
+    return {
+        "document_id": stable_id("web", entity_name),
+        "text": f"Web search enrichment for {entity_name}:\n" + "\n".join(lines),
+        "source_doc": f"web_search_{entity_name}.md",
+        "source_path": f"ddg:latest {entity_name} earnings 2023",
+        "chunk_index": 0,
+        "page_number": None,
+    }
+
+
+def run_init(job: Job, data_dir: str, force: bool, collection: str | None = None) -> Dict:
+    with _init_lock, collections.using(collection, create=True) as coll:
+        return _scan(job, data_dir, force, coll)
+
+
+def _scan(job: Job, data_dir: str, force: bool, coll: Collection) -> Dict:
+    # pandas-based parsers: imported by the first scan, not at server start
+    from ..ingestion.json_parser import stream_companyfacts
+    from ..ingestion.corpus_builder import build_from_csv, build_from_companyfacts
+    total_chunks = 0
+    chunks_removed = 0
+    processed_files = []
+    skipped_files = []
+    manifest = Manifest(coll.manifest_path)
+    known_ids = indexed_document_ids(coll)
+
+    def needs_indexing(path: str) -> str | None:
+        digest, changed = manifest.check(path)
+        previous = manifest.document_ids(path)
+        # A wiped index invalidates the manifest entry even if the file is unchanged
+        if changed or force or not previous or not set(previous) <= known_ids:
+            return digest
+        skipped_files.append(path)
+        job.advance("files_skipped")
+        return None
+
+    def replace(path: str, digest: str, chunks: List[Dict]) -> int:
+        nonlocal chunks_removed
+        chunks_removed += remove_documents(manifest.document_ids(path), coll)
+        indexed = index_chunks(segment_chunks(chunks), on_progress=job.advance, collection=coll)
+        manifest.record(path, digest, [ch["document_id"] for ch in chunks])
+        manifest.save()
+        processed_files.append(path)
+        job.advance("files_processed")
+        return indexed
+
+    # CSV files
+    with log_step("init_csv_scan", data_dir=data_dir):
+        for path in glob.glob(os.path.join(data_dir, "**", "*.csv"), recursive=True):
+            digest = needs_indexing(path)
+            if digest is None:
+                continue
+            total_chunks += replace(path, digest, build_from_csv(path, digest=digest, root=data_dir))
+
+    # JSON files (SEC-like)
+    with log_step("init_json_scan", data_dir=data_dir):
+        for path in glob.glob(os.path.join(data_dir, "**", "*.json"), recursive=True):
+            digest = needs_indexing(path)
+            if digest is None:
+                continue
+            with log_step("init_json_parse", path=path) as parsed:
+                # This parse's own footprint; the process peak covers every earlier step too
+                before = rss_mb()
+                data, facts = stream_companyfacts(path)
+                parsed.update(facts=len(facts), rss_delta_mb=rss_delta_mb(before))
+            chunks = build_from_companyfacts(path, data, digest=digest, df=facts, root=data_dir)
+            # Optional enrichment: recent news per entity
+            try:
+                entity_name = data.get("entityName") or None
+                if entity_name:
+                    web_chunk = _web_enrichment(entity_name)
+                    if web_chunk:
+                        chunks.append(web_chunk)
+            except Exception:
+                pass
+            total_chunks += replace(path, digest, chunks)
+
+    return {
+        "collection": coll.name,
+        "processed_files": processed_files,
+        "skipped_files": skipped_files,
+        "chunks_indexed": total_chunks,
+        "chunks_removed": chunks_removed,
+    }
+
+
 @router.post("")
 async def initialize(req: InitRequest) -> InitResponse:
     try:
-        data_dir = req.data_dir
-        if not os.path.exists(data_dir):
+        if not os.path.exists(req.data_dir):
             raise HTTPException(status_code=400, detail="data_dir does not exist")
-
-        total_chunks = 0
-        processed_files = []
-
-        # CSV files
-        with log_step("init_csv_scan", data_dir=data_dir):
-            for path in glob.glob(os.path.join(data_dir, "**", "*.csv"), recursive=True):
-                chunks = build_from_csv(path)
-                # chunk the large description text
-                final_chunks = []
-                for ch in chunks:
-                    doc_id = ch["document_id"]
-                    for seg in chunk_text(ch["text"], doc_id=doc_id):
-                        seg["source_doc"] = ch["source_doc"]
-                        seg["source_path"] = ch["source_path"]
-                        final_chunks.append(seg)
-                total_chunks += index_chunks(final_chunks)
-                processed_files.append(path)
-
-        # JSON files (SEC-like)
-        with log_step("init_json_scan", data_dir=data_dir):
-            for path in glob.glob(os.path.join(data_dir, "**", "*.json"), recursive=True):
-                data = load_json(path)
-                chunks = build_from_companyfacts(path, data)
-                # Optional enrichment: recent news per entity
-                try:
-                    entity_name = data.get("entityName") or None
-                    if entity_name:
-                        news = web_search_news(f"latest {entity_name} earnings 2023 site:investor.apple.com OR site:ir.tesla.com OR site:sec.gov", max_results=5)
-                        if news:
-                            lines = []
-                            for n in news:
-                                title = n.get("title") or n.get("source") or ""
-                                body = n.get("body") or n.get("snippet") or ""
-                                url = n.get("link") or n.get("url") or ""
-                                lines.append(f"- {title}: {body} ({url})")
-                            chunks.append({
-                                "document_id": f"doc_{abs(hash('web_'+entity_name)) % (10**8):08d}",
-                                "text": f"Web search enrichment for {entity_name}:\n" + "\n".join(lines),
-                                "source_doc": f"web_search_{entity_name}.md",
-                                "source_path": f"ddg:latest {entity_name} earnings 2023",
-                                "chunk_index": 0,
-                                "page_number": None,
-                            })
-                except Exception:
-                    pass
-                final_chunks = []
-                for ch in chunks:
-                    doc_id = ch["document_id"]
-                    for seg in chunk_text(ch["text"], doc_id=doc_id):
-                        seg["source_doc"] = ch["source_doc"]
-                        seg["source_path"] = ch["source_path"]
-                        final_chunks.append(seg)
-                total_chunks += index_chunks(final_chunks)
-                processed_files.append(path)
-
-        return InitResponse(success=True, data={
-            "processed_files": processed_files,
-            "chunks_indexed": total_chunks
-        })
+        if not valid_name(req.collection):
+            raise HTTPException(status_code=400, detail="Invalid collection name")
+        job = queue.submit("init", run_init, req.data_dir, req.force, req.collection)
+        if req.wait:
+            return InitResponse(success=True, data=await asyncio.wrap_future(job.future))
+        return InitResponse(success=True, data={"job_id": job.id, "status": job.status})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-
@@ -1,11 +1,22 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
 from .ingest import router as ingest_router
 from .query import router as query_router
 from .documents import router as documents_router
-from .chunks import router as chunks_router
+from .chunks import router as chunks_router, batch_router as chunks_batch_router
 from .init import router as init_router
+from .collections import router as collections_router
+from . import warmup
 
-app = FastAPI(title="LangGraph Hybrid RAG (Local-First)")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Indexes load in the background; /ready reports when they are open
+    warmup.start()
+    yield
+
+
+app = FastAPI(title="LangGraph Hybrid RAG (Local-First)", lifespan=lifespan)
 
 
 @app.get("/health")
@@ -13,8 +24,19 @@ async def health():
     return {"success": True}
 
 
+@app.get("/ready")
+async def ready():
+    """503 until the indexes are loaded, unlike /health, which only says the process is up."""
+    state = warmup.check()
+    if state["status"] != "ready":
+        raise HTTPException(status_code=503, detail=state["error"] or f"indexes {state['status']}")
+    return {"success": True, "data": state}
+
+
 app.include_router(ingest_router)
 app.include_router(query_router)
 app.include_router(documents_router)
 app.include_router(chunks_router)
+app.include_router(chunks_batch_router)
 app.include_router(init_router)
+app.include_router(collections_router)
@@ -0,0 +1,49 @@
+from typing import Dict
+import threading
+import time
+from ..telemetry import log_step
+from ..retrieval import snapshot
+
+# What /ready reports: "idle" until start(), then "loading", "ready" or "failed"
+_state: Dict = {"status": "idle", "seconds": None, "epoch": None, "error": None}
+_lock = threading.Lock()
+
+
+def start():
+    """Load the indexes in a background thread, so the server accepts connections
+    and answers /health meanwhile. Requests that need an index before then wait for
+    it. Does nothing while loading or once ready; after a failure it tries again."""
+    with _lock:
+        if _state["status"] in ("loading", "ready"):
+            return
+        _state.update(status="loading", error=None)
+    threading.Thread(target=run, name="index-warmup", daemon=True).start()
+
+
+def run():
+    started = time.perf_counter()
+    with log_step("index_warmup") as fields:
+        try:
+            # Opens the chunk store and both indexes and starts the reload watcher
+            snap = snapshot.current()
+            update = {"status": "ready", "epoch": snap.epoch}
+        except Exception as e:
+            update = {"status": "failed", "error": str(e)}
+        update["seconds"] = round(time.perf_counter() - started, 3)
+        fields.update(update)
+    with _lock:
+        _state.update(update)
+
+
+def state() -> Dict:
+    with _lock:
+        return dict(_state)
+
+
+def check() -> Dict:
+    """The state, for requests that answer 503 unless it is "ready". A load that failed
+    or was never started (no lifespan) is started again."""
+    current = state()
+    if current["status"] in ("idle", "failed"):
+        start()
+    return current
@@ -8,25 +8,87 @@ load_dotenv()
 @dataclass
 class Config:
     # Models
+    # An OpenAI embedding model, or "local" for hashed n-gram embeddings computed on the
+    # CPU (no API key or network) with LOCAL_EMBEDDING_DIM dimensions
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    LOCAL_EMBEDDING_DIM: int = int(os.getenv("LOCAL_EMBEDDING_DIM", 384))
     LLM_MODEL: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
 
     # Chunking
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", 400))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", 50))
+    # Token counting for chunk sizes: "tiktoken" (the embedding model's encoding, whose BPE
+    # file tiktoken downloads on first use) or "words" (word and punctuation count, offline).
+    # Unset: words with EMBEDDING_MODEL=local, which must not need the network, else tiktoken
+    TOKENIZER: str = os.getenv("TOKENIZER", "")
+
+    # PDF extraction: worker processes (0 = one per core) and pages per task
+    PDF_WORKERS: int = int(os.getenv("PDF_WORKERS", 0))
+    PDF_PAGES_PER_TASK: int = int(os.getenv("PDF_PAGES_PER_TASK", 16))
+    # Plain text and markdown: characters read per block, cut at a line (a blank one if possible)
+    TEXT_BLOCK_CHARS: int = int(os.getenv("TEXT_BLOCK_CHARS", 1 << 20))
+
+    # Background ingestion: concurrent jobs, chunks per embed/index batch, upload copy block
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", 2))
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", 64))
+    UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", 1 << 20))
+    # Near-duplicate chunks (word 3-gram Jaccard at least this, same numbers) are stored
+    # but not embedded or indexed again; 0 disables the check
+    DEDUP_THRESHOLD: float = float(os.getenv("DEDUP_THRESHOLD", 0.7))
+
+    # CSV profiling: rows per chunk in the single-pass profiler
+    CSV_CHUNK_ROWS: int = int(os.getenv("CSV_CHUNK_ROWS", 50000))
 
     # Retrieval
     VECTOR_TOP_K: int = int(os.getenv("VECTOR_TOP_K", 5))
     KEYWORD_TOP_K: int = int(os.getenv("KEYWORD_TOP_K", 5))
-    MERGED_TOP_K: int = int(os.getenv("MERGED_TOP_K", 5))
+    # Chunks a query packs into the prompt unless it sets max_chunks
+    MERGED_TOP_K: int = int(os.getenv("MERGED_TOP_K", 8))
+    # Fusion of the two ranked lists: rrf, minmax, zscore or weighted (raw scores).
+    # Each retriever returns FUSION_CANDIDATE_FACTOR x k candidates, at least its *_TOP_K
+    FUSION: str = os.getenv("FUSION", "rrf")
+    RRF_K: int = int(os.getenv("RRF_K", 60))
+    FUSION_VECTOR_WEIGHT: float = float(os.getenv("FUSION_VECTOR_WEIGHT", 0.5))
+    FUSION_KEYWORD_WEIGHT: float = float(os.getenv("FUSION_KEYWORD_WEIGHT", 0.5))
+    FUSION_CANDIDATE_FACTOR: float = float(os.getenv("FUSION_CANDIDATE_FACTOR", 2))
+    # Restrict /query retrieval to the companies a question names (plus chunks naming none)
+    ENTITY_ROUTING: bool = os.getenv("ENTITY_ROUTING", "true").lower() in ("1", "true", "yes")
 
     VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "faiss")  # or qdrant
-    KEYWORD_BACKEND: str = os.getenv("KEYWORD_BACKEND", "bm25")  # or elasticsearch
+    # FAISS vector storage: flat (float32), fp16, sq8 (8-bit scalar) or pq. Compressed
+    # codecs keep a float32 copy on disk and re-rank VECTOR_RERANK_FACTOR x top_k candidates
+    VECTOR_CODEC: str = os.getenv("VECTOR_CODEC", "flat")
+    VECTOR_PQ_M: int = int(os.getenv("VECTOR_PQ_M", 96))  # pq: bytes per vector (rounded down to a divisor of the dimension)
+    VECTOR_RERANK_FACTOR: int = int(os.getenv("VECTOR_RERANK_FACTOR", 4))
+    KEYWORD_BACKEND: str = os.getenv("KEYWORD_BACKEND", "bm25")  # or fts5 (SQLite, on disk)
 
     FAISS_INDEX_PATH: str = os.getenv("FAISS_INDEX_PATH", "data/generated_indices/vector.faiss")
     BM25_INDEX_DIR: str = os.getenv("BM25_INDEX_DIR", "data/generated_indices/bm25")
+    FTS_INDEX_PATH: str = os.getenv("FTS_INDEX_PATH", "data/generated_indices/keyword.fts.sqlite3")
+    CHUNK_STORE_PATH: str = os.getenv("CHUNK_STORE_PATH", "data/generated_indices/chunks.sqlite3")
+    MANIFEST_PATH: str = os.getenv("MANIFEST_PATH", "data/generated_indices/manifest.json")
+    # Named collections: one directory each, with its own chunk store and indexes. Open
+    # ones are closed least recently used first beyond the estimated memory budget (MB,
+    # 0 = none) or count; the default collection uses the paths above and stays open
+    COLLECTIONS_DIR: str = os.getenv("COLLECTIONS_DIR", "data/collections")
+    COLLECTION_MEMORY_MB: int = int(os.getenv("COLLECTION_MEMORY_MB", 2048))
+    MAX_OPEN_COLLECTIONS: int = int(os.getenv("MAX_OPEN_COLLECTIONS", 32))
+    # Bumped by every index write; each worker process polls it (every INDEX_RELOAD_INTERVAL
+    # seconds, 0 = never) and swaps to the new generation
+    INDEX_GENERATION_PATH: str = os.getenv("INDEX_GENERATION_PATH", "data/generated_indices/generation")
+    INDEX_RELOAD_INTERVAL: float = float(os.getenv("INDEX_RELOAD_INTERVAL", 1.0))
+    # Fraction of tombstoned entries that triggers background index compaction
+    COMPACTION_DEAD_RATIO: float = float(os.getenv("COMPACTION_DEAD_RATIO", 0.2))
+    # Upper bound on chunk_ids per POST /chunks request
+    MAX_CHUNK_BATCH: int = int(os.getenv("MAX_CHUNK_BATCH", 1000))
 
+    # VECTOR_BACKEND=qdrant: a server URL, ":memory:" or a directory for embedded mode
     QDRANT_URL: str = os.getenv("QDRANT_URL", "http://localhost:6333")
+    QDRANT_API_KEY: str = os.getenv("QDRANT_API_KEY", "")
+    QDRANT_COLLECTION: str = os.getenv("QDRANT_COLLECTION", "chunks")
+    # Points per upsert request and concurrent upsert requests (server mode only)
+    QDRANT_BATCH_SIZE: int = int(os.getenv("QDRANT_BATCH_SIZE", 256))
+    QDRANT_UPSERT_WORKERS: int = int(os.getenv("QDRANT_UPSERT_WORKERS", 4))
     ELASTICSEARCH_URL: str = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
 
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
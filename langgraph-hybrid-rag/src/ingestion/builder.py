@@ -0,0 +1,258 @@
+"""Build a collection's indexes offline and publish them as a new snapshot.
+
+    python -m src.ingestion.builder DATA_DIR --collection NAME [--workers N]
+
+Source files (CSV and SEC JSON as in /init, PDF, DOCX, TXT and MD as in /ingest) are
+split into shards of similar total size. A process pool parses, chunks and embeds
+each shard into a partial result (``shard-NNN.jsonl`` chunks plus ``shard-NNN.f32``
+vectors); the parent merges them in shard order into a fresh chunk store and vector
+and keyword indexes in ``<COLLECTIONS_DIR>/<name>/versions/<version>/``, checks the
+counts and only then points ``CURRENT`` at it. Servers switch on their next use of
+the collection; a failed build leaves the served snapshot untouched. Writes made to
+the collection through the API while it builds are not carried over. The default
+collection, at the configured paths, is built by /init and /ingest as before.
+"""
+from typing import Dict, Iterator, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+from ..config import config
+from ..telemetry import log_step, peak_rss_mb
+from .chunker import iter_document_chunks, segment_chunks
+from .jobs import batched
+from .loader import iter_pages
+from .manifest import Manifest, document_id_for, file_digest
+from ..retrieval import dedup
+from ..retrieval.backends import embeddings as embedding_providers
+from ..retrieval.collection import DEFAULT, Collection, current_version, set_current_version, valid_name, version_dir
+
+SOURCES = (".csv", ".json", ".pdf", ".docx", ".txt", ".md")
+# Chunks per add when merging: large batches make few, large segments
+_MERGE_BATCH = 8192
+
+
+def source_files(data_dir: str) -> List[str]:
+    return sorted(os.path.join(root, fn) for root, _, files in os.walk(data_dir)
+                  for fn in files if os.path.splitext(fn)[1].lower() in SOURCES)
+
+
+def partition(paths: List[str], n: int) -> List[List[str]]:
+    """Split ``paths`` into at most ``n`` shards of similar total size, largest files first."""
+    shards: List[List[str]] = [[] for _ in range(max(1, n))]
+    sizes = [0] * len(shards)
+    for path in sorted(paths, key=lambda p: (-os.path.getsize(p), p)):
+        i = sizes.index(min(sizes))
+        shards[i].append(path)
+        sizes[i] += os.path.getsize(path)
+    return [sorted(s) for s in shards if s]
+
+
+def _file_chunks(path: str, digest: str, root: str) -> Iterator[Dict]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".json"):
+        # pandas-based parsers, as in /init (without its web enrichment: builds are offline)
+        from .corpus_builder import build_from_csv, build_from_companyfacts
+        from .json_parser import stream_companyfacts
+        if ext == ".csv":
+            yield from segment_chunks(build_from_csv(path, digest=digest, root=root))
+        else:
+            data, facts = stream_companyfacts(path)
+            yield from segment_chunks(build_from_companyfacts(path, data, digest=digest, df=facts, root=root))
+        return
+    for ch in iter_document_chunks(iter_pages(path), doc_id=document_id_for(path, digest, root)):
+        ch["source_doc"] = os.path.basename(path)
+        ch["source_path"] = path
+        yield ch
+
+
+def _embedder():
+    embeddings = embedding_providers.create()
+
+    def embed(texts: List[str]) -> np.ndarray:
+        # Normalized as the vector stores do, for cosine similarity by inner product
+        vecs = np.array(embeddings.embed_documents(texts), dtype="float32")
+        return vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+    return embed
+
+
+def _init_worker():
+    # The pool already uses every core; PDFs are not split across further processes
+    config.PDF_WORKERS = 1
+
+
+def build_shard(shard: int, paths: List[str], root: str, out_dir: str, batch_size: int) -> Dict:
+    """Parse, chunk and embed ``paths`` (under data directory ``root``) into
+    ``out_dir/shard-NNN.{jsonl,f32}``. Runs in a worker process."""
+    embed = _embedder()
+    base = os.path.join(out_dir, f"shard-{shard:03d}")
+    files, n_chunks, dim = [], 0, 0
+    with log_step("index_build_shard", shard=shard, files=len(paths)) as fields, \
+            open(base + ".jsonl", "w", encoding="utf-8") as chunks_out, open(base + ".f32", "wb") as vectors_out:
+        for path in paths:
+            digest = file_digest(path)
+            document_ids = set()
+            for batch in batched(_file_chunks(path, digest, root), batch_size):
+                vectors = embed([c["text"] for c in batch])
+                vectors.tofile(vectors_out)
+                for c in batch:
+                    chunks_out.write(json.dumps(c, ensure_ascii=False) + "\n")
+                    document_ids.add(c["document_id"])
+                n_chunks += len(batch)
+                dim = vectors.shape[1]
+            files.append({"path": path, "sha256": digest, "document_ids": sorted(document_ids)})
+        fields.update(chunks=n_chunks, peak_rss_mb=peak_rss_mb())
+    return {"shard": shard, "path": base, "files": files, "chunks": n_chunks, "dim": dim,
+            "peak_rss_mb": peak_rss_mb()}
+
+
+def _run_shards(shards: List[List[str]], root: str, out_dir: str, workers: int, batch_size: int) -> List[Dict]:
+    if workers <= 1:
+        return [build_shard(i, paths, root, out_dir, batch_size) for i, paths in enumerate(shards)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(build_shard, i, paths, root, out_dir, batch_size) for i, paths in enumerate(shards)]
+        results = [f.result() for f in as_completed(futures)]
+    return sorted(results, key=lambda r: r["shard"])
+
+
+def merge(collection: Collection, results: List[Dict]) -> int:
+    """Add every shard's chunks and vectors to ``collection`` as one write, in shard order."""
+    dims = {r["dim"] for r in results if r["chunks"]}
+    if len(dims) > 1:
+        raise RuntimeError(f"Shards were embedded with different dimensions: {sorted(dims)}")
+    added = 0
+    with collection.snapshots.writing():
+        for r in results:
+            if not r["chunks"]:
+                continue
+            vectors = np.memmap(r["path"] + ".f32", dtype="float32", mode="r").reshape(-1, r["dim"])
+            with open(r["path"] + ".jsonl", "r", encoding="utf-8") as f:
+                start = 0
+                for batch in batched((json.loads(line) for line in f), _MERGE_BATCH):
+                    texts = [c["text"] for c in batch]
+                    # Shards were embedded apart, so near-duplicates are only collapsed here:
+                    # that saves index size, not embedding calls
+                    found = dedup.find(texts, collection.chunks.minhash_candidates)
+                    keep = found.unique(len(batch))
+                    rows = collection.chunks.add(batch, found)
+                    if keep:
+                        collection.vector.add(rows[keep], np.ascontiguousarray(vectors[start:start + len(batch)][keep]),
+                                              publish=False)
+                        collection.keyword.add(rows[keep], [texts[i] for i in keep], publish=False)
+                    start += len(batch)
+            if start != len(vectors):
+                raise RuntimeError(f"Shard {r['shard']}: {start} chunks but {len(vectors)} vectors")
+            added += start
+    return added
+
+
+def validate(collection: Collection, results: List[Dict]):
+    """Every chunk the shards produced is in the chunk store and, unless a near-duplicate,
+    in both indexes, once."""
+    expected = sum(r["chunks"] for r in results) - collection.chunks.duplicate_count()
+    documents = {d for r in results for f in r["files"] for d in f["document_ids"]}
+    counts = {
+        "chunks": int(collection.chunks.live_rows().size),
+        "vector": collection.vector.view.live_count,
+        "keyword": collection.keyword.view.live_count,
+    }
+    wrong = {k: v for k, v in counts.items() if v != expected}
+    if wrong:
+        raise RuntimeError(f"Expected {expected} chunks, found {wrong}")
+    if collection.chunks.document_ids() != documents:
+        raise RuntimeError(f"Expected {len(documents)} documents, found {len(collection.chunks.document_ids())}")
+
+
+def _new_version(name: str) -> str:
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    n = 1
+    while os.path.exists(version_dir(name, version if n == 1 else f"{version}-{n}")):
+        n += 1
+    return version if n == 1 else f"{version}-{n}"
+
+
+def _version_key(version: str) -> Tuple[str, int]:
+    # "<UTC timestamp>[-n]": the timestamp is fixed-width, but "-10" must sort after "-2"
+    stamp, _, n = version.partition("-")
+    return stamp, int(n) if n.isdigit() else 1
+
+
+def prune(name: str, keep: int) -> List[str]:
+    """Delete all but the newest ``keep`` snapshots of ``name``, never the current one.
+    Processes still reading a deleted snapshot keep their open and mapped files."""
+    root = os.path.join(version_dir(name), "versions")
+    current = current_version(name)
+    old = [v for v in sorted(os.listdir(root), key=_version_key, reverse=True)[max(1, keep):] if v != current]
+    for version in old:
+        shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+    return old
+
+
+def build(data_dir: str, name: str, workers: int, batch_size: int, keep: int) -> Dict:
+    start = time.perf_counter()
+    paths = source_files(data_dir)
+    shards = partition(paths, workers)
+    version = _new_version(name)
+    directory = version_dir(name, version)
+    # Partial results go next to the snapshot, on the same disk
+    scratch = os.path.join(directory, "shards")
+    os.makedirs(scratch)
+    try:
+        with log_step("index_build_shards", files=len(paths), shards=len(shards), workers=workers) as fields:
+            results = _run_shards(shards, data_dir, scratch, min(workers, len(shards)), batch_size)
+            fields["chunks"] = sum(r["chunks"] for r in results)
+        with log_step("index_build_merge", collection=name, version=version) as fields:
+            collection = Collection.open(name, version)
+            try:
+                fields["chunks"] = merge(collection, results)
+                validate(collection, results)
+                manifest = Manifest(collection.manifest_path)
+                for f in (f for r in results for f in r["files"]):
+                    manifest.record(f["path"], f["sha256"], f["document_ids"])
+                manifest.save()
+            finally:
+                collection.close()
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    previous = current_version(name)
+    set_current_version(name, version)
+    return {
+        "collection": name,
+        "version": version,
+        "previous_version": previous,
+        "pruned": prune(name, keep),
+        "files": len(paths),
+        "shards": len(shards),
+        "chunks": sum(r["chunks"] for r in results),
+        "documents": len({d for r in results for f in r["files"] for d in f["document_ids"]}),
+        "seconds": round(time.perf_counter() - start, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "worker_peak_rss_mb": max((r["peak_rss_mb"] or 0 for r in results), default=None),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build a collection's indexes offline and publish them atomically")
+    parser.add_argument("data_dir")
+    parser.add_argument("--collection", required=True, help="named collection to build (not the default one)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parse/embed processes and shards")
+    parser.add_argument("--batch", type=int, default=config.INGEST_BATCH_SIZE, help="chunks per embedding request")
+    parser.add_argument("--keep", type=int, default=2, help="snapshots to keep, the new one included")
+    args = parser.parse_args()
+    if not os.path.isdir(args.data_dir):
+        parser.error(f"{args.data_dir} is not a directory")
+    if args.collection == DEFAULT or not valid_name(args.collection):
+        parser.error(f"invalid collection name {args.collection!r}")
+    with log_step("index_build", data_dir=args.data_dir) as fields:
+        fields.update(build(args.data_dir, args.collection, args.workers, args.batch, args.keep))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,28 +1,151 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, NamedTuple, Tuple
+import io
+import re
 from ..config import config
 
 
-def chunk_text(text: str, doc_id: str) -> List[Dict]:
-    words = text.split()
-    chunk_size_words = max(50, int(config.CHUNK_SIZE * 0.75))
-    overlap_words = int(config.CHUNK_OVERLAP * 0.75)
-
-    chunks: List[Dict] = []
-    start = 0
-    index = 0
-    while start < len(words):
-        end = min(len(words), start + chunk_size_words)
-        chunk_words = words[start:end]
-        chunk_text = " ".join(chunk_words)
-        chunks.append({
+_encoding = None
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+# Blank lines, markdown headings and "Title:" lines (e.g. "Sample (50 rows):") open a new section
+_SECTION_RE = re.compile(r"^\s*$|^#{1,6}\s|^[A-Z][^:\n]{0,80}:\s*$")
+
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if _encoding is None:
+        tokenizer = config.TOKENIZER or ("words" if config.EMBEDDING_MODEL == "local" else "tiktoken")
+        if tokenizer not in ("tiktoken", "words"):
+            raise ValueError(f"Unknown TOKENIZER {tokenizer!r}, expected tiktoken or words")
+        _encoding = False
+        if tokenizer == "tiktoken":
+            try:
+                import tiktoken
+                try:
+                    _encoding = tiktoken.encoding_for_model(config.EMBEDDING_MODEL)
+                except KeyError:
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                # No tiktoken or its BPE file is unavailable: word/punctuation count is a close upper bound
+                _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(_WORD_RE.findall(text))
+
+
+class _Unit(NamedTuple):
+    text: str
+    start: int
+    line: int
+    tokens: int
+    section: bool
+
+
+def _units(lines: Iterable[str], char_offset: int, first_line: int, max_tokens: int) -> Iterator[_Unit]:
+    """One unit per source line; lines longer than a chunk are split at whitespace."""
+    pos = char_offset
+    for line_no, line in enumerate(lines, start=first_line):
+        tokens = count_tokens(line)
+        section = bool(_SECTION_RE.match(line))
+        if tokens <= max_tokens:
+            yield _Unit(line, pos, line_no, tokens, section)
+        else:
+            piece_start, piece_tokens = 0, 0
+            for m in re.finditer(r"\S+\s*", line):
+                t = count_tokens(m.group())
+                if piece_tokens and piece_tokens + t > max_tokens:
+                    yield _Unit(line[piece_start:m.start()], pos + piece_start, line_no, piece_tokens, section)
+                    section = False
+                    piece_start, piece_tokens = m.start(), 0
+                piece_tokens += t
+            yield _Unit(line[piece_start:], pos + piece_start, line_no, piece_tokens, section)
+        pos += len(line)
+
+
+def iter_chunks(source: str | Iterable[str], doc_id: str, page_number: int | None = None,
+                first_index: int = 0, char_offset: int = 0, first_line: int = 1) -> Iterator[Dict]:
+    """Yield ~CHUNK_SIZE-token chunks that end on line boundaries, preferring section breaks.
+
+    ``source`` is a string or any iterable of lines (e.g. an open file), consumed lazily.
+    Each chunk carries ``char_start``/``char_end`` offsets and ``line_start``/``line_end``
+    (1-based, inclusive) into the source; consecutive chunks share up to CHUNK_OVERLAP
+    tokens of whole lines unless split at a section boundary.
+    """
+    max_tokens = config.CHUNK_SIZE
+    overlap_tokens = config.CHUNK_OVERLAP
+    lines = io.StringIO(source) if isinstance(source, str) else source
+    buf: List[_Unit] = []
+    buf_tokens = 0
+    fresh = 0  # non-blank units not already emitted as overlap
+    index = first_index
+
+    def emit() -> Dict:
+        text = "".join(u.text for u in buf).rstrip()
+        last = next(u for u in reversed(buf) if u.text.strip())
+        return {
             "document_id": doc_id,
             "chunk_id": f"{doc_id}_chunk_{index}",
-            "text": chunk_text,
+            "text": text,
             "chunk_index": index,
-            "page_number": None,
-        })
-        if end == len(words):
-            break
-        start = end - overlap_words
-        index += 1
-    return chunks
+            "page_number": page_number,
+            "char_start": buf[0].start,
+            "char_end": buf[0].start + len(text),
+            "line_start": buf[0].line,
+            "line_end": last.line,
+        }
+
+    for unit in _units(lines, char_offset, first_line, max_tokens):
+        if not buf and not unit.text.strip():
+            continue
+        if fresh and (buf_tokens + unit.tokens > max_tokens or (unit.section and buf_tokens >= max_tokens // 2)):
+            yield emit()
+            index += 1
+            tail: List[_Unit] = []
+            if not unit.section:
+                kept = 0
+                for u in reversed(buf):
+                    if kept + u.tokens > overlap_tokens or kept + u.tokens + unit.tokens > max_tokens:
+                        break
+                    tail.insert(0, u)
+                    kept += u.tokens
+                while tail and not tail[0].text.strip():
+                    tail.pop(0)
+            buf, buf_tokens, fresh = tail, sum(u.tokens for u in tail), 0
+            if not buf and not unit.text.strip():
+                continue
+        buf.append(unit)
+        buf_tokens += unit.tokens
+        if unit.text.strip():
+            fresh += 1
+    if fresh:
+        yield emit()
+
+
+def iter_document_chunks(pages: Iterable[Tuple[int | None, str]], doc_id: str) -> Iterator[Dict]:
+    """Chunk (page_number, text) records as they arrive. Chunks never span pages, so each
+    keeps its page number; offsets and line numbers refer to the pages joined by newlines."""
+    index, offset, line = 0, 0, 1
+    for page_number, text in pages:
+        for ch in iter_chunks(text, doc_id, page_number=page_number, first_index=index,
+                              char_offset=offset, first_line=line):
+            index = ch["chunk_index"] + 1
+            yield ch
+        offset += len(text) + 1
+        line += text.count("\n") + 1
+
+
+def chunk_text(text: str, doc_id: str) -> List[Dict]:
+    return list(iter_chunks(text, doc_id))
+
+
+def segment_chunks(chunks: List[Dict]) -> List[Dict]:
+    """Chunk the generated documents of /init (CSV and JSON descriptions), keeping their source."""
+    final_chunks = []
+    for ch in chunks:
+        for seg in chunk_text(ch["text"], doc_id=ch["document_id"]):
+            seg["source_doc"] = ch["source_doc"]
+            seg["source_path"] = ch["source_path"]
+            # Company the whole document is about, for entity tags on every segment
+            if ch.get("entity"):
+                seg["entity"] = ch["entity"]
+            final_chunks.append(seg)
+    return final_chunks
@@ -1,27 +1,26 @@
 import os
 from typing import List, Dict
 import pandas as pd
-from .tools.schema_tools import get_columns, get_dtypes, profile_missing, summarize_basic_stats
-from .tools.agg_tools import aggregate
-from .tools.time_tools import to_datetime, resample_period
+from ..config import config
+from .tools.stream_tools import profile_csv_stream
 from .json_parser import flatten_companyfacts
-from .finance.metrics import summarize_fy_block
+from .finance.metrics import summarize_fy_blocks
+from .manifest import document_id_for
 
 
-def build_from_csv(path: str) -> List[Dict]:
-    df = pd.read_csv(path)
-    rows, cols = df.shape
-    columns = get_columns(df)
-    dtypes = get_dtypes(df)
-    missing = profile_missing(df)
-    stats = summarize_basic_stats(df)
-    head = df.head(10).to_csv(index=False)
+def build_from_csv(path: str, digest: str | None = None, root: str | None = None) -> List[Dict]:
+    # One chunked pass: memory is bounded by CSV_CHUNK_ROWS regardless of history length
+    profile = profile_csv_stream(path, chunk_rows=config.CSV_CHUNK_ROWS)
+    rows, cols = profile["rows"], profile["cols"]
+    columns = profile["columns"]
+    dtypes = profile["dtypes"]
+    missing = profile["missing"]
+    stats = profile["stats"]
+    head = profile["head"]
     # Time aggregations if Date present
     agg_txt = ""
-    if "Date" in df.columns:
-        dfa = to_datetime(df, "Date")
-        monthly = resample_period(dfa.rename(columns={"Close": "Close"}), "Date", "M", {"Close": "mean"})
-        agg_txt = monthly.head(12).to_csv(index=False)
+    if profile["monthly"] is not None:
+        agg_txt = profile["monthly"].head(12).to_csv(index=False)
     desc = (
         f"Source: {path}\n"
         f"Rows: {rows}, Cols: {cols}\n"
@@ -34,7 +33,7 @@ def build_from_csv(path: str) -> List[Dict]:
     )
     # Single chunk per CSV description; chunker will segment
     return [{
-        "document_id": f"doc_{abs(hash(path)) % (10**8):08d}",
+        "document_id": document_id_for(path, digest, root),
         "text": desc,
         "source_doc": os.path.basename(path),
         "source_path": path,
@@ -43,22 +42,23 @@ def build_from_csv(path: str) -> List[Dict]:
     }]
 
 
-def build_from_companyfacts(path: str, data: Dict) -> List[Dict]:
-    df = flatten_companyfacts(data)
+def build_from_companyfacts(path: str, data: Dict, digest: str | None = None, df: pd.DataFrame | None = None,
+                            root: str | None = None) -> List[Dict]:
+    # `df` lets streamed callers pass facts parsed by stream_companyfacts alongside its header dict
+    if df is None:
+        df = flatten_companyfacts(data)
     if df.empty:
         return []
     entity = data.get("entityName", "Unknown Entity")
     cols = ", ".join([str(c) for c in df.columns])
     # 2018-2025 sweeps for key metrics to enlarge corpus
-    lines: List[str] = []
-    for fy in range(2018, 2026):
-        lines.extend(summarize_fy_block(entity, fy, df, [
-            "EarningsPerShareDiluted",
-            "EarningsPerShareBasic",
-            "NetIncomeLoss",
-            "Revenues",
-            "SalesRevenueNet",
-        ]))
+    lines = summarize_fy_blocks(entity, list(range(2018, 2026)), df, [
+        "EarningsPerShareDiluted",
+        "EarningsPerShareBasic",
+        "NetIncomeLoss",
+        "Revenues",
+        "SalesRevenueNet",
+    ])
     head = df.head(50).to_csv(index=False)
     desc = (
         f"Source: {path}\n"
@@ -68,14 +68,11 @@ def build_from_companyfacts(path: str, data: Dict) -> List[Dict]:
         f"Sample (50 rows):\n{head}\n"
     )
     return [{
-        "document_id": f"doc_{abs(hash(path)) % (10**8):08d}",
+        "document_id": document_id_for(path, digest, root),
         "text": desc,
         "source_doc": os.path.basename(path),
         "source_path": path,
         "chunk_index": 0,
         "page_number": None,
+        "entity": entity,
     }]
-
-
-
-
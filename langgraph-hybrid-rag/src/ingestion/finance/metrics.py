@@ -31,20 +31,48 @@ def extract_quarterly(df: pd.DataFrame, metric: str, fy: int) -> Dict[str, Tuple
     return out
 
 
-def summarize_fy_block(entity: str, fy: int, df: pd.DataFrame, metrics: List[str]) -> List[str]:
-    lines: List[str] = []
-    for m in metrics:
-        fy_val = extract_fy(df, m, fy)
-        if fy_val is not None:
-            val, unit = fy_val
-            lines.append(f"{entity} {fy} {m}: {val} {unit}")
-        else:
-            quarters = extract_quarterly(df, m, fy)
-            if quarters:
-                qtxt = ", ".join([f"{q}={v} {u}" for q, (v, u) in quarters.items()])
-                lines.append(f"{entity} {fy} {m}: {qtxt}")
-    return lines
+FY_PERIODS = {"FY": "FY", "CY": "FY", "Q1": "Q1", "Q2": "Q2", "Q3": "Q3", "Q4": "Q4"}
 
 
+def first_period_values(df: pd.DataFrame, metrics: List[str], years: List[int]) -> Dict[Tuple[str, int, str], Tuple[float, str]]:
+    """First reported (val, unit) per (metric, fy, period) in one grouped pass.
 
+    FY and CY rows share the "FY" period. "First" follows frame order, matching
+    ``extract_fy``/``extract_quarterly``.
+    """
+    fy = pd.to_numeric(df["fy"], errors="coerce")
+    period = df["fp"].astype(object).map(FY_PERIODS)
+    mask = df["metric"].isin(metrics) & fy.isin(years) & period.notna()
+    sub = pd.DataFrame({
+        "metric": df["metric"][mask].astype(object),
+        "fy": fy[mask].astype("int64"),
+        "period": period[mask],
+        "val": df["val"][mask],
+        "unit": df["unit"][mask].astype(object),
+    })
+    first = sub.drop_duplicates(["metric", "fy", "period"], keep="first")
+    return {
+        (m, y, p): (float(v), str(u))
+        for m, y, p, v, u in zip(first["metric"], first["fy"], first["period"], first["val"], first["unit"])
+    }
 
+
+def summarize_fy_blocks(entity: str, years: List[int], df: pd.DataFrame, metrics: List[str]) -> List[str]:
+    values = first_period_values(df, metrics, years)
+    lines: List[str] = []
+    for fy in years:
+        for m in metrics:
+            fy_val = values.get((m, fy, "FY"))
+            if fy_val is not None:
+                val, unit = fy_val
+                lines.append(f"{entity} {fy} {m}: {val} {unit}")
+            else:
+                quarters = {q: values[(m, fy, q)] for q in ("Q1", "Q2", "Q3", "Q4") if (m, fy, q) in values}
+                if quarters:
+                    qtxt = ", ".join([f"{q}={v} {u}" for q, (v, u) in quarters.items()])
+                    lines.append(f"{entity} {fy} {m}: {qtxt}")
+    return lines
+
+
+def summarize_fy_block(entity: str, fy: int, df: pd.DataFrame, metrics: List[str]) -> List[str]:
+    return summarize_fy_blocks(entity, [fy], df, metrics)
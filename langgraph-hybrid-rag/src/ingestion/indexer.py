@@ -1,35 +1,77 @@
-from typing import List, Dict
-from ..retrieval.backends.faiss_store import store as faiss_store
-from ..retrieval.backends.bm25_store import store as bm25_store
+from typing import List, Dict, Set, Callable
+import numpy as np
+from ..retrieval import dedup
+from ..retrieval.collection import Collection, registry
 from ..config import config
-import os
-import json
 
 
-def index_chunks(chunks: List[Dict]) -> int:
+def indexed_document_ids(collection: Collection | None = None) -> Set[str]:
+    return (collection or registry.default).chunks.document_ids()
+
+
+def is_indexed(document_id: str, collection: Collection | None = None) -> bool:
+    return (collection or registry.default).chunks.document(document_id) is not None
+
+
+def documents_for_source(source_doc: str, collection: Collection | None = None) -> List[str]:
+    return (collection or registry.default).chunks.documents_for_source(source_doc)
+
+
+def index_chunks(chunks: List[Dict], on_progress: Callable[[str, int], None] | None = None,
+                 collection: Collection | None = None) -> int:
     if not chunks:
         return 0
-    # Add to both stores
-    faiss_store.add(chunks)
-    bm25_store.add(chunks)
-    # Update documents metadata
-    meta_dir_legacy = os.path.join("data", "indices")
-    meta_dir = os.path.join("data", "generated_indices")
-    os.makedirs(meta_dir, exist_ok=True)
-    path = os.path.join(meta_dir, "documents.json")
-    legacy_path = os.path.join(meta_dir_legacy, "documents.json")
-    doc_counts = {}
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            for d in data.get("documents", []):
-                doc_counts[d.get("id")] = d.get("chunks", 0)
-    # Count new chunks
-    for ch in chunks:
-        doc_id = ch.get("document_id")
-        if doc_id:
-            doc_counts[doc_id] = doc_counts.get(doc_id, 0) + 1
-    documents = [{"id": k, "filename": ch.get("source_doc", "unknown"), "chunks": v} for k, v in doc_counts.items()]
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump({"documents": documents}, f, ensure_ascii=False, indent=2)
+    collection = collection or registry.default
+    texts = [c["text"] for c in chunks]
+    # Near-duplicates of indexed chunks, or of earlier ones of the batch, are stored but
+    # neither embedded nor indexed: queries reach them through their representative
+    found = dedup.find(texts, collection.chunks.minhash_candidates)
+    keep = found.unique(len(chunks))
+    vectors = collection.vector.embed([texts[i] for i in keep]) if keep else None
+    if on_progress:
+        on_progress("chunks_embedded", len(keep))
+        if found:
+            on_progress("chunks_duplicate", len(found))
+    # Add to both stores; queries see the batch in both or in neither.
+    # The chunk store updates the document catalog with the rows.
+    with collection.snapshots.writing():
+        # Representatives removed since the check: their duplicates are indexed after all
+        gone = collection.chunks.removed(found.of_rows.values())
+        late = sorted(i for i, row in found.of_rows.items() if row in gone)
+        if late:
+            for i in late:
+                del found.of_rows[i]
+            extra = collection.vector.embed([texts[i] for i in late])
+            order = np.argsort(keep + late, kind="stable")
+            keep = [(keep + late)[i] for i in order]
+            vectors = (extra if vectors is None else np.concatenate([vectors, extra]))[order]
+        rows = collection.chunks.add(chunks, found)
+        if keep:
+            collection.vector.add(rows[keep], vectors, publish=False)
+            collection.keyword.add(rows[keep], [texts[i] for i in keep], publish=False)
+    if on_progress:
+        on_progress("chunks_indexed", len(chunks))
     return len(chunks)
+
+
+def remove_documents(document_ids: List[str], collection: Collection | None = None) -> int:
+    if not document_ids:
+        return 0
+    collection = collection or registry.default
+    with collection.snapshots.writing() as epoch:
+        rows = collection.chunks.rows_for_documents(document_ids)
+        # Near-duplicates in other documents take over what leaves the indexes here
+        promoted = collection.chunks.promote_duplicates(rows)
+        indexed = collection.chunks.indexed(rows)
+        collection.vector.remove_rows(indexed, publish=False)
+        collection.keyword.remove_rows(indexed, publish=False)
+        if promoted:
+            new_rows = np.array(sorted(promoted), dtype="int64")
+            texts = [promoted[r] for r in new_rows.tolist()]
+            collection.vector.add(new_rows, collection.vector.embed(texts), publish=False)
+            collection.keyword.add(new_rows, texts, publish=False)
+        # Last: the keyword store reads the text of the rows it removes
+        collection.chunks.mark_deleted(rows, epoch, document_ids)
+    # Text of chunks no snapshot in use can return
+    collection.chunks.purge(collection.snapshots.oldest_epoch())
+    return len(rows)
@@ -0,0 +1,94 @@
+from typing import Dict, Callable, Any, Iterable, Iterator, List
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from collections import OrderedDict
+import threading
+import time
+import uuid
+from ..config import config
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str = "queued"  # queued | running | done | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    progress: Dict[str, int] = field(default_factory=dict)
+    result: Dict | None = None
+    error: str | None = None
+    future: Future | None = None
+
+    def advance(self, key: str, n: int = 1):
+        # Workers are the only writers of their job's counters; readers just snapshot
+        self.progress[key] = self.progress.get(key, 0) + n
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Runs ingestion jobs on a bounded worker pool off the event loop and keeps
+    the most recent ``history`` jobs for status polling."""
+
+    def __init__(self, workers: int | None = None, history: int = 1000):
+        self._pool = ThreadPoolExecutor(max_workers=workers or config.INGEST_WORKERS, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._history = history
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., Dict], *args: Any) -> Job:
+        job = Job(id=f"job_{uuid.uuid4().hex[:12]}", kind=kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._history:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.status in ("queued", "running"):
+                    break
+                self._jobs.popitem(last=False)
+        job.future = self._pool.submit(self._run, job, fn, *args)
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Dict], *args: Any) -> Dict:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args)
+            job.status = "done"
+            return job.result
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            raise
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+def batched(items: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+queue = JobQueue()
@@ -1,36 +1,200 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple, Iterator
+from array import array
 import json
+import math
+import numpy as np
 import pandas as pd
 
 
+FACT_COLUMNS = ["metric", "unit", "end", "val", "fy", "fp", "form"]
+
+
 def load_json(path: str) -> Dict[str, Any]:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
+def facts_frame(metric: List[str], metric_runs: List[int], unit: List[str], end: List, val: List,
+                fy: List, fp: List, form: List) -> pd.DataFrame:
+    """Assemble typed fact columns. ``metric``/``unit`` hold one label per run of
+    ``metric_runs`` consecutive entries; the other columns hold one value per entry."""
+    if not val:
+        return pd.DataFrame()
+    runs = np.asarray(metric_runs, dtype=np.int64)
+    codes = np.repeat(np.arange(len(runs)), runs)
+    fy_arr = np.asarray(fy, dtype="float64")
+    # Same dtype inference as the row-dict constructor: int64 unless a fiscal year is missing
+    if not np.isnan(fy_arr).any():
+        fy_arr = fy_arr.astype("int64")
+    return pd.DataFrame({
+        "metric": pd.Categorical(np.asarray(metric, dtype=object)[codes]),
+        "unit": pd.Categorical(np.asarray(unit, dtype=object)[codes]),
+        "end": np.asarray(end, dtype=object),
+        "val": np.asarray(val, dtype="float64"),
+        "fy": fy_arr,
+        "fp": pd.Categorical(fp),
+        "form": pd.Categorical(form),
+    }, columns=FACT_COLUMNS)
+
+
 def flatten_companyfacts(data: Dict[str, Any]) -> pd.DataFrame:
     # SEC CompanyFacts dei units pattern: data["facts"][taxonomy][metric]["units"][unit] -> list of dicts
-    rows = []
+    # Columns are filled per field with one comprehension per (metric, unit) block rather than one dict per fact.
+    metric: List[str] = []
+    unit: List[str] = []
+    runs: List[int] = []
+    end: List = []
+    val: List = []
+    fy: List = []
+    fp: List = []
+    form: List = []
     facts = data.get("facts", {})
     for taxonomy, metrics in facts.items():
-        for metric, mdata in metrics.items():
+        for metric_name, mdata in metrics.items():
             units = mdata.get("units", {})
             for unit_name, entries in units.items():
-                for e in entries:
-                    rows.append({
-                        "metric": metric,
-                        "unit": unit_name,
-                        "end": e.get("end"),
-                        "val": e.get("val"),
-                        "fy": e.get("fy"),
-                        "fp": e.get("fp"),
-                        "form": e.get("form"),
-                    })
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    return df
+                if not entries:
+                    continue
+                metric.append(metric_name)
+                unit.append(unit_name)
+                runs.append(len(entries))
+                end.extend([e.get("end") for e in entries])
+                val.extend([e.get("val") for e in entries])
+                fy.extend([e.get("fy") for e in entries])
+                fp.extend([e.get("fp") for e in entries])
+                form.extend([e.get("form") for e in entries])
+    return facts_frame(metric, runs, unit, end, val, fy, fp, form)
+
+
+class _JsonStream:
+    """Minimal pull parser: walks objects/arrays structurally and decodes only
+    leaf values with ``raw_decode``, so at most one block plus one value is buffered."""
 
+    _WS = " \t\n\r"
 
+    def __init__(self, f, block_size: int):
+        self.f = f
+        self.block_size = block_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
 
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        block = self.f.read(self.block_size)
+        if not block:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + block
+        self.pos = 0
+        return True
 
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self._WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str):
+        if self.peek() != ch:
+            raise ValueError(f"Expected {ch!r} at offset {self.pos} of buffered JSON")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number cut at the block boundary decodes "successfully"; make sure it is complete
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def items(self) -> Iterator[str]:
+        """Yield object keys; the caller must consume each value before advancing."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError(f"Malformed object near offset {self.pos}")
+
+    def elements(self) -> Iterator[None]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield None
+            ch = self.peek()
+            self.pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError(f"Malformed array near offset {self.pos}")
+
+
+def stream_companyfacts(path: str, block_size: int = 1 << 16) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    """Parse a companyfacts file incrementally (taxonomy -> metric -> unit -> entry)
+    into columnar buffers holding only FACT_COLUMNS.
+
+    Returns the top-level scalar fields (``cik``, ``entityName``) and the facts frame,
+    equal to ``flatten_companyfacts(load_json(path))`` without materializing the dict.
+    """
+    header: Dict[str, Any] = {}
+    metric: List[str] = []
+    unit: List[str] = []
+    runs: List[int] = []
+    end: List = []
+    val = array("d")
+    fy = array("d")
+    fp: List = []
+    form: List = []
+    # Dates and period codes repeat heavily; share one string object per distinct value
+    interned: Dict[str, str] = {}
+    nan = math.nan
+    with open(path, "r", encoding="utf-8") as f:
+        js = _JsonStream(f, block_size)
+        for key in js.items():
+            if key != "facts":
+                header[key] = js.value()
+                continue
+            for _taxonomy in js.items():
+                for metric_name in js.items():
+                    for mkey in js.items():
+                        if mkey != "units":
+                            js.value()
+                            continue
+                        for unit_name in js.items():
+                            n = 0
+                            for _ in js.elements():
+                                e = js.value()
+                                v, y = e.get("val"), e.get("fy")
+                                end.append(interned.setdefault(e.get("end"), e.get("end")))
+                                val.append(nan if v is None else v)
+                                fy.append(nan if y is None else y)
+                                fp.append(interned.setdefault(e.get("fp"), e.get("fp")))
+                                form.append(interned.setdefault(e.get("form"), e.get("form")))
+                                n += 1
+                            if n:
+                                metric.append(metric_name)
+                                unit.append(unit_name)
+                                runs.append(n)
+    return header, facts_frame(metric, runs, unit, end, val, fy, fp, form)
@@ -1,18 +1,84 @@
-from typing import List
+from typing import List, Iterator, Tuple
+import multiprocessing
 import os
-from pypdf import PdfReader
-from docx import Document
+from concurrent.futures import ProcessPoolExecutor
+from ..config import config
 
 
-def load_file_to_text(path: str) -> str:
+def _extract_pdf_range(args: Tuple[str, int, int]) -> List[Tuple[int, str]]:
+    # Runs in a worker process: each opens its own reader, so no parser state is shared
+    from pypdf import PdfReader
+    path, start, end = args
+    reader = PdfReader(path)
+    return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _iter_pdf_pages(path: str) -> Iterator[Tuple[int, str]]:
+    # Parsers are imported on first use of each format
+    from pypdf import PdfReader
+    n_pages = len(PdfReader(path).pages)
+    step = max(1, config.PDF_PAGES_PER_TASK)
+    ranges = [(path, s, min(n_pages, s + step)) for s in range(0, n_pages, step)]
+    workers = min(config.PDF_WORKERS or os.cpu_count() or 1, len(ranges))
+    if workers <= 1:
+        for r in ranges:
+            yield from _extract_pdf_range(r)
+        return
+    # Spawned, not forked: ingestion runs on a server thread while others hold locks
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # map() yields results in submission order, so pages stay ordered
+        for records in pool.map(_extract_pdf_range, ranges):
+            yield from records
+
+
+def _iter_docx_pages(path: str) -> Iterator[Tuple[int, str]]:
+    # DOCX has no fixed pages; follow explicit and last-rendered page breaks recorded by Word
+    from docx import Document
+    doc = Document(path)
+    page, lines = 1, []
+    for p in doc.paragraphs:
+        xml = p._p.xml
+        breaks = xml.count('w:type="page"') + xml.count("<w:lastRenderedPageBreak")
+        if breaks and lines:
+            yield page, "\n".join(lines)
+            page, lines = page + breaks, []
+        elif breaks:
+            page += breaks
+        lines.append(p.text)
+    if lines:
+        yield page, "\n".join(lines)
+
+
+def _iter_text_blocks(path: str) -> Iterator[Tuple[None, str]]:
+    # About TEXT_BLOCK_CHARS of whole lines per record, so a large file is never read whole.
+    # Chunks never span records, so blocks end before a blank line, where the chunker would
+    # open a new section anyway, unless none comes within twice the size. The newline
+    # at a cut is dropped: records joined by newlines are the file again.
+    limit = max(1, config.TEXT_BLOCK_CHARS)
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        lines, size = [], 0
+        for line in f:
+            if size >= limit and (not line.strip() or size >= 2 * limit):
+                yield None, "".join(lines)[:-1]
+                lines, size = [], 0
+            lines.append(line)
+            size += len(line)
+        if lines:
+            yield None, "".join(lines)
+
+
+def iter_pages(path: str) -> Iterator[Tuple[int | None, str]]:
+    """Yield (page_number, text) records in order; plain text comes as unnumbered blocks of lines."""
     ext = os.path.splitext(path)[1].lower()
     if ext == ".pdf":
-        reader = PdfReader(path)
-        return "\n".join([p.extract_text() or "" for p in reader.pages])
-    if ext in {".txt", ".md"}:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
-    if ext == ".docx":
-        doc = Document(path)
-        return "\n".join([p.text for p in doc.paragraphs])
-    raise ValueError(f"Unsupported file type: {ext}")
+        yield from _iter_pdf_pages(path)
+    elif ext in {".txt", ".md"}:
+        yield from _iter_text_blocks(path)
+    elif ext == ".docx":
+        yield from _iter_docx_pages(path)
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+
+
+def load_file_to_text(path: str) -> str:
+    return "\n".join(text for _, text in iter_pages(path))
@@ -0,0 +1,76 @@
+import os
+import json
+import hashlib
+from typing import Dict, List, Tuple
+from ..config import config
+
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def stable_id(*parts: str, prefix: str = "doc") -> str:
+    # Deterministic across processes, unlike hash() which is salted per interpreter
+    h = hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return f"{prefix}_{h[:16]}"
+
+
+def document_id_for(path: str, digest: str | None = None, root: str | None = None) -> str:
+    """Id of a source file from its content and its path relative to ``root`` (the
+    scanned data directory; just the file name without one), so identical files in
+    different directories stay distinct documents."""
+    key = os.path.relpath(path, root).replace(os.sep, "/") if root else os.path.basename(path)
+    return stable_id(key, digest or file_digest(path))
+
+
+class Manifest:
+    """Source files seen by /init: size, mtime and content hash per path, plus the
+    document ids each file produced so changed files can have their chunks replaced."""
+
+    def __init__(self, path: str | None = None):
+        self.path = path or config.MANIFEST_PATH
+        self.files: Dict[str, Dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+
+    def check(self, path: str) -> Tuple[str, bool]:
+        """Return (digest, changed). Files whose size and mtime match are trusted without rehashing."""
+        st = os.stat(path)
+        entry = self.files.get(self._key(path))
+        if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            return entry["sha256"], False
+        digest = file_digest(path)
+        if entry and entry.get("sha256") == digest:
+            # Touched but identical content: refresh stat so the next scan is hash-free
+            entry["size"], entry["mtime_ns"] = st.st_size, st.st_mtime_ns
+            return digest, False
+        return digest, True
+
+    def document_ids(self, path: str) -> List[str]:
+        entry = self.files.get(self._key(path)) or {}
+        return list(entry.get("document_ids", []))
+
+    def record(self, path: str, digest: str, document_ids: List[str]):
+        st = os.stat(path)
+        self.files[self._key(path)] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": digest,
+            "document_ids": sorted(set(document_ids)),
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
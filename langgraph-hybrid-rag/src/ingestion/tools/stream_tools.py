@@ -0,0 +1,200 @@
+from typing import Dict, List, Any
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """Bounded-memory quantile sketch (KLL-style compactor levels).
+
+    Level ``i`` holds items of weight ``2**i``; when a level outgrows ``capacity``
+    it is sorted and every other item is promoted. Exact until the first compaction.
+    """
+
+    def __init__(self, capacity: int = 4096, seed: int = 0):
+        self.capacity = capacity
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray):
+        self.levels[0] = np.concatenate([self.levels[0], np.asarray(values, dtype="float64")])
+        level = 0
+        while self.levels[level].size > self.capacity:
+            items = np.sort(self.levels[level])
+            if items.size % 2:
+                # Keep the odd one out at this level so no weight is lost
+                self.levels[level], items = items[-1:], items[:-1]
+            else:
+                self.levels[level] = np.empty(0)
+            promoted = items[self._rng.integers(2)::2]
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q: float) -> float:
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q)) if self.levels[0].size else float("nan")
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(lv.size, 2.0 ** i) for i, lv in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        cum = np.cumsum(weights[order])
+        return float(values[order][np.searchsorted(cum, q * cum[-1])])
+
+
+class ColumnStats:
+    """Single-pass count/missing/min/max/mean/std (Chan's parallel Welford merge) plus median sketch."""
+
+    def __init__(self):
+        self.count = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min: Any = None
+        self.max: Any = None
+        self.sketch = QuantileSketch()
+        self.float32 = False
+
+    def update(self, s: pd.Series):
+        values = s.to_numpy()
+        mask = pd.isna(values)
+        self.missing += int(mask.sum())
+        values = values[~mask]
+        if not values.size:
+            return
+        n = values.size
+        self.float32 = self.float32 or values.dtype == np.float32
+        v64 = values.astype("float64")
+        mean = float(v64.mean())
+        m2 = float(((v64 - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        lo, hi = values.min(), values.max()
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+        self.sketch.update(v64)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": float(self.count),
+            "min": self._as_float(self.min),
+            "max": self._as_float(self.max),
+            "mean": float(self.mean),
+            "std": float(np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0),
+            "median": self._as_float(self.sketch.quantile(0.5)),
+        }
+
+    def _as_float(self, v) -> float:
+        # min/max/median are observed values; for float32-parsed columns the shortest
+        # float32 repr recovers the CSV text instead of widening noise
+        if self.float32:
+            return float(str(np.float32(v)))
+        return float(v)
+
+
+class MonthlyMean:
+    """Incremental month-end mean of one value column, equivalent to resample("ME").mean()."""
+
+    def __init__(self):
+        self.sums: Dict[pd.Period, float] = {}
+        self.counts: Dict[pd.Period, int] = {}
+
+    def update(self, dates: pd.Series, values: pd.Series):
+        periods = dates.dt.to_period("M")
+        grouped = values.astype("float64").groupby(periods).agg(["sum", "count"])
+        for period, total, n in zip(grouped.index, grouped["sum"].tolist(), grouped["count"].tolist()):
+            self.sums[period] = self.sums.get(period, 0.0) + total
+            self.counts[period] = self.counts.get(period, 0) + n
+
+    def frame(self, date_col: str, value_col: str) -> pd.DataFrame:
+        if not self.sums:
+            return pd.DataFrame(columns=[date_col, value_col])
+        periods = pd.period_range(min(self.sums), max(self.sums), freq="M")
+        sums = np.array([self.sums.get(p, 0.0) for p in periods])
+        counts = np.array([self.counts.get(p, 0) for p in periods])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        return pd.DataFrame({date_col: periods.end_time.normalize(), value_col: means})
+
+
+def profile_csv_stream(path: str, chunk_rows: int = 50_000, usecols: List[str] | None = None,
+                       date_col: str = "Date", value_col: str = "Close", downcast: bool = True,
+                       head_rows: int = 10) -> Dict[str, Any]:
+    """Profile a CSV in one chunked pass with memory bounded by ``chunk_rows``.
+
+    Dtypes are inferred from the first chunk; later chunks parse float columns as
+    float32 (``downcast``) and integers are narrowed losslessly. Returns rows, cols,
+    columns, dtypes, missing, stats (numeric columns), head (CSV text) and monthly
+    (month-end mean of ``value_col`` when ``date_col`` is present).
+    """
+    reader = pd.read_csv(path, chunksize=chunk_rows, usecols=usecols)
+    first = next(reader, None)
+    if first is None:
+        first = pd.read_csv(path, usecols=usecols)
+    columns = [str(c) for c in first.columns]
+    dtypes = {str(c): str(t) for c, t in first.dtypes.items()}
+    head = first.head(head_rows).to_csv(index=False)
+    float_cols = [c for c in first.columns if pd.api.types.is_float_dtype(first[c])]
+
+    if downcast and float_cols and len(first) == chunk_rows:
+        # Re-open with float32 parsing for the remaining chunks
+        reader.close()
+        reader = pd.read_csv(path, chunksize=chunk_rows, usecols=usecols, skiprows=range(1, len(first) + 1),
+                             dtype={c: "float32" for c in float_cols})
+
+    stats = {c: ColumnStats() for c in columns}
+    numeric = {c: pd.api.types.is_numeric_dtype(first[c]) for c in columns}
+    monthly = MonthlyMean() if date_col in columns and value_col in columns else None
+    rows = 0
+
+    def consume(chunk: pd.DataFrame):
+        nonlocal rows
+        rows += len(chunk)
+        for c in chunk.columns:
+            s = chunk[c]
+            c = str(c)
+            if numeric[c] and not pd.api.types.is_numeric_dtype(s):
+                # A later chunk turned the column into text: no numeric stats, like a full read
+                numeric[c] = False
+                dtypes[c] = "object"
+            elif numeric[c] and pd.api.types.is_integer_dtype(s):
+                s = pd.to_numeric(s, downcast="integer") if downcast else s
+            elif numeric[c] and dtypes[c].startswith("int"):
+                # Missing values promote an int column to float64 on a full read
+                dtypes[c] = "float64"
+            if numeric[c]:
+                stats[c].update(s)
+            else:
+                stats[c].missing += int(s.isna().sum())
+        if monthly is not None:
+            dates = pd.to_datetime(chunk[date_col], errors="coerce")
+            values = pd.to_numeric(chunk[value_col], errors="coerce")
+            keep = dates.notna()
+            monthly.update(dates[keep], values[keep])
+
+    consume(first)
+    try:
+        for chunk in reader:
+            if len(chunk):
+                consume(chunk)
+    except ValueError:
+        if not downcast:
+            raise
+        # A forced float32 column hit a non-numeric token; redo without dtype hints
+        return profile_csv_stream(path, chunk_rows, usecols, date_col, value_col, False, head_rows)
+    finally:
+        reader.close()
+
+    return {
+        "rows": rows,
+        "cols": len(columns),
+        "columns": columns,
+        "dtypes": dtypes,
+        "missing": {c: st.missing for c, st in stats.items()},
+        "stats": {c: st.summary() for c, st in stats.items() if numeric[c] and st.count},
+        "head": head,
+        "monthly": monthly.frame(date_col, value_col) if monthly is not None else None,
+    }
+
@@ -1,54 +1,412 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from dataclasses import dataclass
+from array import array
 import os
 import json
-from rank_bm25 import BM25Okapi
+import shutil
+import threading
+import numpy as np
 from ...config import config
+from .chunk_store import store as chunk_store, ChunkStore
+
+
+@dataclass(frozen=True)
+class PostingsBlock:
+    """Immutable CSR postings (term id -> rows, term frequencies) for chunk store
+    rows ``[row_start, row_end)``, memory-mapped from ``<index_dir>/<name>/``."""
+    name: str
+    row_start: int
+    row_end: int
+    offsets: np.ndarray
+    rows: np.ndarray
+    tfs: np.ndarray
+
+
+@dataclass(frozen=True)
+class BM25View:
+    """One published generation of the keyword index.
+
+    ``blocks`` are immutable. Rows indexed since the last flush live in ``delta``,
+    shared with the writer but only appended to; the view reads rows below
+    ``n_rows`` and terms below ``n_terms`` as they were at publish. ``live``,
+    ``doc_len`` and ``idf`` are private copies.
+    """
+    generation: int
+    term_ids: Dict[str, int]
+    blocks: Tuple[PostingsBlock, ...]
+    delta: Dict[int, Tuple[array, array]]
+    n_rows: int
+    n_terms: int
+    live: np.ndarray
+    live_count: int
+    doc_len: np.ndarray
+    idf: np.ndarray
+    avgdl: float
+
+    def postings(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows, tfs = [], []
+        for block in self.blocks:
+            if tid + 1 < block.offsets.size:
+                start, end = block.offsets[tid], block.offsets[tid + 1]
+                rows.append(block.rows[start:end])
+                tfs.append(block.tfs[start:end])
+        posting = self.delta.get(tid)
+        if posting is not None:
+            # Copy, then cut off rows appended after this generation (rows are ascending)
+            delta_rows = np.array(posting[0], dtype=np.int64)
+            cut = int(np.searchsorted(delta_rows, self.n_rows))
+            rows.append(delta_rows[:cut])
+            tfs.append(np.array(posting[1], dtype=np.int64)[:cut])
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(rows), np.concatenate(tfs)
 
 
 class BM25Store:
-    def __init__(self, index_dir: str | None = None):
+    """Okapi BM25 over chunk store rows.
+
+    New rows are indexed into an in-memory delta that is flushed to an on-disk
+    ``PostingsBlock`` every ``flush_rows`` rows; trailing blocks are merged once they
+    reach the size of their predecessor, dropping dead rows, and ``compact`` merges
+    everything. Blocks are never modified once written, so worker processes map the
+    same files. Only lengths, flags and the delta are held in memory: text is read
+    from the chunk store when a row is indexed or removed and for the final top-k,
+    and a restart re-tokenizes at most one delta. Writers publish immutable
+    ``BM25View`` generations that readers search without locking. Scoring matches
+    ``rank_bm25.BM25Okapi``.
+    """
+
+    k1 = 1.5
+    b = 0.75
+    epsilon = 0.25
+    flush_rows = 1000
+
+    def __init__(self, index_dir: str | None = None, chunks: ChunkStore | None = None):
         self.index_dir = index_dir or config.BM25_INDEX_DIR
         os.makedirs(self.index_dir, exist_ok=True)
-        self.corpus_path = os.path.join(self.index_dir, "corpus.jsonl")
-        self._bm25: BM25Okapi | None = None
-        self._docs: List[Dict] = []
-        self._tokens: List[List[str]] = []
-        if os.path.exists(self.corpus_path):
+        self.chunks = chunks or chunk_store
+        self.marker = self.chunks.marker
+        self.lock = threading.RLock()
+        self._generation = 0
+        with self.marker.locked():
             self._load()
+        self.publish()
 
-    def _save(self):
-        with open(self.corpus_path, "w", encoding="utf-8") as f:
-            for doc in self._docs:
-                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
-
-    def _load(self):
-        self._docs = []
-        with open(self.corpus_path, "r", encoding="utf-8") as f:
-            for line in f:
-                self._docs.append(json.loads(line))
-        self._tokens = [doc["text"].split() for doc in self._docs]
-        self._bm25 = BM25Okapi(self._tokens)
-
-    def add(self, chunks: List[Dict]):
-        self._docs.extend(chunks)
-        self._tokens = [doc["text"].split() for doc in self._docs]
-        self._bm25 = BM25Okapi(self._tokens)
+    # Persistence: one directory per block, an append-only terms.txt, and blocks.json
+    # (block list + term count) replaced last, so a crash leaves the previous state.
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.index_dir, "blocks.json")
+
+    def _terms_path(self) -> str:
+        return os.path.join(self.index_dir, "terms.txt")
+
+    def _read_block(self, name: str, row_start: int, row_end: int) -> Tuple[PostingsBlock, np.ndarray]:
+        path = os.path.join(self.index_dir, name)
+        offsets, rows, tfs, doc_len = (np.load(os.path.join(path, key + ".npy"), mmap_mode="r")
+                                       for key in ("offsets", "rows", "tfs", "doc_len"))
+        return PostingsBlock(name, row_start, row_end, offsets, rows, tfs), doc_len
+
+    def _load(self, flush: bool = True):
+        """Map the saved blocks and re-tokenize rows indexed after them. ``flush``
+        writes a full delta out as a block (and bumps the generation marker)."""
+        self._terms: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+        self._blocks: List[PostingsBlock] = []
+        self._delta: Dict[int, Tuple[array, array]] = {}
+        self._seq = 0
+        self._saved_terms = 0
+        doc_len = np.zeros(0, dtype=np.int64)
+        if not os.path.exists(self._manifest_path()) and os.path.exists(self._terms_path()):
+            os.remove(self._terms_path())
+        if os.path.exists(self._manifest_path()):
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            self._saved_terms = saved["n_terms"]
+            # Drop terms appended by a save that crashed before replacing the manifest
+            os.truncate(self._terms_path(), saved["terms_bytes"])
+            with open(self._terms_path(), "r", encoding="utf-8") as f:
+                self._terms = [line.rstrip("\n") for line in f]
+            self._term_ids = {t: i for i, t in enumerate(self._terms)}
+            lens = []
+            for b in saved["blocks"]:
+                block, block_len = self._read_block(b["name"], b["row_start"], b["row_end"])
+                self._blocks.append(block)
+                lens.append(block_len)
+            doc_len = np.concatenate(lens).astype(np.int64) if lens else doc_len
+            self._seq = max((int(b.name[3:]) for b in self._blocks), default=-1) + 1
+        n_rows = doc_len.size
+        live_rows = self.chunks.live_rows()
+        live_rows = live_rows[live_rows < n_rows]
+        live = np.zeros(n_rows, dtype=np.int8)
+        live[live_rows] = 1
+        self._doc_len = array("l", doc_len.astype(np.dtype("l")).tobytes())
+        self._live = array("b", live.tobytes())
+        self._live_count = int(live_rows.size)
+        self._live_len = int(doc_len[live_rows].sum())
+        # Rows deleted since their block was written still sit in its postings
+        self._dead = int(np.count_nonzero(doc_len[live == 0]))
+        df = np.zeros(len(self._terms), dtype=np.float64)
+        for block in self._blocks:
+            counts = np.diff(block.offsets)
+            tids = np.repeat(np.arange(counts.size), counts)
+            df[:counts.size] += np.bincount(tids, weights=live[block.rows], minlength=counts.size)
+        self._df = array("l", df.astype(np.dtype("l")).tobytes())
+        self._delta_start = n_rows
+        # Rows written after the last flush are re-tokenized from the chunk store
+        for row, text in self.chunks.iter_texts(n_rows):
+            self._index(row, text)
+        if flush and len(self._doc_len) - self._delta_start >= self.flush_rows:
+            self._flush()
+            self.marker.bump()
+
+    def refresh(self, publish: bool = True):
+        """Catch up with what other processes saved (see ``index_marker``)."""
+        with self.lock:
+            self._load(flush=False)
+            if publish:
+                self.publish()
+
+    def _write_block(self, tids: np.ndarray, rows: np.ndarray, tfs: np.ndarray, row_start: int, row_end: int) -> PostingsBlock:
+        """Write live postings for rows ``[row_start, row_end)`` as a new block."""
+        live = np.array(self._live, dtype=bool)
+        keep = live[rows]
+        tids, rows, tfs = tids[keep], rows[keep], tfs[keep]
+        order = np.lexsort((rows, tids))
+        offsets = np.zeros(len(self._terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tids, minlength=len(self._terms)), out=offsets[1:])
+        # Dead rows are gone from this block's postings
+        doc_len = np.array(self._doc_len[row_start:row_end], dtype=np.int64)
+        dropped = ~live[row_start:row_end] & (doc_len > 0)
+        self._dead -= int(dropped.sum())
+        doc_len[dropped] = 0
+        self._doc_len[row_start:row_end] = array("l", doc_len.astype(np.dtype("l")).tobytes())
+
+        name = f"blk{self._seq:06d}"
+        self._seq += 1
+        path = os.path.join(self.index_dir, name)
+        os.makedirs(path, exist_ok=True)
+        for key, arr in (("offsets", offsets), ("rows", rows[order].astype(np.int32)),
+                         ("tfs", tfs[order].astype(np.int32)), ("doc_len", doc_len.astype(np.int32))):
+            np.save(os.path.join(path, key + ".npy"), arr)
+        return self._read_block(name, row_start, row_end)[0]
+
+    def _block_coo(self, block: PostingsBlock) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        counts = np.diff(block.offsets)
+        return (np.repeat(np.arange(counts.size, dtype=np.int64), counts),
+                np.asarray(block.rows, dtype=np.int64), np.asarray(block.tfs, dtype=np.int64))
+
+    def _flush(self):
+        """Write the delta as a block, merge trailing blocks and save the manifest."""
+        row_end = len(self._doc_len)
+        if row_end > self._delta_start:
+            tids, rows, tfs = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+            for tid, (d_rows, d_tfs) in self._delta.items():
+                tids.append(np.full(len(d_rows), tid, dtype=np.int64))
+                rows.append(np.array(d_rows, dtype=np.int64))
+                tfs.append(np.array(d_tfs, dtype=np.int64))
+            block = self._write_block(np.concatenate(tids), np.concatenate(rows), np.concatenate(tfs), self._delta_start, row_end)
+            # Rebinds rather than clears: published views keep the previous delta
+            self._blocks = self._blocks + [block]
+            self._delta = {}
+            self._delta_start = row_end
+        # Binary-counter merging keeps O(log n) blocks; each posting is rewritten O(log n) times
+        while len(self._blocks) > 1 and self._blocks[-1].rows.size >= self._blocks[-2].rows.size:
+            self._blocks = self._blocks[:-2] + [self._merge(self._blocks[-2:])]
         self._save()
 
-    def search(self, query: str, top_k: int) -> List[Dict]:
-        if not self._bm25:
+    def _merge(self, blocks: List[PostingsBlock]) -> PostingsBlock:
+        parts = [self._block_coo(b) for b in blocks]
+        return self._write_block(*(np.concatenate(p) for p in zip(*parts)), blocks[0].row_start, blocks[-1].row_end)
+
+    def _save(self):
+        with open(self._terms_path(), "ab") as f:
+            # Whitespace-split tokens never contain a newline
+            f.write("".join(t + "\n" for t in self._terms[self._saved_terms:]).encode("utf-8"))
+            terms_bytes = f.tell()
+        self._saved_terms = len(self._terms)
+        with open(self._manifest_path() + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"n_terms": self._saved_terms, "terms_bytes": terms_bytes, "blocks": [
+                {"name": b.name, "row_start": b.row_start, "row_end": b.row_end} for b in self._blocks]}, f)
+        os.replace(self._manifest_path() + ".tmp", self._manifest_path())
+        # Older views keep their blocks mapped; unlinking the files does not disturb them
+        names = {b.name for b in self._blocks}
+        for fn in os.listdir(self.index_dir):
+            if fn.startswith("blk") and fn not in names:
+                shutil.rmtree(os.path.join(self.index_dir, fn), ignore_errors=True)
+        legacy = os.path.join(self.index_dir, "corpus.jsonl")
+        if os.path.exists(legacy):
+            os.remove(legacy)
+
+    def _index(self, row: int, text: str):
+        tokens = text.split()
+        while len(self._doc_len) < row:
+            self._doc_len.append(0)
+            self._live.append(0)
+        self._doc_len.append(len(tokens))
+        self._live.append(1)
+        self._live_count += 1
+        self._live_len += len(tokens)
+        tf: Dict[str, int] = {}
+        for t in tokens:
+            tf[t] = tf.get(t, 0) + 1
+        for t, n in tf.items():
+            tid = self._term_ids.get(t)
+            if tid is None:
+                tid = self._term_ids[t] = len(self._terms)
+                self._terms.append(t)
+                self._df.append(0)
+            posting = self._delta.get(tid)
+            if posting is None:
+                posting = self._delta[tid] = (array("l"), array("l"))
+            try:
+                posting[0].append(row)
+                posting[1].append(n)
+            except BufferError:
+                # A reader is copying this posting (BM25View.postings): append to a copy
+                # instead; views cut either one at their own row count
+                posting = self._delta[tid] = (array("l", posting[0][:len(posting[1])]), array("l", posting[1]))
+                posting[0].append(row)
+                posting[1].append(n)
+            self._df[tid] += 1
+
+    def _idf(self) -> np.ndarray:
+        df = np.array(self._df, dtype="float64")
+        idf = np.full(df.size, np.nan)
+        present = df > 0
+        if present.any():
+            v = np.log(self._live_count - df[present] + 0.5) - np.log(df[present] + 0.5)
+            eps = self.epsilon * v.mean()
+            idf[present] = np.where(v < 0, eps, v)
+        return idf
+
+    def build_view(self) -> BM25View:
+        """Freeze everything written so far into the next generation (not yet visible)."""
+        with self.lock:
+            self._generation += 1
+            return BM25View(
+                generation=self._generation,
+                term_ids=self._term_ids,
+                blocks=tuple(self._blocks),
+                delta=self._delta,
+                n_rows=len(self._doc_len),
+                n_terms=len(self._terms),
+                live=np.array(self._live, dtype=bool),
+                live_count=self._live_count,
+                doc_len=np.array(self._doc_len, dtype="float64"),
+                idf=self._idf(),
+                avgdl=self._live_len / self._live_count if self._live_count else 0.0,
+            )
+
+    def publish(self, view: BM25View | None = None) -> BM25View:
+        """Make ``view`` (default: everything written so far) the generation new readers get."""
+        with self.lock:
+            self.view = view or self.build_view()
+            return self.view
+
+    def add(self, rows: np.ndarray, texts: List[str], publish: bool = True):
+        with self.lock:
+            for row, text in zip(rows.tolist(), texts):
+                self._index(row, text)
+            if len(self._doc_len) - self._delta_start >= self.flush_rows:
+                self._flush()
+            if publish:
+                self.publish()
+
+    def remove_rows(self, rows: List[int], publish: bool = True) -> int:
+        with self.lock:
+            rows = [r for r in rows if r < len(self._live) and self._live[r]]
+            if not rows:
+                return 0
+            for text in self.chunks.texts(rows).values():
+                for t in set(text.split()):
+                    self._df[self._term_ids[t]] -= 1
+            for row in rows:
+                self._live[row] = 0
+                self._live_count -= 1
+                self._live_len -= self._doc_len[row]
+            self._dead += len(rows)
+            if publish:
+                self.publish()
+        return len(rows)
+
+    def dead_ratio(self) -> float:
+        total = self._live_count + self._dead
+        return self._dead / total if total else 0.0
+
+    def compact(self, publish: bool = True) -> int:
+        """Merge every block into one without the dead rows."""
+        with self.lock:
+            dead = self._dead
+            if not dead:
+                return 0
+            self._flush()
+            if self._blocks:
+                self._blocks = [self._merge(self._blocks)]
+                self._save()
+            if publish:
+                self.publish()
+            return dead
+
+    def search(self, query: str, top_k: int, view: BM25View | None = None, rows: np.ndarray | None = None) -> List[Dict]:
+        """Top ``top_k`` live chunks matching at least one query term, restricted to
+        chunk store ``rows`` if given. Corpus statistics (idf, avgdl) stay those of
+        the whole index."""
+        view = view or self.view
+        if not view.live_count:
+            return []
+        candidates = view.live
+        if rows is not None:
+            # Postings outside the candidate bitmap are dropped before scoring
+            candidates = np.zeros(view.n_rows, dtype=bool)
+            candidates[rows[rows < view.n_rows]] = True
+            candidates &= view.live
+        scores = np.zeros(view.n_rows, dtype="float64")
+        for t in query.split():
+            tid = view.term_ids.get(t)
+            if tid is None or tid >= view.n_terms or np.isnan(view.idf[tid]):
+                continue
+            p_rows, tf = view.postings(tid)
+            if rows is not None:
+                keep = candidates[p_rows]
+                p_rows, tf = p_rows[keep], tf[keep]
+            tf = tf.astype("float64")
+            norm = self.k1 * (1 - self.b + self.b * view.doc_len[p_rows] / view.avgdl)
+            scores[p_rows] += view.idf[tid] * (tf * (self.k1 + 1) / (tf + norm))
+        # Chunks without a query term score 0; ranked fusion would still credit them
+        live_rows = np.flatnonzero(candidates & (scores > 0))
+        if not live_rows.size:
             return []
-        scores = self._bm25.get_scores(query.split())
-        # Pair scores with docs
-        scored = sorted(zip(scores, self._docs), key=lambda x: x[0], reverse=True)[:top_k]
+        live_scores = scores[live_rows]
+        k = min(top_k, live_rows.size)
+        top = np.argpartition(-live_scores, k - 1)[:k] if k < live_rows.size else np.arange(live_rows.size)
+        top = top[np.lexsort((top, -live_scores[top]))]
+        # Text and metadata are read only for the final top-k
+        chunks = self.chunks.get(live_rows[top].tolist())
         results: List[Dict] = []
-        for score, doc in scored:
-            results.append({
-                **doc,
-                "score": float(score),
-                "retrieval": "keyword"
-            })
+        for i in top:
+            chunk = chunks.get(int(live_rows[i]))
+            if chunk is None:
+                continue
+            chunk["score"] = float(live_scores[i])
+            chunk["retrieval"] = "keyword"
+            results.append(chunk)
         return results
 
+    def stats(self) -> Dict:
+        view = self.view
+        return {
+            "backend": "bm25",
+            "generation": view.generation,
+            "blocks": len(view.blocks),
+            "terms": view.n_terms,
+            "live": view.live_count,
+            "dead_ratio": round(self.dead_ratio(), 4),
+        }
 
-store = BM25Store()
+    def memory_bytes(self) -> int:
+        view = self.view
+        arrays = [view.live, view.doc_len, view.idf] + [a for b in view.blocks for a in (b.offsets, b.rows, b.tfs)]
+        # ~100 bytes per term for the string, its id and the dict slot; 16 per delta posting
+        delta = sum(len(rows) for rows, _ in list(view.delta.values())) * 16
+        return sum(a.nbytes for a in arrays) + view.n_terms * 100 + delta
@@ -0,0 +1,419 @@
+from typing import List, Dict, Iterable, Iterator, Tuple, Set
+from collections import OrderedDict
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+from ...config import config
+from ..entities import chunk_tags
+from .. import dedup
+from .index_marker import GenerationMarker, marker as default_marker
+from .lazy import Lazy
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    row INTEGER PRIMARY KEY AUTOINCREMENT,
+    chunk_id TEXT NOT NULL,
+    document_id TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    text TEXT NOT NULL,
+    meta TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_document ON chunks(document_id);
+CREATE INDEX IF NOT EXISTS chunks_deleted ON chunks(deleted);
+CREATE INDEX IF NOT EXISTS chunks_chunk_id ON chunks(chunk_id, deleted);
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    chunks INTEGER NOT NULL,
+    first_row INTEGER NOT NULL,
+    last_row INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_filename ON documents(filename);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    PRIMARY KEY (tag, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_row ON tags(row);
+CREATE TABLE IF NOT EXISTS duplicates (
+    row INTEGER PRIMARY KEY,
+    representative INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS duplicates_representative ON duplicates(representative);
+CREATE TABLE IF NOT EXISTS minhash (
+    key INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    PRIMARY KEY (key, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS minhash_row ON minhash(row);
+"""
+
+# PRAGMA user_version: 1 = tags table populated, 2 = minhash table populated,
+# 3 = entity tags include the chunk's own entity name
+_VERSION = 3
+# Rows the indexes hold: duplicates are stored, but only their representative is indexed
+_INDEXED = "row NOT IN (SELECT row FROM duplicates)"
+
+# Catalog rows are folded in per batch, in the same transaction as the chunks
+_UPSERT_DOCUMENT = """
+INSERT INTO documents (document_id, filename, chunks, first_row, last_row) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(document_id) DO UPDATE SET
+    chunks = chunks + excluded.chunks,
+    first_row = min(first_row, excluded.first_row),
+    last_row = max(last_row, excluded.last_row)
+"""
+
+# SQLite's default limit on host parameters per statement
+_MAX_VARS = 999
+# Tags whose row sets are kept in memory (see tag_rows)
+_TAG_CACHE_SIZE = 256
+
+
+class ChunkStore:
+    """Chunk text and metadata in SQLite, addressed by integer rows.
+
+    Rows are allocated here and used as-is by both the FAISS ids and the BM25 rows,
+    so each index keeps only numbers in memory and hydrates its final top-k with one
+    ``get``. Rows are never reused. ``deleted`` holds the snapshot epoch from which a
+    row is gone (0 = live); it is purged only once no older snapshot is held.
+
+    The ``documents`` table is the document catalog: chunk count and row range per
+    live document, updated with every insert and delete. ``tags`` maps the filterable
+    tags of ``entities.chunk_tags`` (entity, year) to rows.
+
+    Near-duplicate chunks (``dedup``) are stored like any other, so their documents,
+    tags and chunk_ids stay as they are, but ``duplicates`` points them at the row
+    the indexes hold instead; ``minhash`` holds the LSH keys of indexed rows. The row
+    listings the indexes load from (``live_rows``, ``deleted_rows``, ``iter_texts``)
+    leave duplicates out.
+    """
+
+    def __init__(self, path: str | None = None, marker: GenerationMarker | None = None):
+        self.path = path or config.CHUNK_STORE_PATH
+        # The generation of the indexes over this store; they lock and bump it too
+        self.marker = marker or default_marker
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tag_cache: "OrderedDict[str, Tuple[int, np.ndarray]]" = OrderedDict()
+        # Sorted duplicate rows and their representatives, loaded on first use
+        self._duplicate_map: Tuple[np.ndarray, np.ndarray] | None = None
+        self._next_row = 0
+        conn = self._conn()
+        # Other worker processes may be opening the same store
+        with self.marker.locked():
+            with conn:
+                conn.executescript(_SCHEMA)
+                # Epochs are index generations (see index_marker); deletions stamped after the
+                # last one, e.g. before there was a marker, are invisible to everyone now
+                epoch = max(1, self.marker.read())
+                conn.execute("UPDATE chunks SET deleted = ? WHERE deleted > ?", (epoch, epoch))
+            self.refresh()
+            if not self._next_row and self.path == config.CHUNK_STORE_PATH:
+                self._import_legacy()
+            if not conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone():
+                self._rebuild_catalog()
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 3:
+                self._backfill_tags()
+            if version < 2:
+                self._backfill_minhash()
+            if version < _VERSION:
+                conn.execute(f"PRAGMA user_version = {_VERSION}")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            # WAL: readers never wait on the ingestion writer
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy(self):
+        # Metadata used to live only in the FAISS sidecar; its ids become the rows
+        meta_path = config.FAISS_INDEX_PATH + ".meta.npy"
+        if not os.path.exists(meta_path):
+            return
+        metas = list(np.load(meta_path, allow_pickle=True))
+        ids_path = config.FAISS_INDEX_PATH + ".ids.npy"
+        ids = np.load(ids_path).tolist() if os.path.exists(ids_path) else range(len(metas))
+        self._insert([(i, m) for i, m in zip(ids, metas) if m is not None])
+
+    def _rebuild_catalog(self):
+        # Stores written before the catalog table existed (or by the legacy import)
+        conn = self._conn()
+        with conn:
+            conn.execute("""
+                INSERT INTO documents (document_id, filename, chunks, first_row, last_row)
+                SELECT document_id, coalesce(json_extract(min(meta), '$.source_doc'), 'unknown'), count(*), min(row), max(row)
+                FROM chunks WHERE deleted = 0 AND document_id IS NOT NULL GROUP BY document_id ORDER BY min(row)
+            """)
+
+    def _backfill_tags(self):
+        conn = self._conn()
+        last = -1
+        # Tags written by an older chunk_tags are replaced in one transaction
+        with conn:
+            conn.execute("DELETE FROM tags")
+            while batch := conn.execute("SELECT row, text, meta FROM chunks WHERE row > ? ORDER BY row LIMIT 1000", (last,)).fetchall():
+                records = [(tag, row) for row, text, meta in batch for tag in chunk_tags({**json.loads(meta), "text": text})]
+                conn.executemany("INSERT OR IGNORE INTO tags (tag, row) VALUES (?, ?)", records)
+                last = batch[-1][0]
+
+    def _backfill_minhash(self):
+        # Chunks indexed before near-duplicate detection: later ones can still match them
+        conn = self._conn()
+        last = -1
+        while batch := conn.execute("SELECT row, text FROM chunks WHERE deleted = 0 AND row > ? ORDER BY row LIMIT 1000", (last,)).fetchall():
+            keys = dedup.band_keys([dedup.shingles(text) for _, text in batch])
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO minhash (key, row) VALUES (?, ?)",
+                                 [(int(k), row) for (row, _), ks in zip(batch, keys) for k in ks if k])
+            last = batch[-1][0]
+
+    def refresh(self):
+        """Catch up with rows other processes allocated."""
+        seq = self._conn().execute("SELECT seq FROM sqlite_sequence WHERE name = 'chunks'").fetchone()
+        with self._lock:
+            self._next_row = max(self._next_row, seq[0] + 1 if seq else 0)
+            # Other processes may have added or promoted duplicates
+            self._duplicate_map = None
+
+    @property
+    def next_row(self) -> int:
+        return self._next_row
+
+    def _insert(self, rows: List[Tuple[int, Dict]], duplicates: List[Tuple[int, int]] = (),
+                keys: List[Tuple[int, int]] = ()):
+        records, tags = [], []
+        documents: Dict[str, List] = {}
+        for row, chunk in rows:
+            tags.extend((tag, row) for tag in chunk_tags(chunk))
+            # The text goes in its own column; meta keeps the key order with a placeholder
+            records.append((row, chunk.get("chunk_id", ""), chunk.get("document_id"), chunk.get("text", ""),
+                            json.dumps({**chunk, "text": None}, ensure_ascii=False)))
+            doc_id = chunk.get("document_id")
+            if doc_id:
+                entry = documents.setdefault(doc_id, [doc_id, chunk.get("source_doc", "unknown"), 0, row, row])
+                entry[2] += 1
+                entry[3], entry[4] = min(entry[3], row), max(entry[4], row)
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT INTO chunks (row, chunk_id, document_id, text, meta) VALUES (?, ?, ?, ?, ?)", records)
+            conn.executemany(_UPSERT_DOCUMENT, list(documents.values()))
+            conn.executemany("INSERT OR IGNORE INTO tags (tag, row) VALUES (?, ?)", tags)
+            conn.executemany("INSERT INTO duplicates (row, representative) VALUES (?, ?)", duplicates)
+            conn.executemany("INSERT OR IGNORE INTO minhash (key, row) VALUES (?, ?)", keys)
+        if rows:
+            self._next_row = max(self._next_row, max(r for r, _ in rows) + 1)
+        if duplicates:
+            self._duplicate_map = None
+
+    def add(self, chunks: List[Dict], duplicates: dedup.Duplicates | None = None) -> np.ndarray:
+        """Store ``chunks`` in new rows. With ``duplicates`` (``dedup.find`` of the same
+        chunks), the near-duplicates among them are recorded as such, and the LSH keys
+        of the others, which the caller indexes, are kept for later batches."""
+        with self._lock:
+            rows = np.arange(self._next_row, self._next_row + len(chunks), dtype="int64")
+            pairs, keys = [], []
+            if duplicates is not None:
+                pairs = [(int(rows[i]), int(r)) for i, r in duplicates.of_rows.items()]
+                pairs += [(int(rows[i]), int(rows[j])) for i, j in duplicates.of_positions.items()]
+                keys = [(int(k), int(rows[i])) for i in duplicates.unique(len(chunks)) for k in duplicates.keys[i] if k]
+            self._insert(list(zip(rows.tolist(), chunks)), pairs, keys)
+            return rows
+
+    def _select(self, sql: str, values: List) -> Iterator[tuple]:
+        conn = self._conn()
+        for i in range(0, len(values), _MAX_VARS):
+            part = values[i:i + _MAX_VARS]
+            yield from conn.execute(sql.format(",".join("?" * len(part))), part)
+
+    def get(self, rows: Iterable[int]) -> Dict[int, Dict]:
+        """Chunks by row; rows that were deleted and purged are absent."""
+        out: Dict[int, Dict] = {}
+        for row, text, meta in self._select("SELECT row, text, meta FROM chunks WHERE row IN ({})", [int(r) for r in rows]):
+            chunk = json.loads(meta)
+            chunk["text"] = text
+            out[row] = chunk
+        return out
+
+    def texts(self, rows: Iterable[int]) -> Dict[int, str]:
+        return dict(self._select("SELECT row, text FROM chunks WHERE row IN ({})", [int(r) for r in rows]))
+
+    def iter_texts(self, start: int = 0) -> Iterator[Tuple[int, str]]:
+        """(row, text) of live indexed chunks from ``start`` on, in row order."""
+        yield from self._conn().execute(f"SELECT row, text FROM chunks WHERE row >= ? AND deleted = 0 AND {_INDEXED} ORDER BY row",
+                                        (start,))
+
+    def find(self, chunk_id: str) -> Dict | None:
+        return self.find_many([chunk_id]).get(chunk_id)
+
+    def find_many(self, chunk_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Live chunks by chunk_id; unknown ids are absent."""
+        rows = dict(self._select("SELECT chunk_id, row FROM chunks WHERE deleted = 0 AND chunk_id IN ({})", list(set(chunk_ids))))
+        chunks = self.get(rows.values())
+        return {chunk_id: chunks[row] for chunk_id, row in rows.items() if row in chunks}
+
+    def live_rows(self) -> np.ndarray:
+        """Live rows the indexes hold (duplicates excluded)."""
+        rows = self._conn().execute(f"SELECT row FROM chunks WHERE deleted = 0 AND {_INDEXED} ORDER BY row").fetchall()
+        return np.array([r for r, in rows], dtype="int64")
+
+    def deleted_rows(self) -> List[int]:
+        """Soft-deleted rows not purged yet, duplicates excluded: the indexes never held them."""
+        return [r for r, in self._conn().execute(f"SELECT row FROM chunks WHERE deleted != 0 AND {_INDEXED}")]
+
+    def indexed(self, rows: Iterable[int]) -> List[int]:
+        """Those of ``rows`` that are not duplicates."""
+        dup, _ = self._duplicates()
+        rows = np.asarray(list(rows), dtype="int64")
+        return rows[~np.isin(rows, dup)].tolist()
+
+    def removed(self, rows: Iterable[int]) -> Set[int]:
+        """Those of ``rows`` that are deleted (or purged)."""
+        rows = {int(r) for r in rows}
+        return rows - {r for r, in self._select("SELECT row FROM chunks WHERE deleted = 0 AND row IN ({})", list(rows))}
+
+    def minhash_candidates(self, keys: Set[int]) -> List[Tuple[int, int, str]]:
+        """(key, row, text) of the live indexed chunks with any of the LSH ``keys``."""
+        # Two lookups by primary key: joined, SQLite scans the live chunks instead
+        pairs = list(self._select("SELECT key, row FROM minhash WHERE key IN ({})", list(keys)))
+        texts = dict(self._select("SELECT row, text FROM chunks WHERE deleted = 0 AND row IN ({})", list({r for _, r in pairs})))
+        return [(key, row, texts[row]) for key, row in pairs if row in texts]
+
+    def _duplicates(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            cached = self._duplicate_map
+        if cached is None:
+            pairs = self._conn().execute("SELECT row, representative FROM duplicates ORDER BY row").fetchall()
+            pairs = np.array(pairs, dtype="int64").reshape(-1, 2)
+            cached = (pairs[:, 0], pairs[:, 1])
+            with self._lock:
+                self._duplicate_map = cached
+        return cached
+
+    def duplicate_count(self) -> int:
+        return self._conn().execute("SELECT count(*) FROM duplicates d JOIN chunks c ON c.row = d.row"
+                                    " WHERE c.deleted = 0").fetchone()[0]
+
+    def representatives(self, rows: np.ndarray) -> np.ndarray:
+        """``rows`` plus the rows their duplicates collapse into, so that filters matching
+        only a duplicate still find the chunk the indexes hold. ``rows`` itself when it
+        holds no duplicates."""
+        dup, rep = self._duplicates()
+        if not dup.size or not rows.size:
+            return rows
+        at = np.minimum(np.searchsorted(dup, rows), dup.size - 1)
+        hit = dup[at] == rows
+        return np.union1d(rows, rep[at[hit]]) if hit.any() else rows
+
+    def duplicates_of(self, chunk_ids: Iterable[str]) -> Dict[str, List[Dict]]:
+        """Back-references: the live duplicates of live chunks, by the chunk's chunk_id."""
+        if not self._duplicates()[0].size:
+            return {}
+        out: Dict[str, List[Dict]] = {}
+        for chunk_id, dup_id, document_id, source_doc in self._select(
+                "SELECT r.chunk_id, c.chunk_id, c.document_id, json_extract(c.meta, '$.source_doc') FROM chunks r"
+                " JOIN duplicates d ON d.representative = r.row JOIN chunks c ON c.row = d.row"
+                " WHERE r.deleted = 0 AND c.deleted = 0 AND r.chunk_id IN ({}) ORDER BY c.row", list(set(chunk_ids))):
+            out.setdefault(chunk_id, []).append({"chunk_id": dup_id, "document_id": document_id, "source_doc": source_doc})
+        return out
+
+    def promote_duplicates(self, rows: List[int]) -> Dict[int, str]:
+        """Before ``rows`` are removed: each of them that live duplicates outside ``rows``
+        collapse into hands over to the first of those, which the caller must index.
+        The indexes only take rows above those they hold, so the new representative
+        moves to a new row. Returns its text by new row."""
+        removed = {int(r) for r in rows}
+        successors: Dict[int, int] = {}
+        for row, rep in self._select("SELECT d.row, d.representative FROM duplicates d JOIN chunks c ON c.row = d.row"
+                                     " WHERE c.deleted = 0 AND d.representative IN ({}) ORDER BY d.row", list(removed)):
+            if row not in removed:
+                successors.setdefault(rep, row)
+        if not successors:
+            return {}
+        texts = self.texts(successors.values())
+        keys = dedup.band_keys([dedup.shingles(texts[r]) for r in successors.values()])
+        conn = self._conn()
+        with self._lock:
+            moved = {old: self._next_row + i for i, old in enumerate(successors.values())}
+            with conn:
+                for table in ("chunks", "tags"):
+                    conn.executemany(f"UPDATE {table} SET row = ? WHERE row = ?", [(new, old) for old, new in moved.items()])
+                conn.executemany("DELETE FROM duplicates WHERE row = ?", [(old,) for old in moved])
+                conn.executemany("UPDATE duplicates SET representative = ? WHERE representative = ?",
+                                 [(moved[new], old) for old, new in successors.items()])
+                conn.executemany("INSERT OR IGNORE INTO minhash (key, row) VALUES (?, ?)",
+                                 [(int(k), moved[old]) for old, ks in zip(successors.values(), keys) for k in ks if k])
+                conn.execute("UPDATE documents SET last_row = max(last_row, (SELECT max(row) FROM chunks c"
+                             " WHERE c.document_id = documents.document_id)) WHERE document_id IN"
+                             " (SELECT document_id FROM chunks WHERE row >= ?)", (self._next_row,))
+                # Updated rows do not advance AUTOINCREMENT; other processes allocate from it
+                conn.execute("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'chunks'", (max(moved.values()),))
+            self._next_row = max(moved.values()) + 1
+            self._duplicate_map = None
+        return {new: texts[old] for old, new in moved.items()}
+
+    def rows_for_documents(self, document_ids: Iterable[str]) -> List[int]:
+        # Each document's chunks are scanned within its catalogued row range
+        return [r for r, in self._select(
+            "SELECT c.row FROM documents d JOIN chunks c ON c.row BETWEEN d.first_row AND d.last_row"
+            " AND c.document_id = d.document_id WHERE c.deleted = 0 AND d.document_id IN ({})", list(set(document_ids)))]
+
+    def documents(self) -> List[Dict]:
+        """The catalog, in indexing order."""
+        rows = self._conn().execute("SELECT document_id, filename, chunks FROM documents ORDER BY rowid")
+        return [{"id": doc_id, "filename": filename, "chunks": chunks} for doc_id, filename, chunks in rows]
+
+    def document(self, document_id: str) -> Dict | None:
+        for doc_id, filename, chunks, first_row, last_row in self._conn().execute(
+                "SELECT document_id, filename, chunks, first_row, last_row FROM documents WHERE document_id = ?", (document_id,)):
+            return {"id": doc_id, "filename": filename, "chunks": chunks, "first_row": first_row, "last_row": last_row}
+        return None
+
+    def document_ids(self) -> Set[str]:
+        return {doc_id for doc_id, in self._conn().execute("SELECT document_id FROM documents")}
+
+    def documents_for_source(self, filename: str) -> List[str]:
+        return [doc_id for doc_id, in self._conn().execute("SELECT document_id FROM documents WHERE filename = ?", (filename,))]
+
+    def tag_rows(self, tag: str) -> np.ndarray:
+        """Sorted rows carrying ``tag``; may include deleted rows, which searches drop
+        with their live masks. Cached per tag and extended with rows added since."""
+        with self._lock:
+            end = self._next_row
+            start, rows = self._tag_cache.pop(tag, (0, np.zeros(0, dtype="int64")))
+        if start < end:
+            new = self._conn().execute("SELECT row FROM tags WHERE tag = ? AND row >= ? AND row < ? ORDER BY row",
+                                       (tag, start, end)).fetchall()
+            rows = np.concatenate([rows, np.array([r for r, in new], dtype="int64")])
+        with self._lock:
+            self._tag_cache[tag] = (end, rows)
+            while len(self._tag_cache) > _TAG_CACHE_SIZE:
+                self._tag_cache.popitem(last=False)
+        return rows
+
+    def mark_deleted(self, rows: List[int], epoch: int = 1, document_ids: Iterable[str] = ()):
+        """Soft-delete ``rows`` as of snapshot ``epoch``; readers of earlier epochs still see them.
+        ``document_ids`` leave the catalog in the same transaction."""
+        conn = self._conn()
+        with conn:
+            conn.executemany("UPDATE chunks SET deleted = ? WHERE row = ?", [(epoch, int(r)) for r in rows])
+            conn.executemany("DELETE FROM documents WHERE document_id = ?", [(d,) for d in set(document_ids)])
+
+    def purge(self, before: int) -> int:
+        """Drop rows deleted at or before epoch ``before``, i.e. invisible to every reader."""
+        conn = self._conn()
+        with conn:
+            for table in ("tags", "duplicates", "minhash"):
+                conn.execute(f"DELETE FROM {table} WHERE row IN (SELECT row FROM chunks WHERE deleted BETWEEN 1 AND ?)", (before,))
+            return conn.execute("DELETE FROM chunks WHERE deleted BETWEEN 1 AND ?", (before,)).rowcount
+
+
+# Opened on first use, not at import
+store = Lazy(ChunkStore, default_marker.locked)
@@ -0,0 +1,129 @@
+from typing import Any, List, Tuple
+from functools import lru_cache
+import numpy as np
+from ...config import config
+
+LOCAL = "local"
+# Hash buckets of the n-gram features, and nonzeros per bucket in the projection
+_BUCKETS = 1 << 20
+_NONZEROS = 4
+# Feature classes: word unigrams, word bigrams, character 3- to 5-grams within words
+_CLASSES = ("word", "bigram", "char")
+_NGRAMS = (3, 4, 5)
+# ASCII bytes other than letters, digits and "_" separate words; UTF-8 sequences of other scripts are kept
+_SEPARATORS = bytes(b if chr(b).isalnum() or b == ord("_") or b >= 128 else 32 for b in range(256))
+# Odd, so invertible modulo 2**64; hashes are polynomial in it and wrap at 64 bits
+_P = 0x100000001B3
+_P_INV = pow(_P, -1, 1 << 64)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def create(model: str | None = None) -> Any:
+    """The embedding provider for ``model`` (``EMBEDDING_MODEL``): ``local`` for
+    ``LocalEmbeddings``, any other name for that OpenAI model."""
+    model = model or config.EMBEDDING_MODEL
+    if model == LOCAL:
+        return LocalEmbeddings(config.LOCAL_EMBEDDING_DIM)
+    # langchain_openai takes about a second to import; the local provider does not need it
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=model, api_key=config.OPENAI_API_KEY)
+
+
+class LocalEmbeddings:
+    """CPU embeddings without an API, weights or fitting.
+
+    Each text becomes sublinear term counts of its words, word bigrams and
+    character 3- to 5-grams (of words padded with spaces, as in fastText), hashed
+    into ``2**20`` buckets. Each class of features is normalized and weighted, then
+    the buckets are projected to ``dim`` dimensions by a sparse random projection
+    with ``_NONZEROS`` +-1 entries per bucket, from a fixed seed. Nothing depends on
+    the corpus, so vectors indexed earlier stay comparable with new ones and every
+    process computes the same vector for a text. Similarity is lexical: shared words
+    and word pieces, not meaning. A batch is hashed with NumPy over its bytes at once.
+    """
+
+    weights = {"word": 1.0, "bigram": 0.5, "char": 0.7}
+
+    def __init__(self, dim: int = 384, seed: int = 0):
+        self.dim = dim
+        self._positions, self._signs = _projection(dim, seed)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        if not texts:
+            return out
+        encoded = [b" " + t.lower().encode("utf-8").translate(_SEPARATORS) + b" " for t in texts]
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        owner = np.repeat(np.arange(len(texts)), [len(e) for e in encoded])
+        prefix, powers = _prefix_hashes(data)
+        for cls, (text, hashes) in zip(_CLASSES, _features(data, owner, prefix, powers)):
+            if hashes.size:
+                self._accumulate(out, text, hashes, self.weights[cls])
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed_documents([text])[0]
+
+    def _accumulate(self, out: np.ndarray, text: np.ndarray, hashes: np.ndarray, weight: float):
+        # Fibonacci hashing: the top bits of the mixed hash pick the bucket
+        buckets = ((hashes * _MIX) >> np.uint64(64 - 20)).astype(np.int64)
+        keys, counts = np.unique(text * _BUCKETS + buckets, return_counts=True)
+        text, buckets = keys // _BUCKETS, keys % _BUCKETS
+        tf = 1.0 + np.log(counts)
+        # Unit norm per text within the class, so long texts' many n-grams do not outweigh words
+        norms = np.sqrt(np.bincount(text, weights=tf * tf, minlength=out.shape[0]))
+        tf *= weight / np.sqrt(_NONZEROS) / norms[text]
+        flat = text[:, None] * self.dim + self._positions[buckets].astype(np.int64)
+        out += np.bincount(flat.ravel(), weights=(self._signs[buckets] * tf[:, None]).ravel(),
+                           minlength=out.size).reshape(out.shape).astype("float32")
+
+
+@lru_cache(maxsize=4)
+def _projection(dim: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Output positions and signs of each bucket, shared by every provider of ``dim``."""
+    rng = np.random.default_rng(seed)
+    positions = rng.integers(0, dim, size=(_BUCKETS, _NONZEROS), dtype=np.int32 if dim > 1 << 15 else np.int16)
+    return positions, rng.choice(np.array([-1, 1], dtype=np.int8), size=(_BUCKETS, _NONZEROS))
+
+
+def _prefix_hashes(data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """``prefix[i] = sum(data[j] * P**-j for j < i)`` and ``powers[i] = P**i``, modulo 2**64,
+    so the hash of ``data[s:e]`` is ``(prefix[e] - prefix[s]) * powers[e - 1]``."""
+    with np.errstate(over="ignore"):
+        powers = np.concatenate([[np.uint64(1)], np.cumprod(np.full(data.size, _P, dtype=np.uint64))])[:-1]
+        inverse = np.concatenate([[np.uint64(1)], np.cumprod(np.full(data.size, _P_INV, dtype=np.uint64))])[:-1]
+        prefix = np.concatenate([[np.uint64(0)], np.cumsum(data * inverse, dtype=np.uint64)])
+    return prefix, powers
+
+
+def _substring_hashes(prefix: np.ndarray, powers: np.ndarray, start: np.ndarray, end: np.ndarray,
+                      salt: int) -> np.ndarray:
+    with np.errstate(over="ignore"):
+        return ((prefix[end] - prefix[start]) * powers[end - 1]) ^ np.uint64(salt)
+
+
+def _features(data: np.ndarray, owner: np.ndarray, prefix: np.ndarray, powers: np.ndarray):
+    """(text index, hash) arrays of the words, word bigrams and character n-grams."""
+    spaces = np.flatnonzero(data == 32)
+    # Every text starts and ends with a space, so words lie between consecutive spaces
+    # (runs of separators give empty words, dropped here)
+    start, end = spaces[:-1] + 1, spaces[1:]
+    keep = end > start
+    start, end = start[keep], end[keep]
+    words = _substring_hashes(prefix, powers, start, end, 1)
+    yield owner[start], words
+    same = owner[start[1:]] == owner[start[:-1]]
+    with np.errstate(over="ignore"):
+        bigrams = (words[:-1][same] * np.uint64(_P) + words[1:][same]) ^ np.uint64(2)
+    yield owner[start[1:]][same], bigrams
+    # n-grams of " word " with no space inside: each within one padded word
+    is_space = np.concatenate([[0], np.cumsum(data == 32)])
+    texts, hashes = [], []
+    for n in _NGRAMS:
+        s = np.arange(max(0, data.size - n + 1))
+        inner = is_space[s + n - 1] - is_space[s + 1]
+        s = s[(inner == 0) & (owner[s] == owner[s + n - 1])]
+        texts.append(owner[s])
+        hashes.append(_substring_hashes(prefix, powers, s, s + n, 3 + n))
+    yield np.concatenate(texts), np.concatenate(hashes)
@@ -1,63 +1,454 @@
-from typing import List, Dict, Tuple
+from typing import Any, List, Dict, Tuple
+from dataclasses import dataclass
 import os
+import json
+import threading
 import numpy as np
 import faiss
 from ...config import config
-from langchain_openai import OpenAIEmbeddings
+from .chunk_store import store as chunk_store, ChunkStore
+from .vector_backend import Hits, hydrate
+from . import embeddings as embedding_providers
+
+
+CODECS = ("flat", "fp16", "sq8", "pq")
+# PQ trains 256 centroids per sub-quantizer; k-means wants ~39 points per centroid
+_PQ_MIN_TRAIN = 256 * 39
+# Saved segments are mapped, not copied: processes opening them share the page cache
+_READ_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
+
+def _pq_m(d: int) -> int:
+    return max(m for m in range(1, min(config.VECTOR_PQ_M, d) + 1) if d % m == 0)
+
+
+def new_index(vectors: np.ndarray, ids: np.ndarray, codec: str) -> faiss.IndexIVF:
+    """An inner-product index over ``vectors`` stored with ``codec``, trained on them.
+
+    It is an IVF index with a single list, so search scans every vector as a flat
+    index does, but the list holds the ids and can be memory-mapped when read back.
+    Segments too small to train PQ are stored as fp16.
+    """
+    d = vectors.shape[1]
+    if codec == "pq" and len(vectors) < _PQ_MIN_TRAIN:
+        codec = "fp16"
+    quantizer = faiss.IndexFlatIP(d)
+    quantizer.add(np.zeros((1, d), dtype="float32"))
+    if codec == "flat" or not len(vectors):
+        index = faiss.IndexIVFFlat(quantizer, d, 1, faiss.METRIC_INNER_PRODUCT)
+    elif codec in ("fp16", "sq8"):
+        qtype = faiss.ScalarQuantizer.QT_fp16 if codec == "fp16" else faiss.ScalarQuantizer.QT_8bit
+        index = faiss.IndexIVFScalarQuantizer(quantizer, d, 1, qtype, faiss.METRIC_INNER_PRODUCT, False)
+    elif codec == "pq":
+        index = faiss.IndexIVFPQ(quantizer, d, 1, _pq_m(d), 8, faiss.METRIC_INNER_PRODUCT)
+        index.by_residual = False
+    else:
+        raise ValueError(f"Unknown VECTOR_CODEC {codec!r}, expected one of {CODECS}")
+    index.own_fields = True
+    quantizer.this.disown()
+    if not index.is_trained:
+        index.train(vectors)
+    index.add_with_ids(vectors, ids)
+    return index
+
+
+@dataclass(frozen=True)
+class Segment:
+    name: str
+    index: faiss.IndexIVF
+
+    @property
+    def exact(self) -> bool:
+        return isinstance(self.index, faiss.IndexIVFFlat)
+
+    def ids(self) -> np.ndarray:
+        lists = self.index.invlists
+        n = lists.list_size(0)
+        return faiss.rev_swig_ptr(lists.get_ids(0), n).copy() if n else np.zeros(0, dtype="int64")
+
+    def vectors(self) -> np.ndarray:
+        """Stored vectors of a flat segment, in ``ids`` order."""
+        lists = self.index.invlists
+        n = lists.list_size(0)
+        if not n:
+            return np.zeros((0, self.index.d), dtype="float32")
+        codes = faiss.rev_swig_ptr(lists.get_codes(0), n * self.index.code_size)
+        return codes.view("float32").reshape(n, self.index.d).copy()
+
+
+@dataclass(frozen=True)
+class FaissView:
+    """One published generation of the vector index: segments and the live bitmap,
+    neither modified after publish. Ids are chunk store rows.
+
+    With a compressed codec, ``exact`` maps the on-disk float32 copy (row -> vector)
+    and the top ``rerank`` x k candidates from the codes are re-scored with it.
+    """
+    generation: int
+    segments: Tuple[Segment, ...]
+    live: np.ndarray
+    live_count: int
+    bitmap: np.ndarray | None
+    exact: np.ndarray | None = None
+    rerank: int = 1
+
+    @property
+    def ntotal(self) -> int:
+        return sum(s.index.ntotal for s in self.segments)
+
+    def search(self, q: np.ndarray, top_k: int, rows: np.ndarray | None = None) -> List[Tuple[float, int]]:
+        """Top ``top_k`` (score, row) among live rows, restricted to ``rows`` if given."""
+        k = top_k if self.exact is None else top_k * self.rerank
+        live, bitmap = self.live, self.bitmap
+        if rows is not None:
+            # Candidates are pruned inside FAISS by the same bitmap selector as deletes
+            allowed = np.zeros(live.size, dtype=bool)
+            allowed[rows[rows < live.size]] = True
+            live = live & allowed
+            if not live.any():
+                return []
+            bitmap = np.packbits(live, bitorder="little")
+        params = None
+        if bitmap is not None:
+            # The selector points into bitmap, which outlives the searches below
+            params = faiss.SearchParametersIVF(sel=faiss.IDSelectorBitmap(live.size, faiss.swig_ptr(bitmap)), nprobe=1)
+        hits: List[Tuple[float, int]] = []
+        for seg in self.segments:
+            if not seg.index.ntotal:
+                continue
+            scores, ids = seg.index.search(q, min(k, seg.index.ntotal), params=params)
+            hits.extend((float(s), int(i)) for s, i in zip(scores[0], ids[0]) if i >= 0)
+        if self.exact is not None and hits:
+            rows = np.array([i for _, i in hits], dtype="int64")
+            hits = list(zip((self.exact[rows] @ q[0]).tolist(), rows.tolist()))
+        hits.sort(key=lambda h: -h[0])
+        return hits[:top_k]
 
 
 class FaissStore:
-    def __init__(self, index_path: str | None = None):
+    """Cosine-similarity FAISS index over chunk store rows.
+
+    Writers never touch what readers see: each add goes into a new segment, deletes
+    clear a private live bitmap, and ``publish`` swaps in an immutable ``FaissView``.
+    Small trailing segments are merged as they reach the size of their predecessor,
+    and ``compact`` drops dead vectors (``snapshot`` runs it in the background once
+    they exceed ``COMPACTION_DEAD_RATIO``). Both build the merged segment off to the
+    side. Saved segments are memory-mapped read-only, so worker processes share them.
+
+    Segments are stored with ``VECTOR_CODEC``. For compressed codecs every vector is
+    also appended to ``<index_path>.f32`` at its row, which serves re-ranking and
+    re-encoding on merge, so codes are never decoded into other codes.
+    """
+
+    def __init__(self, index_path: str | None = None, chunks: ChunkStore | None = None, codec: str | None = None,
+                 embeddings: Any = None):
         self.index_path = index_path or config.FAISS_INDEX_PATH
-        self.embeddings = OpenAIEmbeddings(model=config.EMBEDDING_MODEL, api_key=config.OPENAI_API_KEY)
-        self.index: faiss.IndexFlatIP | None = None
-        self.metadata: List[Dict] = []
-        if os.path.exists(self.index_path) and os.path.exists(self.index_path + ".meta.npy"):
-            self._load()
-
-    def _save(self):
-        if self.index is None:
-            return
-        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        faiss.write_index(self.index, self.index_path)
-        np.save(self.index_path + ".meta.npy", np.array(self.metadata, dtype=object), allow_pickle=True)
-
-    def _load(self):
-        self.index = faiss.read_index(self.index_path)
-        self.metadata = list(np.load(self.index_path + ".meta.npy", allow_pickle=True))
-
-    def add(self, chunks: List[Dict]):
-        texts = [c["text"] for c in chunks]
-        vectors = self.embeddings.embed_documents(texts)
-        vecs = np.array(vectors).astype("float32")
+        self.chunks = chunks or chunk_store
+        self.marker = self.chunks.marker
+        self.codec = codec or config.VECTOR_CODEC
+        if self.codec not in CODECS:
+            raise ValueError(f"Unknown VECTOR_CODEC {self.codec!r}, expected one of {CODECS}")
+        self.exact_path = self.index_path + ".f32"
+        self.embeddings = embeddings or embedding_providers.create()
+        self.lock = threading.RLock()
+        self._segments: List[Segment] = []
+        self._live = np.zeros(0, dtype=bool)
+        self._seq = 0
+        self._generation = 0
+        self._dim = 0
+        with self.marker.locked():
+            if self._has_saved() and self._load():
+                # Rewritten segments: other processes must reload
+                self.marker.bump()
+        self.publish(save=False)
+
+    # Persistence: one file per segment plus a JSON list of the current ones, which
+    # is replaced last so a crash mid-save leaves the previous generation loadable.
+    # Segment files are never modified, so they are mapped rather than read.
+
+    def _manifest_path(self) -> str:
+        return self.index_path + ".json"
+
+    def _segment_path(self, name: str) -> str:
+        return f"{self.index_path}.{name}"
+
+    def _has_saved(self) -> bool:
+        return os.path.exists(self._manifest_path()) or os.path.exists(self.index_path)
+
+    def _save(self, view: FaissView):
+        index_dir = os.path.dirname(self.index_path) or "."
+        os.makedirs(index_dir, exist_ok=True)
+        names = [seg.name for seg in view.segments]
+        written = set()
+        for seg in view.segments:
+            path = self._segment_path(seg.name)
+            if not os.path.exists(path):
+                faiss.write_index(seg.index, path + ".tmp")
+                os.replace(path + ".tmp", path)
+                written.add(seg.name)
+        # The writer maps what it wrote as well, instead of keeping a private copy
+        self._segments = [Segment(seg.name, faiss.read_index(self._segment_path(seg.name), _READ_FLAGS))
+                          if seg.name in written else seg for seg in self._segments]
+        with open(self._manifest_path() + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"generation": view.generation, "codec": self.codec, "segments": names}, f)
+        os.replace(self._manifest_path() + ".tmp", self._manifest_path())
+        # Segments merged away, and the single-file layout this one replaces
+        prefix = os.path.basename(self.index_path) + ".seg"
+        for fn in os.listdir(index_dir):
+            if fn.startswith(prefix) and fn[len(prefix) - 3:] not in names:
+                os.remove(os.path.join(index_dir, fn))
+        for legacy in (self.index_path, self.index_path + ".ids.npy", self.index_path + ".meta.npy"):
+            if os.path.exists(legacy):
+                os.remove(legacy)
+
+    def _load(self, convert: bool = True) -> bool:
+        """Open the saved segments, keeping those open already, and derive the live set.
+        With ``convert``, older segment formats and a changed VECTOR_CODEC are rewritten;
+        returns whether that happened."""
+        codec = "flat"
+        opened = {seg.name: seg for seg in self._segments}
+        legacy = False
+        if os.path.exists(self._manifest_path()):
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            self._generation = max(self._generation, saved.get("generation", 0))
+            codec = saved.get("codec", "flat")
+            segments = []
+            for name in saved["segments"]:
+                seg = opened.get(name)
+                if seg is None:
+                    index = faiss.read_index(self._segment_path(name), _READ_FLAGS)
+                    legacy |= not isinstance(index, faiss.IndexIVF)
+                    seg = Segment(name, index)
+                segments.append(seg)
+            self._segments = segments
+            self._seq = max([self._seq] + [int(s.name[3:]) + 1 for s in self._segments])
+        else:
+            self._segments = [Segment("legacy", faiss.read_index(self.index_path))]
+            legacy = True
+        self._dim = self._segments[0].index.d if self._segments else 0
+        if legacy and convert:
+            self._segments = [self._upgrade(seg) if not isinstance(seg.index, faiss.IndexIVF) else seg
+                              for seg in self._segments]
+        # Live = stored here and not deleted in the chunk store
+        stored = [self._ids(seg) for seg in self._segments]
+        size = max([self.chunks.next_row] + [int(ids.max()) + 1 for ids in stored if ids.size])
+        in_index = np.zeros(size, dtype=bool)
+        for ids in stored:
+            in_index[ids] = True
+        self._live = np.zeros(size, dtype=bool)
+        self._live[self.chunks.live_rows()] = True
+        self._live &= in_index
+        if not convert:
+            return False
+        if codec != self.codec:
+            self._recode()
+        elif legacy:
+            self.publish()
+        return codec != self.codec or legacy
+
+    def _ids(self, seg: Segment) -> np.ndarray:
+        if isinstance(seg.index, faiss.IndexIDMap2):
+            return faiss.vector_to_array(seg.index.id_map)
+        if not isinstance(seg.index, faiss.IndexIVF):
+            return np.arange(seg.index.ntotal, dtype="int64")
+        return seg.ids()
+
+    def _upgrade(self, seg: Segment) -> Segment:
+        """A segment in the current format for one saved before segments were IVF
+        (IndexIDMap2 over a flat or compressed index, or a bare flat index whose
+        positions are the rows)."""
+        ids = self._ids(seg)
+        base = faiss.downcast_index(seg.index.index) if isinstance(seg.index, faiss.IndexIDMap2) else seg.index
+        if isinstance(base, faiss.IndexFlat):
+            return self._segment(new_index(base.reconstruct_n(0, base.ntotal), ids, "flat"))
+        exact = self._exact()
+        if exact is not None and ids.size and int(ids.max()) < len(exact):
+            vectors = np.asarray(exact[ids])
+        else:
+            vectors = base.reconstruct_n(0, base.ntotal)
+        return self._segment(new_index(vectors, ids, self.codec))
+
+    def refresh(self, publish: bool = True):
+        """Catch up with what other processes saved (see ``index_marker``)."""
+        with self.lock:
+            if self._has_saved():
+                self._load(convert=False)
+            if publish:
+                self.publish(save=False)
+
+    def _recode(self):
+        """Re-encode everything with ``self.codec`` after VECTOR_CODEC changed."""
+        if self.codec != "flat":
+            # Flat segments are exact; seed the float32 copy from them
+            for seg in self._segments:
+                if seg.exact:
+                    self._write_exact(*self._vectors(seg))
+        if self._segments:
+            self._segments = [self._merge(self._segments)]
+        self.publish()
+        if self.codec == "flat" and os.path.exists(self.exact_path):
+            os.remove(self.exact_path)
+
+    def _write_exact(self, rows: np.ndarray, vectors: np.ndarray):
+        row_bytes = vectors.shape[1] * 4
+        with open(self.exact_path, "r+b" if os.path.exists(self.exact_path) else "wb") as f:
+            if rows.size and np.all(np.diff(rows) == 1):
+                f.seek(int(rows[0]) * row_bytes)
+                f.write(np.ascontiguousarray(vectors, dtype="float32").tobytes())
+            else:
+                for row, vec in zip(rows.tolist(), vectors):
+                    f.seek(row * row_bytes)
+                    f.write(np.ascontiguousarray(vec, dtype="float32").tobytes())
+
+    def _exact(self) -> np.ndarray | None:
+        if not self._dim or not os.path.exists(self.exact_path):
+            return None
+        n = os.path.getsize(self.exact_path) // (self._dim * 4)
+        return np.memmap(self.exact_path, dtype="float32", mode="r", shape=(n, self._dim)) if n else None
+
+    def _vectors(self, seg: Segment) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids, float32 vectors) of a segment: decoded if flat, else from the exact copy."""
+        ids = seg.ids()
+        if seg.exact:
+            return ids, seg.vectors()
+        return ids, np.asarray(self._exact()[ids])
+
+    def _segment(self, index: faiss.IndexIVF) -> Segment:
+        seg = Segment(f"seg{self._seq:06d}", index)
+        self._seq += 1
+        return seg
+
+    def build_view(self) -> FaissView:
+        """Freeze everything written so far into the next generation (not yet visible)."""
+        with self.lock:
+            live = self._live.copy()
+            live_count = int(live.sum())
+            ntotal = sum(s.index.ntotal for s in self._segments)
+            bitmap = np.packbits(live, bitorder="little") if live_count < ntotal else None
+            exact = self._exact() if self.codec != "flat" else None
+            self._generation += 1
+            return FaissView(self._generation, tuple(self._segments), live, live_count, bitmap,
+                             exact, config.VECTOR_RERANK_FACTOR)
+
+    def publish(self, view: FaissView | None = None, save: bool = True) -> FaissView:
+        """Make ``view`` (default: everything written so far) the generation new readers get."""
+        with self.lock:
+            self.view = view or self.build_view()
+            if save:
+                self._save(self.view)
+            return self.view
+
+    def save(self):
+        with self.lock:
+            self._save(self.view)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vecs = np.array(self.embeddings.embed_documents(texts)).astype("float32")
         # Normalize for cosine similarity using inner product
         faiss.normalize_L2(vecs)
-        if self.index is None:
-            self.index = faiss.IndexFlatIP(vecs.shape[1])
-        self.index.add(vecs)
-        self.metadata.extend(chunks)
-        self._save()
-
-    def search(self, query: str, top_k: int) -> List[Dict]:
-        if self.index is None:
-            if os.path.exists(self.index_path) and os.path.exists(self.index_path + ".meta.npy"):
-                self._load()
-        if self.index is None or self.index.ntotal == 0:
-            return []
-        q = np.array([self.embeddings.embed_query(query)], dtype="float32")
-        faiss.normalize_L2(q)
-        scores, ids = self.index.search(q, top_k)
-        results: List[Dict] = []
-        for score, idx in zip(scores[0], ids[0]):
-            if idx == -1:
+        return vecs
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray, publish: bool = True):
+        with self.lock:
+            if self._segments and vectors.shape[1] != self._dim:
+                raise ValueError(f"{vectors.shape[1]}-dimensional vectors for an index of {self._dim}: "
+                                 "was EMBEDDING_MODEL changed since it was built?")
+            self._dim = vectors.shape[1]
+            if self.codec != "flat":
+                self._write_exact(rows, vectors)
+            self._segments.append(self._segment(new_index(vectors, rows, self.codec)))
+            size = int(rows.max()) + 1
+            if size > self._live.size:
+                self._live = np.concatenate([self._live, np.zeros(size - self._live.size, dtype=bool)])
+            self._live[rows] = True
+            # Binary-counter merging keeps O(log n) segments; each vector is copied O(log n) times
+            while len(self._segments) > 1 and self._segments[-1].index.ntotal >= self._segments[-2].index.ntotal:
+                merged = self._merge(self._segments[-2:])
+                self._segments[-2:] = [merged] if merged.index.ntotal else []
+            if publish:
+                self.publish()
+
+    def _merge(self, segments: List[Segment]) -> Segment:
+        ids, vecs = [np.zeros(0, dtype="int64")], [np.zeros((0, segments[0].index.d), dtype="float32")]
+        for seg in segments:
+            if not seg.index.ntotal:
                 continue
-            meta = self.metadata[idx]
-            results.append({
-                **meta,
-                "score": float(score),
-                "retrieval": "vector"
-            })
-        return results
+            stored, vectors = self._vectors(seg)
+            keep = self._live[stored]
+            ids.append(stored[keep])
+            vecs.append(vectors[keep])
+        return self._segment(new_index(np.concatenate(vecs), np.concatenate(ids), self.codec))
+
+    def remove_rows(self, rows: List[int], publish: bool = True) -> int:
+        with self.lock:
+            rows = [r for r in rows if r < self._live.size and self._live[r]]
+            if not rows:
+                return 0
+            # Tombstone only: vectors stay in their segments until merged or compacted
+            self._live[rows] = False
+            if publish:
+                self.publish()
+        return len(rows)
+
+    def dead_ratio(self) -> float:
+        ntotal = sum(s.index.ntotal for s in self._segments)
+        if ntotal == 0:
+            return 0.0
+        return 1.0 - int(self._live.sum()) / ntotal
+
+    def compact(self, publish: bool = True) -> int:
+        """Merge every segment into one without the dead vectors."""
+        with self.lock:
+            ntotal = sum(s.index.ntotal for s in self._segments)
+            dead = ntotal - int(self._live.sum())
+            if not dead:
+                return 0
+            merged = self._merge(self._segments)
+            self._segments = [merged] if merged.index.ntotal else []
+            if publish:
+                self.publish()
+            return dead
+
+    def search_vectors(self, vectors: np.ndarray, top_k: int, view: FaissView | None = None,
+                       rows: np.ndarray | None = None, filters: Dict | None = None) -> List[Hits]:
+        """(score, row) hits per normalized query vector. Filters arrive resolved as ``rows``."""
+        view = view or self.view
+        if not view.live_count:
+            return [[] for _ in vectors]
+        return [view.search(q[None, :], top_k, rows) for q in vectors]
+
+    def search(self, query: str, top_k: int, view: FaissView | None = None,
+               rows: np.ndarray | None = None, filters: Dict | None = None) -> List[Dict]:
+        return self.search_batch([query], top_k, view, rows, filters)[0]
+
+    def search_batch(self, queries: List[str], top_k: int, view: FaissView | None = None,
+                     rows: np.ndarray | None = None, filters: Dict | None = None) -> List[List[Dict]]:
+        view = view or self.view
+        if not view.live_count:
+            return [[] for _ in queries]
+        if len(queries) == 1:
+            q = np.array([self.embeddings.embed_query(queries[0])], dtype="float32")
+        else:
+            q = np.array(self.embeddings.embed_documents(queries), dtype="float32")
+        faiss.normalize_L2(q)
+        # Text and metadata are read only for the final top-k
+        return hydrate(self.chunks, self.search_vectors(q, top_k, view, rows))
 
+    def stats(self) -> Dict:
+        view = self.view
+        return {
+            "backend": "faiss",
+            "codec": self.codec,
+            "generation": view.generation,
+            "segments": len(view.segments),
+            "vectors": view.ntotal,
+            "live": view.live_count,
+            "dead_ratio": round(self.dead_ratio(), 4),
+        }
 
-store = FaissStore()
+    def memory_bytes(self) -> int:
+        # Codes and ids of every segment (each search scans them all) plus the bitmap;
+        # the float32 copy is read only at re-ranked rows
+        view = self.view
+        return sum(s.index.ntotal * (s.index.code_size + 8) for s in view.segments) + view.live.nbytes
@@ -0,0 +1,204 @@
+from typing import List, Dict
+from dataclasses import dataclass
+import os
+import re
+import json
+import sqlite3
+import threading
+import weakref
+import numpy as np
+from ...config import config
+from .chunk_store import store as chunk_store, ChunkStore
+
+# Contentless: the text stays in the chunk store, the index holds postings only.
+# "removed" keeps rows dropped from search but still in the postings, with their
+# text, which FTS5 needs to delete them.
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(text, content='', tokenize='unicode61');
+CREATE TABLE IF NOT EXISTS removed (
+    row INTEGER PRIMARY KEY,
+    gen INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+"""
+
+_TOKEN = re.compile(r"\w+")
+
+
+# eq=False: identity hashing, so published views can sit in a WeakSet
+@dataclass(frozen=True, eq=False)
+class FtsView:
+    """A published generation: rows below ``n_rows`` not removed at or before ``generation``."""
+    generation: int
+    n_rows: int
+    live_count: int
+
+
+def match_expression(query: str) -> str:
+    """The query's words as an FTS5 OR query; any document with one of them matches, as in BM25."""
+    terms = dict.fromkeys(t.lower() for t in _TOKEN.findall(query))
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+class FtsStore:
+    """BM25 keyword search with an SQLite FTS5 index on disk.
+
+    Postings live in the database and go through SQLite's page cache, so memory
+    does not grow with the corpus and opening the index reads nothing up front.
+    Rows are chunk store rows, used as FTS5 rowids. A view sees rows below its
+    ``n_rows`` (rows only grow), minus those removed by its generation; removed
+    rows leave the postings when compaction runs and no view in use still sees
+    them. Ranking is FTS5's ``bm25()`` (k1=1.2, b=0.75) over ``unicode61`` tokens:
+    lowercased words without punctuation, where ``BM25Store`` splits on whitespace.
+    """
+
+    def __init__(self, path: str | None = None, chunks: ChunkStore | None = None):
+        self.path = path or config.FTS_INDEX_PATH
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.chunks = chunks or chunk_store
+        self.marker = self.chunks.marker
+        self._local = threading.local()
+        self.lock = threading.RLock()
+        self._views: "weakref.WeakSet[FtsView]" = weakref.WeakSet()
+        self._generation = 0
+        with self.marker.locked():
+            with self._conn() as conn:
+                conn.executescript(_SCHEMA)
+            self._count()
+            # Rows the chunk store got after the last indexed batch (e.g. a crash in between)
+            added, batch = 0, []
+            for row, text in self.chunks.iter_texts(self._n_rows):
+                batch.append((row, text))
+                if len(batch) >= 1000:
+                    self._insert(batch)
+                    added, batch = added + len(batch), []
+            self._insert(batch)
+            added += len(batch)
+            # Rows deleted from the chunk store while still indexed here
+            if added + self.remove_rows(self.chunks.deleted_rows(), publish=False):
+                self.marker.bump()
+        self.publish()
+
+    def _count(self):
+        conn = self._conn()
+        indexed, last = conn.execute("SELECT count(*), max(id) FROM fts_docsize").fetchone()
+        self._dead, gen = conn.execute("SELECT count(*), max(gen) FROM removed").fetchone()
+        self._live_count = indexed - self._dead
+        self._n_rows = last + 1 if last is not None else 0
+        # Removals by this or another process stay hidden from every later generation
+        self._generation = max(self._generation, gen or 0)
+
+    def refresh(self, publish: bool = True):
+        """Catch up with rows other processes added or removed."""
+        with self.lock:
+            self._count()
+            if publish:
+                self.publish()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, rows: List[tuple]):
+        if not rows:
+            return
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT INTO fts (rowid, text) VALUES (?, ?)", rows)
+        self._live_count += len(rows)
+        self._n_rows = max(self._n_rows, max(r for r, _ in rows) + 1)
+
+    def build_view(self) -> FtsView:
+        """Freeze everything written so far into the next generation (not yet visible)."""
+        with self.lock:
+            self._generation += 1
+            return FtsView(self._generation, self._n_rows, self._live_count)
+
+    def publish(self, view: FtsView | None = None) -> FtsView:
+        with self.lock:
+            self.view = view or self.build_view()
+            self._views.add(self.view)
+            return self.view
+
+    def add(self, rows: np.ndarray, texts: List[str], publish: bool = True):
+        with self.lock:
+            self._insert(list(zip(rows.tolist(), texts)))
+            if publish:
+                self.publish()
+
+    def remove_rows(self, rows: List[int], publish: bool = True) -> int:
+        with self.lock:
+            # Rows never indexed here are skipped, and rows removed already are ignored
+            texts = [(r, self._generation + 1, t) for r, t in self.chunks.texts(rows).items() if r < self._n_rows]
+            conn = self._conn()
+            with conn:
+                removed = conn.executemany("INSERT OR IGNORE INTO removed (row, gen, text) VALUES (?, ?, ?)", texts).rowcount
+            if not removed:
+                return 0
+            self._live_count -= removed
+            self._dead += removed
+            if publish:
+                self.publish()
+        return removed
+
+    def dead_ratio(self) -> float:
+        total = self._live_count + self._dead
+        return self._dead / total if total else 0.0
+
+    def compact(self, publish: bool = True) -> int:
+        """Delete removed rows no view in use still sees from the postings. Views do
+        not change, so there is nothing to publish."""
+        with self.lock:
+            oldest = min([v.generation for v in list(self._views)] + [self.view.generation])
+            conn = self._conn()
+            with conn:
+                rows = conn.execute("SELECT row, text FROM removed WHERE gen <= ?", (oldest,)).fetchall()
+                conn.executemany("INSERT INTO fts (fts, rowid, text) VALUES ('delete', ?, ?)", rows)
+                conn.executemany("DELETE FROM removed WHERE row = ?", [(r,) for r, _ in rows])
+            self._dead -= len(rows)
+            return len(rows)
+
+    def search(self, query: str, top_k: int, view: FtsView | None = None, rows: np.ndarray | None = None) -> List[Dict]:
+        """Top ``top_k`` chunks, restricted to chunk store ``rows`` if given."""
+        view = view or self.view
+        expression = match_expression(query)
+        if not view.live_count or not expression:
+            return []
+        sql = ("SELECT rowid, rank FROM fts WHERE fts MATCH ? AND rowid < ?"
+               " AND rowid NOT IN (SELECT row FROM removed WHERE gen <= ?)")
+        params = [expression, view.n_rows, view.generation]
+        if rows is not None:
+            sql += " AND rowid IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(rows.tolist()))
+        hits = self._conn().execute(sql + " ORDER BY rank LIMIT ?", params + [top_k]).fetchall()
+        # Text and metadata are read only for the final top-k
+        chunks = self.chunks.get(r for r, _ in hits)
+        results: List[Dict] = []
+        for row, rank in hits:
+            chunk = chunks.get(row)
+            if chunk is None:
+                continue
+            # bm25() is negated so that lower is better
+            chunk["score"] = -rank
+            chunk["retrieval"] = "keyword"
+            results.append(chunk)
+        return results
+
+    def stats(self) -> Dict:
+        view = self.view
+        return {
+            "backend": "fts5",
+            "generation": view.generation,
+            "live": view.live_count,
+            "dead_ratio": round(self.dead_ratio(), 4),
+            "bytes": os.path.getsize(self.path),
+        }
+
+    def memory_bytes(self) -> int:
+        # Postings stay in SQLite, whose page cache is bounded by its own cache_size
+        return 0
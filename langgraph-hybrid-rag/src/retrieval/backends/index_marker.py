@@ -0,0 +1,65 @@
+from typing import Iterator
+from contextlib import contextmanager
+import os
+import threading
+from ...config import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single worker
+    fcntl = None
+
+
+class GenerationMarker:
+    """The generation of the indexes on disk, shared by every process that opens them.
+
+    A process writes the indexes only while holding ``locked()`` and bumps the
+    generation before releasing it; other processes see the new value and reload.
+    The lock is an ``flock`` on ``<path>.lock``, re-entrant within a process.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or config.INDEX_GENERATION_PATH
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = -1
+        # Whatever stores load after this was read is at least this generation
+        self.at_import = self.read()
+
+    def read(self) -> int:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def write(self, generation: int):
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(str(generation))
+        os.replace(self.path + ".tmp", self.path)
+
+    def bump(self) -> int:
+        generation = self.read() + 1
+        self.write(generation)
+        return generation
+
+    @contextmanager
+    def locked(self, shared: bool = False) -> Iterator[None]:
+        with self._lock:
+            if not self._depth:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    # Closing the descriptor releases the flock
+                    os.close(self._fd)
+                    self._fd = -1
+
+
+marker = GenerationMarker()
@@ -0,0 +1,36 @@
+from typing import Any, List, Dict, Protocol
+import threading
+import numpy as np
+
+
+class KeywordStore(Protocol):
+    """What indexing, snapshots and /query use of a keyword backend (``KEYWORD_BACKEND``).
+
+    Rows are chunk store rows. As with ``VectorStore``, writes are staged with
+    ``publish=False`` under ``lock`` and become visible with the view passed to
+    ``publish``; a view keeps returning what it returned when it was built.
+    """
+    lock: threading.RLock
+    view: Any
+
+    def add(self, rows: np.ndarray, texts: List[str], publish: bool = True): ...
+
+    def remove_rows(self, rows: List[int], publish: bool = True) -> int: ...
+
+    def build_view(self) -> Any: ...
+
+    def publish(self, view: Any = None) -> Any: ...
+
+    def refresh(self, publish: bool = True): ...
+
+    def dead_ratio(self) -> float: ...
+
+    def compact(self, publish: bool = True) -> int: ...
+
+    def search(self, query: str, top_k: int, view: Any = None, rows: np.ndarray | None = None) -> List[Dict]: ...
+
+    def stats(self) -> Dict: ...
+
+    def memory_bytes(self) -> int:
+        """Rough size of what searching the published view keeps in memory, mapped or not."""
+        ...
@@ -0,0 +1,21 @@
+import os
+from ...config import config
+from .chunk_store import ChunkStore
+from .keyword_backend import KeywordStore
+from .index_marker import marker
+from .lazy import Lazy
+
+
+def create(chunks: ChunkStore | None = None, directory: str | None = None) -> KeywordStore:
+    """A store of the configured backend over ``chunks``, under ``directory`` if given."""
+    if config.KEYWORD_BACKEND == "bm25":
+        from .bm25_store import BM25Store
+        return BM25Store(os.path.join(directory, "bm25") if directory else None, chunks)
+    elif config.KEYWORD_BACKEND == "fts5":
+        from .fts_store import FtsStore
+        return FtsStore(os.path.join(directory, "keyword.fts.sqlite3") if directory else None, chunks)
+    raise ValueError(f"Unknown KEYWORD_BACKEND {config.KEYWORD_BACKEND!r}, expected bm25 or fts5")
+
+
+# Imported and loaded on first use, so importing the API loads no index
+store = Lazy(create, marker.locked)
@@ -0,0 +1,39 @@
+from typing import Any, Callable, ContextManager
+import threading
+
+
+class Lazy:
+    """A module-level singleton built on first use instead of at import.
+
+    Attribute access is forwarded to the object, which ``factory`` builds the first
+    time under ``guard()``. Stores pass ``marker.locked``: they take it while they
+    load anyway, so a thread building one holds the locks in the same order as a
+    writer and the two cannot deadlock. A failed build is retried on the next access.
+    """
+
+    def __init__(self, factory: Callable[[], Any], guard: Callable[[], ContextManager] | None = None):
+        lock = threading.RLock()
+        self._lazy_factory = factory
+        self._lazy_guard = guard or (lambda: lock)
+        self._lazy_obj = None
+
+    def __getattr__(self, name: str):
+        return getattr(resolve(self), name)
+
+    def __repr__(self) -> str:
+        return f"Lazy({self._lazy_obj!r})" if self._lazy_obj is not None else f"Lazy({self._lazy_factory!r}, unbuilt)"
+
+
+def resolve(obj: Any) -> Any:
+    """The object behind ``obj``, built now if it is a ``Lazy`` not used yet."""
+    if not isinstance(obj, Lazy):
+        return obj
+    if obj._lazy_obj is None:
+        with obj._lazy_guard():
+            if obj._lazy_obj is None:
+                obj._lazy_obj = obj._lazy_factory()
+    return obj._lazy_obj
+
+
+def is_loaded(obj: Any) -> bool:
+    return not isinstance(obj, Lazy) or obj._lazy_obj is not None
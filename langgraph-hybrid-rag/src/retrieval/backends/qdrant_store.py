@@ -0,0 +1,230 @@
+from typing import Any, List, Dict
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import weakref
+import numpy as np
+from qdrant_client import QdrantClient, models
+from ...config import config
+from ..entities import chunk_tags
+from ..filters import tag_values
+from .chunk_store import store as chunk_store, ChunkStore
+from .vector_backend import Hits, hydrate
+from . import embeddings as embedding_providers
+
+# "deleted" of a live point
+_LIVE = 2 ** 62
+
+
+# eq=False: identity hashing, so published views can sit in a WeakSet
+@dataclass(frozen=True, eq=False)
+class QdrantView:
+    """A published generation: points with ``gen <= generation < deleted``."""
+    generation: int
+    live_count: int
+
+    def condition(self) -> List[models.Condition]:
+        return [models.FieldCondition(key="gen", range=models.Range(lte=self.generation)),
+                models.FieldCondition(key="deleted", range=models.Range(gt=self.generation))]
+
+
+def _client(location: str) -> QdrantClient:
+    """A server URL, ``:memory:`` or a directory for the embedded (in-process) mode."""
+    if location.startswith(("http://", "https://")):
+        return QdrantClient(url=location, api_key=config.QDRANT_API_KEY or None)
+    if location == ":memory:":
+        return QdrantClient(location=location)
+    return QdrantClient(path=location)
+
+
+class QdrantStore:
+    """Vector search in a Qdrant collection, one point per chunk store row.
+
+    Qdrant applies writes immediately, so generations are kept in the payload: a
+    staged point carries the next generation in ``gen`` and a removed one gets it in
+    ``deleted``; each view searches ``gen <= generation < deleted``. ``compact``
+    deletes removed points for good once no published view in use sees them. The
+    payload also holds ``document_id``, ``source_doc`` and the chunk's filter tags,
+    so ``/query`` filters run inside Qdrant.
+    """
+
+    def __init__(self, location: str | None = None, collection: str | None = None, chunks: ChunkStore | None = None,
+                 embeddings: Any = None):
+        self.location = location or config.QDRANT_URL
+        self.collection = collection or config.QDRANT_COLLECTION
+        self.chunks = chunks or chunk_store
+        self.client = _client(self.location)
+        self.remote = self.location.startswith(("http://", "https://"))
+        # The embedded mode is not safe for concurrent calls
+        self.workers = config.QDRANT_UPSERT_WORKERS if self.remote else 1
+        self.embeddings = embeddings or embedding_providers.create()
+        self.lock = threading.RLock()
+        self._views: "weakref.WeakSet[QdrantView]" = weakref.WeakSet()
+        # Generations must exceed those of earlier processes; a microsecond clock does
+        self._generation = time.time_ns() // 1000
+        self._live_count = self._dead = 0
+        self._recount()
+        self.publish()
+
+    def _recount(self):
+        if self.client.collection_exists(self.collection):
+            self._live_count = self._count(live=True)
+            self._dead = self._count(live=False)
+
+    def refresh(self, publish: bool = True):
+        """Catch up with points other processes wrote."""
+        with self.lock:
+            self._recount()
+            # Their generations come from the same clock: move past anything written so far
+            self._generation = max(self._generation, time.time_ns() // 1000)
+            if publish:
+                self.publish()
+
+    def _count(self, live: bool) -> int:
+        deleted = models.Range(gte=_LIVE) if live else models.Range(lt=_LIVE)
+        flt = models.Filter(must=[models.FieldCondition(key="deleted", range=deleted)])
+        return self.client.count(self.collection, count_filter=flt, exact=True).count
+
+    def _ensure_collection(self, dim: int):
+        if self.client.collection_exists(self.collection):
+            return
+        self.client.create_collection(self.collection, vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE))
+        if not self.remote:
+            # The embedded mode scans payloads and has no payload indexes
+            return
+        for field, schema in (("gen", models.PayloadSchemaType.INTEGER), ("deleted", models.PayloadSchemaType.INTEGER),
+                              ("document_id", models.PayloadSchemaType.KEYWORD), ("source_doc", models.PayloadSchemaType.KEYWORD),
+                              ("tags", models.PayloadSchemaType.KEYWORD)):
+            self.client.create_payload_index(self.collection, field, schema)
+
+    def build_view(self) -> QdrantView:
+        """Freeze everything written so far into the next generation (not yet visible)."""
+        with self.lock:
+            self._generation += 1
+            return QdrantView(self._generation, self._live_count)
+
+    def publish(self, view: QdrantView | None = None, save: bool = True) -> QdrantView:
+        with self.lock:
+            self.view = view or self.build_view()
+            self._views.add(self.view)
+            return self.view
+
+    def save(self):
+        # Qdrant persists every write itself
+        pass
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vecs = np.array(self.embeddings.embed_documents(texts), dtype="float32")
+        return vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+
+    def _upsert(self, points: List[models.PointStruct]):
+        batches = [points[i:i + config.QDRANT_BATCH_SIZE] for i in range(0, len(points), config.QDRANT_BATCH_SIZE)]
+        if self.workers <= 1 or len(batches) <= 1:
+            for batch in batches:
+                self.client.upsert(self.collection, batch, wait=True)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(lambda batch: self.client.upsert(self.collection, batch, wait=True), batches))
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray, publish: bool = True):
+        with self.lock:
+            self._ensure_collection(vectors.shape[1])
+            gen = self._generation + 1
+            chunks = self.chunks.get(rows.tolist())
+            points = []
+            for row, vec in zip(rows.tolist(), vectors):
+                chunk = chunks.get(row, {})
+                points.append(models.PointStruct(id=row, vector=vec.tolist(), payload={
+                    "gen": gen,
+                    "deleted": _LIVE,
+                    "document_id": chunk.get("document_id"),
+                    "source_doc": chunk.get("source_doc"),
+                    "tags": chunk_tags(chunk),
+                }))
+            self._upsert(points)
+            self._live_count += len(points)
+            if publish:
+                self.publish()
+
+    def remove_rows(self, rows: List[int], publish: bool = True) -> int:
+        with self.lock:
+            if not rows or not self.client.collection_exists(self.collection):
+                return 0
+            # Only points live in the latest state count as removed
+            found = self.client.retrieve(self.collection, ids=[int(r) for r in rows], with_payload=["deleted"])
+            rows = [p.id for p in found if p.payload.get("deleted") == _LIVE]
+            if not rows:
+                return 0
+            self.client.set_payload(self.collection, payload={"deleted": self._generation + 1}, points=rows, wait=True)
+            self._live_count -= len(rows)
+            self._dead += len(rows)
+            if publish:
+                self.publish()
+        return len(rows)
+
+    def dead_ratio(self) -> float:
+        total = self._live_count + self._dead
+        return self._dead / total if total else 0.0
+
+    def compact(self, publish: bool = True) -> int:
+        """Delete removed points no view in use still sees. Views do not change, so
+        there is nothing to publish."""
+        with self.lock:
+            dead = self._dead
+            if not dead:
+                return 0
+            # Keep points that an older view held by a reader still returns
+            oldest = min([v.generation for v in list(self._views)] + [self.view.generation])
+            flt = models.Filter(must=[models.FieldCondition(key="deleted", range=models.Range(lte=oldest))])
+            self.client.delete(self.collection, points_selector=models.FilterSelector(filter=flt), wait=True)
+            self._dead = self._count(live=False)
+            return dead - self._dead
+
+    def _filter(self, view: QdrantView, rows: np.ndarray | None, filters: Dict | None) -> models.Filter:
+        must = view.condition()
+        for field in ("document_id", "source_doc"):
+            if (filters or {}).get(field):
+                must.append(models.FieldCondition(key=field, match=models.MatchAny(any=list(filters[field]))))
+        for field in ("entity", "year"):
+            if (filters or {}).get(field):
+                must.append(models.FieldCondition(key="tags", match=models.MatchAny(any=tag_values(field, filters[field]))))
+        if rows is not None and not filters:
+            must.append(models.HasIdCondition(has_id=rows.tolist()))
+        return models.Filter(must=must)
+
+    def search_vectors(self, vectors: np.ndarray, top_k: int, view: QdrantView | None = None,
+                       rows: np.ndarray | None = None, filters: Dict | None = None) -> List[Hits]:
+        """(score, row) hits per query vector; ``filters`` run as payload conditions."""
+        view = view or self.view
+        if not view.live_count or not self.client.collection_exists(self.collection):
+            return [[] for _ in vectors]
+        flt = self._filter(view, rows, filters)
+        responses = self.client.query_batch_points(self.collection, requests=[
+            models.QueryRequest(query=q.tolist(), filter=flt, limit=top_k) for q in vectors])
+        return [[(float(p.score), int(p.id)) for p in r.points] for r in responses]
+
+    def search(self, query: str, top_k: int, view: QdrantView | None = None,
+               rows: np.ndarray | None = None, filters: Dict | None = None) -> List[Dict]:
+        return self.search_batch([query], top_k, view, rows, filters)[0]
+
+    def search_batch(self, queries: List[str], top_k: int, view: QdrantView | None = None,
+                     rows: np.ndarray | None = None, filters: Dict | None = None) -> List[List[Dict]]:
+        view = view or self.view
+        if not view.live_count:
+            return [[] for _ in queries]
+        return hydrate(self.chunks, self.search_vectors(self.embed(queries), top_k, view, rows, filters))
+
+    def stats(self) -> Dict:
+        view = self.view
+        return {
+            "backend": "qdrant",
+            "collection": self.collection,
+            "generation": view.generation,
+            "live": view.live_count,
+            "dead_ratio": round(self.dead_ratio(), 4),
+        }
+
+    def memory_bytes(self) -> int:
+        # Vectors live in the Qdrant server (or its embedded storage), not in this process
+        return 0
@@ -0,0 +1,67 @@
+from typing import Any, List, Dict, Tuple, Protocol
+import threading
+import numpy as np
+from .chunk_store import ChunkStore
+
+# (score, chunk store row), best first
+Hits = List[Tuple[float, int]]
+
+
+class VectorStore(Protocol):
+    """What indexing, snapshots and /query use of a vector backend (``VECTOR_BACKEND``).
+
+    Ids are chunk store rows. Writes are staged with ``publish=False`` under ``lock``
+    and become visible to readers only with the view passed to ``publish``; a view
+    keeps returning what it returned when it was built.
+    """
+    lock: threading.RLock
+    view: Any
+
+    def embed(self, texts: List[str]) -> np.ndarray: ...
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray, publish: bool = True): ...
+
+    def remove_rows(self, rows: List[int], publish: bool = True) -> int: ...
+
+    def build_view(self) -> Any: ...
+
+    def publish(self, view: Any = None, save: bool = True) -> Any: ...
+
+    def save(self): ...
+
+    def refresh(self, publish: bool = True): ...
+
+    def dead_ratio(self) -> float: ...
+
+    def compact(self, publish: bool = True) -> int: ...
+
+    def search_vectors(self, vectors: np.ndarray, top_k: int, view: Any = None,
+                       rows: np.ndarray | None = None, filters: Dict | None = None) -> List[Hits]: ...
+
+    def search(self, query: str, top_k: int, view: Any = None,
+               rows: np.ndarray | None = None, filters: Dict | None = None) -> List[Dict]: ...
+
+    def search_batch(self, queries: List[str], top_k: int, view: Any = None,
+                     rows: np.ndarray | None = None, filters: Dict | None = None) -> List[List[Dict]]: ...
+
+    def stats(self) -> Dict: ...
+
+    def memory_bytes(self) -> int:
+        """Rough size of what searching the published view keeps in memory, mapped or not."""
+        ...
+
+
+def hydrate(chunks: ChunkStore, results: List[Hits]) -> List[List[Dict]]:
+    """Chunks for the hits of several queries, read in one chunk store lookup."""
+    found = chunks.get({row for hits in results for _, row in hits})
+    out: List[List[Dict]] = []
+    for hits in results:
+        batch: List[Dict] = []
+        for score, row in hits:
+            chunk = found.get(row)
+            if chunk is None:
+                continue
+            # Copy: two queries may share a chunk
+            batch.append({**chunk, "score": score, "retrieval": "vector"})
+        out.append(batch)
+    return out
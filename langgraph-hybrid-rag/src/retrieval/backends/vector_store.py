@@ -0,0 +1,23 @@
+import os
+from ...config import config
+from .chunk_store import ChunkStore
+from .vector_backend import VectorStore
+from .index_marker import marker
+from .lazy import Lazy
+
+
+def create(chunks: ChunkStore | None = None, directory: str | None = None, name: str | None = None) -> VectorStore:
+    """A store of the configured backend over ``chunks``. Collection ``name`` keeps its
+    data under ``directory``; without them the configured paths are used."""
+    # Only the configured backend is imported, so the other's dependencies are optional
+    if config.VECTOR_BACKEND == "faiss":
+        from .faiss_store import FaissStore
+        return FaissStore(os.path.join(directory, "vector.faiss") if directory else None, chunks)
+    elif config.VECTOR_BACKEND == "qdrant":
+        from .qdrant_store import QdrantStore
+        return QdrantStore(collection=f"{config.QDRANT_COLLECTION}_{name}" if name else None, chunks=chunks)
+    raise ValueError(f"Unknown VECTOR_BACKEND {config.VECTOR_BACKEND!r}, expected faiss or qdrant")
+
+
+# Imported and loaded on first use, so importing the API loads no index
+store = Lazy(create, marker.locked)
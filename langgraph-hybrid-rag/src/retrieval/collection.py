@@ -0,0 +1,208 @@
+from typing import Any, Dict, Iterator, List
+from collections import OrderedDict
+from contextlib import contextmanager
+import os
+import re
+import threading
+from ..config import config
+from ..telemetry import log_step
+from .backends.index_marker import GenerationMarker
+from .backends.chunk_store import ChunkStore, store as chunk_store
+from .backends import vector_store, keyword_store
+from .backends.lazy import is_loaded
+from . import snapshot
+from .snapshot import Snapshots
+
+DEFAULT = "default"
+# Collection names become directory (and Qdrant collection) names
+_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+
+def valid_name(name: str | None) -> bool:
+    return name is None or bool(_NAME.fullmatch(name))
+
+
+def current_version(name: str) -> str | None:
+    """The snapshot ``python -m src.ingestion.builder`` last published for ``name``, if any."""
+    try:
+        with open(os.path.join(config.COLLECTIONS_DIR, name, "CURRENT"), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(name: str, version: str | None = None) -> str:
+    root = os.path.join(config.COLLECTIONS_DIR, name)
+    return os.path.join(root, "versions", version) if version else root
+
+
+def set_current_version(name: str, version: str):
+    """Point ``name`` at a built snapshot. The rename is atomic: every process opens either
+    the previous snapshot or this one, and switches on its next use of the collection."""
+    path = os.path.join(config.COLLECTIONS_DIR, name, "CURRENT")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+class Collection:
+    """A corpus searched on its own: a chunk store, its vector and keyword indexes and
+    their generation marker. Named collections keep all of it in
+    ``<COLLECTIONS_DIR>/<name>/``, or in ``versions/<version>/`` below it once the
+    offline builder has published one; the default one uses the configured paths."""
+
+    def __init__(self, name: str, chunks: Any, vector: Any, keyword: Any, snapshots: Snapshots, manifest_path: str,
+                 version: str | None = None):
+        self.name = name
+        self.version = version
+        self.chunks, self.vector, self.keyword = chunks, vector, keyword
+        self.snapshots = snapshots
+        # /init's record of the source files indexed into this collection
+        self.manifest_path = manifest_path
+
+    @classmethod
+    def open(cls, name: str, version: str | None = None, directory: str | None = None) -> "Collection":
+        """Open ``name`` at ``version`` (unversioned: files directly in its directory), or
+        at ``directory`` for a snapshot still being built there."""
+        directory = directory or version_dir(name, version)
+        os.makedirs(directory, exist_ok=True)
+        marker = GenerationMarker(os.path.join(directory, "generation"))
+        chunks = ChunkStore(os.path.join(directory, "chunks.sqlite3"), marker)
+        # Each snapshot has its own Qdrant collection too, so a build never touches the served one
+        vector = vector_store.create(chunks, directory, f"{name}_{version}" if version else name)
+        keyword = keyword_store.create(chunks, directory)
+        return cls(name, chunks, vector, keyword, Snapshots(chunks, vector, keyword, marker),
+                   os.path.join(directory, "manifest.json"), version)
+
+    @property
+    def loaded(self) -> bool:
+        return is_loaded(self.vector) and is_loaded(self.keyword)
+
+    def memory_bytes(self) -> int:
+        return self.vector.memory_bytes() + self.keyword.memory_bytes() if self.loaded else 0
+
+    def close(self):
+        self.snapshots.close()
+
+
+class Collections:
+    """The collections this process has open.
+
+    Named collections open on first use. Once their estimated memory exceeds
+    ``COLLECTION_MEMORY_MB``, or more than ``MAX_OPEN_COLLECTIONS`` are open, the
+    least recently used are closed; collections in use (``using``) are not, so the
+    budget can be exceeded while they are. Closing only drops this process's handles:
+    requests holding a snapshot finish on it, and the next use opens the files again.
+    """
+
+    def __init__(self):
+        self.default = Collection(DEFAULT, chunk_store, vector_store.store, keyword_store.store,
+                                  snapshot.default, config.MANIFEST_PATH)
+        self._open: "OrderedDict[str, Collection]" = OrderedDict()
+        self._in_use: Dict[str, int] = {}
+        self._opening: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def exists(self, name: str | None) -> bool:
+        return not name or name == DEFAULT or (valid_name(name) and os.path.isdir(os.path.join(config.COLLECTIONS_DIR, name)))
+
+    def names(self) -> List[str]:
+        root = config.COLLECTIONS_DIR
+        named = sorted(n for n in os.listdir(root) if n != DEFAULT and valid_name(n)
+                       and os.path.isdir(os.path.join(root, n))) if os.path.isdir(root) else []
+        return [DEFAULT] + named
+
+    @contextmanager
+    def using(self, name: str | None = None, create: bool = False) -> Iterator[Collection]:
+        """Collection ``name`` (the default one if None), kept open until the block exits.
+        Unknown names raise KeyError unless ``create``."""
+        if not name or name == DEFAULT:
+            yield self.default
+            return
+        if not valid_name(name):
+            raise ValueError(f"Invalid collection name {name!r}")
+        collection = self._acquire(name, create)
+        try:
+            yield collection
+        finally:
+            with self._lock:
+                self._in_use[name] -= 1
+                if not self._in_use[name]:
+                    del self._in_use[name]
+            self._evict()
+
+    def _use(self, name: str, version: str | None) -> Collection | None:
+        # Needs self._lock
+        collection = self._open.get(name)
+        if collection is not None and collection.version != version:
+            # The builder published a new snapshot: requests holding this one finish on it
+            del self._open[name]
+            collection.close()
+            collection = None
+        if collection is not None:
+            self._open.move_to_end(name)
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+        return collection
+
+    def _acquire(self, name: str, create: bool) -> Collection:
+        version = current_version(name)
+        with self._lock:
+            collection = self._use(name, version)
+            if collection is not None:
+                return collection
+            opening = self._opening.setdefault(name, threading.Lock())
+        # One thread opens a collection; others asking for it meanwhile wait for it
+        with opening:
+            with self._lock:
+                collection = self._use(name, version)
+            if collection is None:
+                if not create and not self.exists(name):
+                    raise KeyError(name)
+                with log_step("collection_open", collection=name, version=version) as fields:
+                    opened = Collection.open(name, version)
+                    fields["memory_mb"] = round(opened.memory_bytes() / 2**20, 1)
+                with self._lock:
+                    self._open[name] = opened
+                    collection = self._use(name, version)
+        self._evict()
+        return collection
+
+    def _evict(self):
+        budget = config.COLLECTION_MEMORY_MB * 2**20
+        closed = []
+        with self._lock:
+            sizes = {name: c.memory_bytes() for name, c in self._open.items()}
+            total = sum(sizes.values())
+            # Least recently used first
+            for name in list(self._open):
+                if not (budget and total > budget) and len(self._open) <= config.MAX_OPEN_COLLECTIONS:
+                    break
+                if name in self._in_use:
+                    continue
+                closed.append(self._open.pop(name))
+                total -= sizes[name]
+        for collection in closed:
+            with log_step("collection_close", collection=collection.name,
+                          memory_mb=round(sizes[collection.name] / 2**20, 1), open_mb=round(total / 2**20, 1)):
+                collection.close()
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            opened, in_use = dict(self._open), dict(self._in_use)
+        out = []
+        for name in self.names():
+            collection = self.default if name == DEFAULT else opened.get(name)
+            loaded = collection is not None and collection.loaded
+            out.append({
+                "name": name,
+                "version": None if name == DEFAULT else current_version(name),
+                "loaded": loaded,
+                "in_use": in_use.get(name, 0),
+                "memory_mb": round(collection.memory_bytes() / 2**20, 1) if loaded else 0.0,
+            })
+        return out
+
+
+registry = Collections()
@@ -0,0 +1,135 @@
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+from dataclasses import dataclass, field
+import re
+import zlib
+import numpy as np
+from ..config import config
+
+# MinHash signatures of word 3-gram sets, banded for LSH: two chunks become
+# candidates when all hashes of one band agree (99% of pairs at a Jaccard of 0.7)
+SHINGLE = 3
+NUM_HASHES = 64
+BANDS = 16
+_WORD = re.compile(r"\w+")
+# Chunks that differ in a number state different facts, however alike the rest
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_P = np.uint64(0x100000001B3)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_SEEDS = np.random.default_rng(0x5EED).integers(0, 2**63, size=NUM_HASHES, dtype=np.uint64)
+_BAND_SALT = np.arange(1, BANDS + 1, dtype=np.uint64) * np.uint64(0xD6E8FEB86659FD93)
+
+
+def shingles(text: str) -> np.ndarray:
+    """Sorted hashes of the lowercase word 3-grams of ``text``; empty below three words."""
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE:
+        return np.zeros(0, dtype=np.uint64)
+    h = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+    with np.errstate(over="ignore"):
+        return np.unique(h[:-2] * _P * _P + h[1:-1] * _P + h[2:])
+
+
+def numbers(text: str) -> Tuple[str, ...]:
+    return tuple(sorted(_NUMBER.findall(text)))
+
+
+def _mixed(values: np.ndarray) -> np.ndarray:
+    with np.errstate(over="ignore"):
+        x = values * _MIX
+        return x ^ (x >> np.uint64(29))
+
+
+def band_keys(shingle_sets: List[np.ndarray]) -> np.ndarray:
+    """(n, BANDS) LSH keys: each band's MinHash values hashed into one signed 63-bit key.
+    Rows of texts without shingles are 0."""
+    keys = np.zeros((len(shingle_sets), BANDS), dtype=np.int64)
+    sized = [i for i, s in enumerate(shingle_sets) if s.size]
+    if not sized:
+        return keys
+    lengths = np.array([shingle_sets[i].size for i in sized])
+    flat = np.concatenate([shingle_sets[i] for i in sized])
+    # One hash function per column, all shingles of the batch at once
+    hashed = _mixed(flat[:, None] ^ _SEEDS[None, :])
+    signatures = np.minimum.reduceat(hashed, np.concatenate([[0], np.cumsum(lengths)[:-1]]), axis=0)
+    with np.errstate(over="ignore"):
+        bands = signatures.reshape(len(sized), BANDS, NUM_HASHES // BANDS)
+        folded = _mixed(bands[:, :, 0] ^ _BAND_SALT)
+        for j in range(1, NUM_HASHES // BANDS):
+            folded = _mixed(folded ^ bands[:, :, j])
+    keys[sized] = (folded >> np.uint64(1)).astype(np.int64)
+    return keys
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    union = np.union1d(a, b).size
+    return np.intersect1d(a, b, assume_unique=True).size / union if union else 0.0
+
+
+@dataclass
+class Duplicates:
+    """What an ingest batch duplicates. ``keys`` are the LSH keys of every chunk of the
+    batch; ``of_rows`` maps positions to the indexed row they duplicate and
+    ``of_positions`` to an earlier position of the same batch."""
+    keys: np.ndarray
+    of_rows: Dict[int, int] = field(default_factory=dict)
+    of_positions: Dict[int, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.of_rows) + len(self.of_positions)
+
+    def unique(self, n: int) -> List[int]:
+        """Positions of the chunks to embed and index."""
+        return [i for i in range(n) if i not in self.of_rows and i not in self.of_positions]
+
+
+def find(texts: List[str], candidates: Callable[[Set[int]], Iterable[Tuple[int, int, str]]] | None = None,
+         threshold: float | None = None) -> Duplicates:
+    """Near-duplicates among ``texts`` and of already indexed chunks.
+
+    ``candidates(keys)`` returns (key, row, text) of indexed chunks sharing an LSH key.
+    A chunk duplicates one whose word 3-gram Jaccard similarity is at least
+    ``threshold`` (``DEDUP_THRESHOLD``) and whose numbers are the same; it then takes
+    the lowest such row, or else the first such earlier chunk of the batch."""
+    threshold = config.DEDUP_THRESHOLD if threshold is None else threshold
+    sets = [shingles(t) for t in texts]
+    found = Duplicates(band_keys(sets))
+    if not threshold:
+        return found
+    nums = [numbers(t) for t in texts]
+    by_key: Dict[int, List[int]] = {}
+    if candidates is not None:
+        wanted = {int(k) for k in found.keys[found.keys != 0]}
+        texts_by_row: Dict[int, str] = {}
+        for key, row, text in (candidates(wanted) if wanted else []):
+            by_key.setdefault(key, []).append(row)
+            texts_by_row[row] = text
+        # Shingled on first comparison only: most candidates already differ in their numbers
+        stored: Dict[int, Tuple[Tuple[str, ...], np.ndarray | None]] = {}
+        for i, s in enumerate(sets):
+            rows = sorted({r for k in found.keys[i] if k for r in by_key.get(int(k), ())})
+            for row in rows:
+                if row not in stored:
+                    stored[row] = (numbers(texts_by_row[row]), None)
+                row_numbers, row_set = stored[row]
+                if row_numbers != nums[i]:
+                    continue
+                if row_set is None:
+                    row_set = shingles(texts_by_row[row])
+                    stored[row] = (row_numbers, row_set)
+                if jaccard(s, row_set) >= threshold:
+                    found.of_rows[i] = row
+                    break
+    # Within the batch: against earlier chunks that are indexed themselves
+    earlier: Dict[int, List[int]] = {}
+    for i, s in enumerate(sets):
+        if not s.size or i in found.of_rows:
+            continue
+        keys = [int(k) for k in found.keys[i]]
+        for j in sorted({j for k in keys for j in earlier.get(k, ())}):
+            if nums[j] == nums[i] and jaccard(s, sets[j]) >= threshold:
+                found.of_positions[i] = j
+                break
+        else:
+            for k in keys:
+                earlier.setdefault(k, []).append(i)
+    return found
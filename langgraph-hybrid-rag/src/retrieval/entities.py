@@ -0,0 +1,84 @@
+from typing import List, Dict
+import re
+
+# Canonical company name -> names and tickers it appears under in filings and questions
+ENTITY_ALIASES: Dict[str, List[str]] = {
+    "amazon": ["Amazon.com, Inc.", "AMAZON COM INC", "AMZN"],
+    "apple": ["Apple Inc.", "AAPL"],
+    "google": ["Alphabet Inc.", "GOOGL", "GOOG"],
+    "alphabet": ["Alphabet Inc.", "GOOGL", "GOOG"],
+    "facebook": ["Meta Platforms, Inc.", "META"],
+    "meta": ["Meta Platforms, Inc.", "META"],
+    "microsoft": ["Microsoft Corporation", "MSFT"],
+    "tesla": ["Tesla, Inc.", "TSLA"],
+    "pfizer": ["PFIZER INC", "PFE"],
+    "nvidia": ["NVIDIA CORP", "NVDA"],
+    "visa": ["Visa Inc.", "V"],
+    "mastercard": ["Mastercard Incorporated", "MA"],
+    "broadcom": ["Broadcom Inc.", "AVGO"],
+    "exxon": ["Exxon Mobil Corporation", "XOM"],
+    "jpmorgan": ["JPMorgan Chase & Co.", "JPM"],
+    "berkshire": ["Berkshire Hathaway Inc.", "BRK.B", "BRK-B"],
+}
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z\.&'-]+")
+_LETTERS = re.compile(r"[a-z]+")
+_NAME_WORD = re.compile(r"[a-z0-9]+")
+# Legal-form words that filings append to company names ("HOME DEPOT, INC.")
+_LEGAL_FORMS = {"inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "plc", "llc"}
+_YEAR = re.compile(r"(?<!\d)(?:19[89]\d|20[0-4]\d)(?!\d)")
+# alias -> canonical names; one- and two-letter tickers (V, MA) match too much prose
+_ALIAS_NAMES: Dict[str, List[str]] = {}
+for _name, _aliases in ENTITY_ALIASES.items():
+    for _alias in _aliases:
+        if len(_alias) > 2:
+            _ALIAS_NAMES.setdefault(_alias, []).append(_name)
+# Case-sensitive and letter-bounded, longest alias first
+_ALIAS = re.compile("(?<![A-Za-z])(?:" + "|".join(re.escape(a) for a in sorted(_ALIAS_NAMES, key=len, reverse=True)) + ")(?![A-Za-z])")
+
+
+def word_tokens(text: str) -> set:
+    return set(t.lower() for t in _WORD.findall(text))
+
+
+def detect_entities(text: str) -> List[str]:
+    """Canonical names of the companies ``text`` mentions, by name (also inside file
+    names such as ``apple_10k.pdf``) or by a long alias or ticker."""
+    found = set(_LETTERS.findall(text.lower())).intersection(ENTITY_ALIASES)
+    for alias in set(_ALIAS.findall(text)):
+        found.update(_ALIAS_NAMES[alias])
+    return [name for name in ENTITY_ALIASES if name in found]
+
+
+def normalize_entity(name: str) -> str:
+    """Company name without case, punctuation, trailing legal form or EDGAR suffix
+    ("/NEW", "/DE/"): "HOME DEPOT, INC." and "Home Depot" both become "home depot"."""
+    words = _NAME_WORD.findall(name.split("/")[0].lower())
+    while len(words) > 1 and words[-1] in _LEGAL_FORMS:
+        words.pop()
+    return " ".join(words)
+
+
+def canonical_entity(value: str) -> str:
+    """Map a filter value or entity name such as "AAPL", "Apple Inc." or
+    "HOME DEPOT, INC." to its canonical name."""
+    found = detect_entities(value)
+    return found[0] if found else normalize_entity(value)
+
+
+def detect_years(text: str) -> List[int]:
+    return sorted({int(y) for y in _YEAR.findall(text)})
+
+
+def chunk_tags(chunk: Dict) -> List[str]:
+    """Filterable tags of a chunk: ``entity:<name>`` for its ``entity`` (see
+    ``canonical_entity``) and each company it or its source names (``entity:`` if
+    none) and ``year:<yyyy>`` for each year in its text."""
+    text = chunk.get("text", "")
+    context = "\n".join(str(chunk.get(k) or "") for k in ("entity", "source_doc")) + "\n" + text
+    entities = detect_entities(context)
+    # Companies outside ENTITY_ALIASES are still known by the name their filing gives
+    entity = canonical_entity(str(chunk.get("entity") or ""))
+    if entity and entity not in entities:
+        entities.append(entity)
+    return [f"entity:{e}" for e in entities or [""]] + [f"year:{y}" for y in detect_years(text)]
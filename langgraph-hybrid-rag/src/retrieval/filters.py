@@ -0,0 +1,49 @@
+from typing import List, Dict
+import numpy as np
+from .backends.chunk_store import ChunkStore, store as chunk_store
+from .entities import canonical_entity, detect_entities
+
+FILTER_FIELDS = ("document_id", "source_doc", "entity", "year")
+
+
+def tag_values(field: str, values: List) -> List[str]:
+    """Chunk tags (``entities.chunk_tags``) an entity or year filter matches."""
+    if field == "entity":
+        values = [canonical_entity(v) if v else "" for v in values]
+    return [f"{field}:{v}" for v in values]
+
+
+def _field_rows(field: str, values: List, chunks: ChunkStore) -> np.ndarray:
+    if field == "document_id":
+        rows = chunks.rows_for_documents(values)
+    elif field == "source_doc":
+        rows = chunks.rows_for_documents([d for v in values for d in chunks.documents_for_source(v)])
+    else:
+        rows = np.concatenate([chunks.tag_rows(tag) for tag in tag_values(field, values)])
+    return np.unique(np.asarray(rows, dtype="int64"))
+
+
+def resolve(filters: Dict[str, List] | None, chunks: ChunkStore | None = None) -> np.ndarray | None:
+    """Rows of ``chunks`` (default: the default collection's) matching every given
+    field (any of its values), or None when nothing is filtered. An entity value of
+    "" matches chunks that name no company. Deleted rows may be included; each
+    search intersects with its own live set."""
+    rows = None
+    for field in FILTER_FIELDS:
+        values = (filters or {}).get(field)
+        if not values:
+            continue
+        match = _field_rows(field, values, chunks or chunk_store)
+        rows = match if rows is None else np.intersect1d(rows, match, assume_unique=True)
+    return rows
+
+
+def route(question: str, filters: Dict[str, List] | None) -> Dict[str, List]:
+    """Add an entity filter for the companies ``question`` names, unless the caller
+    filtered on entity already. Chunks that name no company stay searchable."""
+    filters = dict(filters or {})
+    if not filters.get("entity"):
+        entities = detect_entities(question)
+        if entities:
+            filters["entity"] = entities + [""]
+    return filters
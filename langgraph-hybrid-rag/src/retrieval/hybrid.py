@@ -0,0 +1,87 @@
+from typing import Dict, Iterator, List
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import time
+from ..config import config
+from . import filters as search_filters
+from .collection import Collection, registry
+from .entities import ENTITY_ALIASES, word_tokens
+from .merger import candidate_depth, merge_results
+from .text_search import keyword_search
+from .vector_search import vector_search
+
+
+@dataclass
+class Retrieval:
+    vector_chunks: List[Dict]
+    keyword_chunks: List[Dict]
+    merged_chunks: List[Dict]
+    # The filters applied, entity routing included
+    filters: Dict[str, List] = field(default_factory=dict)
+
+
+@contextmanager
+def _timed(timings: Dict[str, float] | None, stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    yield
+    if timings is not None:
+        timings[stage] = time.perf_counter() - start
+
+
+def augment_query(question: str) -> str:
+    """``question`` plus the names and tickers of the companies it mentions, to improve recall."""
+    tokens = word_tokens(question)
+    extra: list[str] = []
+    for k, vals in ENTITY_ALIASES.items():
+        if k in tokens:
+            extra.extend(vals)
+    # Add metric hints when comparison is requested
+    if any(w in tokens for w in {"compare", "vs", "versus"}):
+        extra.extend(["EarningsPerShareDiluted", "NetIncomeLoss", "Revenues", "2023"])
+    if not extra:
+        return question
+    return question + " " + " ".join(extra)
+
+
+def retrieve(question: str, top_k: int, filters: Dict[str, List] | None = None,
+             collection: Collection | None = None, timings: Dict[str, float] | None = None) -> Retrieval:
+    """The hybrid retrieval of /query: filters and entity routing, both searches over
+    one snapshot, and fusion of their rankings into ``top_k`` chunks. ``timings``
+    receives the seconds spent in each stage."""
+    collection = collection or registry.default
+    effective_question = augment_query(question)
+    filters = dict(filters or {})
+    with _timed(timings, "filter"):
+        # Filters become one candidate row set that both indexes prune by
+        rows = search_filters.resolve(filters, collection.chunks)
+        if config.ENTITY_ROUTING:
+            routed = search_filters.route(question, filters)
+            routed_rows = search_filters.resolve(routed, collection.chunks) if routed != filters else rows
+            # Routing narrows the search only when it leaves something to search
+            if routed_rows is not None and routed_rows.size:
+                filters, rows = routed, routed_rows
+        # A chunk matching only through its near-duplicates is searched as their representative;
+        # payload filters would miss it, so the vector backend takes the rows instead
+        vector_filters = filters or None
+        if rows is not None:
+            indexed = collection.chunks.representatives(rows)
+            if indexed is not rows:
+                rows, vector_filters = indexed, None
+    # Fusion needs more candidates from each retriever than it keeps
+    depth = candidate_depth(top_k)
+    # Both searches read the same published generation, whatever ingestion does meanwhile
+    snap = collection.snapshots.current()
+    with _timed(timings, "vector"):
+        vector_chunks = vector_search(effective_question, top_k=max(config.VECTOR_TOP_K, depth), snapshot=snap,
+                                      rows=rows, filters=vector_filters, collection=collection)
+    with _timed(timings, "keyword"):
+        keyword_chunks = keyword_search(effective_question, top_k=max(config.KEYWORD_TOP_K, depth), snapshot=snap,
+                                        rows=rows, collection=collection)
+    with _timed(timings, "fusion"):
+        merged_chunks = merge_results(vector_chunks, keyword_chunks, top_k=top_k)
+        # Chunks indexed once for many near-duplicates point back at the others
+        duplicates = collection.chunks.duplicates_of(ch["chunk_id"] for ch in merged_chunks)
+        if duplicates:
+            merged_chunks = [{**ch, "duplicates": duplicates[ch["chunk_id"]]} if ch["chunk_id"] in duplicates else ch
+                             for ch in merged_chunks]
+    return Retrieval(vector_chunks, keyword_chunks, merged_chunks, filters)
@@ -1,27 +1,63 @@
-from typing import List, Dict
+from typing import List, Dict, Sequence
+import math
+import numpy as np
+from ..config import config
 
+FUSIONS = ("rrf", "minmax", "zscore", "weighted")
 
-def merge_results(vector_chunks: List[Dict], keyword_chunks: List[Dict], top_k: int) -> List[Dict]:
-    merged: Dict[str, Dict] = {}
 
-    def add_with_score(chunk: Dict, weight: float):
-        key = chunk["chunk_id"]
-        if key not in merged:
-            merged[key] = {**chunk}
-            merged[key]["combined_score"] = 0.0
-        merged[key]["combined_score"] += weight * float(chunk.get("score", 0.0))
-
-    for ch in vector_chunks:
-        add_with_score(ch, weight=0.5)
-    for ch in keyword_chunks:
-        add_with_score(ch, weight=0.5)
-
-    sorted_chunks = sorted(merged.values(), key=lambda c: c.get("combined_score", 0.0), reverse=True)
-    # Normalize to fused_score in [0,1]
-    if sorted_chunks:
-        max_s = max(c.get("combined_score", 0.0) for c in sorted_chunks) or 1.0
-        min_s = min(c.get("combined_score", 0.0) for c in sorted_chunks)
-        rng = max(1e-9, (max_s - min_s))
-        for c in sorted_chunks:
-            c["fused_score"] = float((c.get("combined_score", 0.0) - min_s) / rng)
-    return sorted_chunks[:top_k]
+def candidate_depth(top_k: int) -> int:
+    """Candidates to take from each retriever for ``top_k`` fused results."""
+    return max(1, math.ceil(top_k * config.FUSION_CANDIDATE_FACTOR))
+
+
+def _contributions(method: str, scores: np.ndarray) -> np.ndarray:
+    """One retriever's scores, best first, on the scale ``method`` fuses them at."""
+    if method == "rrf":
+        return 1.0 / (config.RRF_K + np.arange(1, scores.size + 1))
+    if method == "minmax":
+        span = scores.max() - scores.min()
+        return (scores - scores.min()) / span if span > 0 else np.ones_like(scores)
+    if method == "zscore":
+        std = scores.std()
+        return (scores - scores.mean()) / std if std > 0 else np.zeros_like(scores)
+    if method == "weighted":
+        # Raw scores: cosine similarity and BM25 are on different scales
+        return scores
+    raise ValueError(f"Unknown FUSION {method!r}, expected one of {FUSIONS}")
+
+
+def merge_results(vector_chunks: List[Dict], keyword_chunks: List[Dict], top_k: int,
+                  method: str | None = None, weights: Sequence[float] | None = None) -> List[Dict]:
+    """Fuse the ranked lists of both retrievers into the ``top_k`` best chunks.
+
+    ``rrf`` sums ``weight / (RRF_K + rank)``; ``minmax`` and ``zscore`` normalize each
+    retriever's scores before the weighted sum; ``weighted`` adds raw scores. A chunk
+    one retriever did not return counts as that retriever's lowest score (0 for
+    ``rrf``, ``minmax`` and ``weighted``). ``combined_score`` is the fused score and
+    ``fused_score`` the same rescaled to [0, 1] over all candidates."""
+    method = method or config.FUSION
+    weights = weights or (config.FUSION_VECTOR_WEIGHT, config.FUSION_KEYWORD_WEIGHT)
+    merged: Dict[str, Dict] = {}
+    for chunks in (vector_chunks, keyword_chunks):
+        for ch in chunks:
+            merged.setdefault(ch["chunk_id"], ch)
+    if not merged:
+        return []
+    position = {chunk_id: i for i, chunk_id in enumerate(merged)}
+    fused = np.zeros(len(merged))
+    for weight, chunks in zip(weights, (vector_chunks, keyword_chunks)):
+        if not chunks:
+            continue
+        # Retrievers return their chunks best first
+        at = np.fromiter((position[ch["chunk_id"]] for ch in chunks), dtype=np.intp, count=len(chunks))
+        scores = np.fromiter((float(ch.get("score") or 0.0) for ch in chunks), dtype="float64", count=len(chunks))
+        contrib = _contributions(method, scores)
+        column = np.full(len(merged), min(0.0, contrib.min()))
+        column[at] = contrib
+        fused += weight * column
+    order = np.argsort(-fused, kind="stable")[:top_k]
+    low, span = fused.min(), fused.max() - fused.min()
+    chunks = list(merged.values())
+    return [{**chunks[i], "combined_score": float(fused[i]),
+             "fused_score": float((fused[i] - low) / span) if span > 0 else 1.0} for i in order]
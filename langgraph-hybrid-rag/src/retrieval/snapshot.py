@@ -0,0 +1,151 @@
+from typing import Any, Iterator
+from dataclasses import dataclass
+from contextlib import contextmanager
+import threading
+import weakref
+from ..config import config
+from ..telemetry import log_step
+from .backends.index_marker import GenerationMarker, marker
+from .backends.lazy import resolve
+from .backends.chunk_store import store as chunk_store
+from .backends.vector_store import store as vector_store
+from .backends.keyword_store import store as keyword_store
+
+
+# eq=False: identity hashing, so held snapshots can sit in a WeakSet
+@dataclass(frozen=True, eq=False)
+class Snapshot:
+    vector: Any  # the vector backend's view, e.g. FaissView
+    keyword: Any  # the keyword backend's view, e.g. BM25View
+    epoch: int
+
+
+class Snapshots:
+    """Published (vector, keyword) snapshots of one collection's stores, and the
+    writes that produce them. Epochs are generations of the collection's indexes on
+    disk (``marker``), the same in every process."""
+
+    def __init__(self, chunks: Any, vector: Any, keyword: Any, marker: GenerationMarker):
+        self.chunks, self.vector, self.keyword, self.marker = chunks, vector, keyword, marker
+        # Guards the pair of pointer swaps in _publish() and the pair of reads in current()
+        self._publish_lock = threading.Lock()
+        self._epoch = marker.at_import
+        self._held: "weakref.WeakSet[Snapshot]" = weakref.WeakSet()
+        self._watcher: threading.Thread | None = None
+        self._closed = threading.Event()
+        self._compacting = False
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def current(self) -> Snapshot:
+        """The latest published (vector, keyword) pair. Hold it for a whole request:
+        later writes never change what it returns, and chunks it can still return are
+        not purged from the chunk store until it is released."""
+        # Load the stores on first use outside _publish_lock: loading takes the marker lock
+        resolve(self.vector), resolve(self.keyword)
+        self._watch()
+        with self._publish_lock:
+            snap = Snapshot(self.vector.view, self.keyword.view, self._epoch)
+            self._held.add(snap)
+            return snap
+
+    def oldest_epoch(self) -> int:
+        """Smallest epoch any reader of this process may still be using."""
+        with self._publish_lock:
+            return min([s.epoch for s in self._held] + [self._epoch])
+
+    def _publish(self, epoch: int):
+        vector, keyword = self.vector.build_view(), self.keyword.build_view()
+        with self._publish_lock:
+            self.vector.publish(vector, save=False)
+            self.keyword.publish(keyword)
+            self._epoch = epoch
+
+    def _catch_up(self, generation: int):
+        """Load what other processes wrote up to ``generation``; needs the marker lock and
+        both store locks."""
+        self.chunks.refresh()
+        self.vector.refresh(publish=False)
+        self.keyword.refresh(publish=False)
+        self._publish(generation)
+
+    def reload(self) -> bool:
+        """Swap to the generation on disk if another process wrote since this one last
+        published. Queries in flight keep the snapshot they hold."""
+        if self.marker.read() == self._epoch:
+            return False
+        with self.marker.locked(shared=True), self.vector.lock, self.keyword.lock:
+            generation = self.marker.read()
+            if generation == self._epoch:
+                return False
+            self._catch_up(generation)
+            return True
+
+    def _watch_loop(self):
+        while not self._closed.wait(config.INDEX_RELOAD_INTERVAL):
+            if self.marker.read() == self._epoch:
+                continue
+            with log_step("index_reload", path=self.marker.path, from_epoch=self._epoch) as fields:
+                try:
+                    self.reload()
+                except Exception as e:
+                    # Keep serving the current generation; the next poll retries
+                    fields["error"] = str(e)
+                fields["epoch"] = self._epoch
+
+    def _watch(self):
+        if self._watcher is None and config.INDEX_RELOAD_INTERVAL > 0:
+            with self._publish_lock:
+                if self._watcher is None and not self._closed.is_set():
+                    self._watcher = threading.Thread(target=self._watch_loop, name="index-reload", daemon=True)
+                    self._watcher.start()
+
+    def close(self):
+        """Stop watching for other processes' writes. Snapshots still held keep working."""
+        self._closed.set()
+
+    @contextmanager
+    def writing(self) -> Iterator[int]:
+        """Serialize a write across both stores and all processes, and yield the epoch it
+        will publish as. Stage changes with ``publish=False`` inside the block; the next
+        generations are built on exit and published together, so readers see all of the
+        write or none. Other processes pick the write up through the generation marker."""
+        with self.marker.locked(), self.vector.lock, self.keyword.lock:
+            generation = self.marker.read()
+            if generation != self._epoch:
+                # Build on what other processes wrote, not on this process's older state
+                self._catch_up(generation)
+            epoch = generation + 1
+            yield epoch
+            self._publish(epoch)
+            self.vector.save()
+            self.marker.write(epoch)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        stores = (self.vector, self.keyword)
+        with self._publish_lock:
+            if self._compacting or all(s.dead_ratio() < config.COMPACTION_DEAD_RATIO for s in stores):
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact, daemon=True).start()
+
+    def _compact(self):
+        """Drop dead entries from the stores past ``COMPACTION_DEAD_RATIO``, as one write."""
+        try:
+            with log_step("index_compaction", path=self.marker.path) as fields, self.writing():
+                for name, store in (("vector", self.vector), ("keyword", self.keyword)):
+                    if store.dead_ratio() >= config.COMPACTION_DEAD_RATIO:
+                        fields[name] = store.compact(publish=False)
+        finally:
+            self._compacting = False
+
+
+# The default collection, at the configured index paths
+default = Snapshots(chunk_store, vector_store, keyword_store, marker)
+current = default.current
+oldest_epoch = default.oldest_epoch
+reload = default.reload
+writing = default.writing
@@ -1,8 +1,12 @@
 from typing import List, Dict
-from .backends.bm25_store import store as bm25_store
+import numpy as np
+from .collection import Collection, registry
+from .snapshot import Snapshot
 from ..config import config
 
 
-def keyword_search(query: str, top_k: int | None = None) -> List[Dict]:
+def keyword_search(query: str, top_k: int | None = None, snapshot: Snapshot | None = None,
+                   rows: np.ndarray | None = None, collection: Collection | None = None) -> List[Dict]:
+    collection = collection or registry.default
     k = top_k or config.KEYWORD_TOP_K
-    return bm25_store.search(query, k)
+    return collection.keyword.search(query, k, view=(snapshot or collection.snapshots.current()).keyword, rows=rows)
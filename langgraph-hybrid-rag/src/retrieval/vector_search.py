@@ -1,8 +1,15 @@
 from typing import List, Dict
-from .backends.faiss_store import store as faiss_store
+import numpy as np
+from .collection import Collection, registry
+from .snapshot import Snapshot
 from ..config import config
 
 
-def vector_search(query: str, top_k: int | None = None) -> List[Dict]:
+def vector_search(query: str, top_k: int | None = None, snapshot: Snapshot | None = None,
+                  rows: np.ndarray | None = None, filters: Dict | None = None,
+                  collection: Collection | None = None) -> List[Dict]:
+    """``filters`` is also passed as resolved ``rows``; backends use whichever they can apply."""
+    collection = collection or registry.default
     k = top_k or config.VECTOR_TOP_K
-    return faiss_store.search(query, k)
+    view = (snapshot or collection.snapshots.current()).vector
+    return collection.vector.search(query, k, view=view, rows=rows, filters=filters)
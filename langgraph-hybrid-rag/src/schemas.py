@@ -23,12 +23,30 @@ class Chunk(BaseModel):
     source_doc: Optional[str] = None
     source_path: Optional[str] = None
     row_range: Optional[str] = None
+    char_start: Optional[int] = None
+    char_end: Optional[int] = None
+    line_start: Optional[int] = None
+    line_end: Optional[int] = None
     graph_paths: Optional[List[str]] = None
+    # Near-duplicate chunks indexed as this one: chunk_id, document_id, source_doc
+    duplicates: Optional[List[Dict[str, Optional[str]]]] = None
+
+
+class SearchFilters(BaseModel):
+    """Restrict retrieval to chunks matching every given field (any of its values)."""
+    document_id: Optional[List[str]] = None
+    source_doc: Optional[List[str]] = None
+    entity: Optional[List[str]] = None
+    year: Optional[List[int]] = None
 
 
 class QueryRequest(BaseModel):
     question: str
     max_chunks: Optional[int] = None
+    filters: Optional[SearchFilters] = None
+    collection: Optional[str] = None
+    fields: Optional[List[str]] = None
+    include_text: bool = True
 
 
 class QueryData(BaseModel):
@@ -37,6 +55,8 @@ class QueryData(BaseModel):
     chunks_retrieved: Dict[str, int]
     chunks_used: List[Chunk]
     reasoning_summary: Optional[str] = None
+    filters: Optional[Dict[str, List]] = None
+    collection: Optional[str] = None
 
 
 class Envelope(BaseModel):
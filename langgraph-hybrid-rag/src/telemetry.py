@@ -1,16 +1,47 @@
+import os
+import sys
 import time
 from contextlib import contextmanager
 
 
+def peak_rss_mb() -> float | None:
+    # ru_maxrss is a process-lifetime high-water mark (KiB on Linux, bytes on macOS)
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def rss_mb() -> float | None:
+    # Current resident set size, unlike peak_rss_mb; Linux only
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+
+
+def rss_delta_mb(before: float | None) -> float | None:
+    """Resident memory gained since ``rss_mb()`` returned ``before``: what one step kept."""
+    after = rss_mb()
+    return None if before is None or after is None else round(after - before, 1)
+
+
 @contextmanager
 def log_step(step: str, logger=print, **fields):
     start = time.time()
+    extra: dict = {}
     try:
-        yield
+        # Callers may add fields known only after the step ran
+        yield extra
     finally:
         duration_ms = int((time.time() - start) * 1000)
         record = {"step": step, "duration_ms": duration_ms}
         record.update(fields)
+        record.update(extra)
         logger(record)
 
 